@@ -0,0 +1,101 @@
+"""Admin dashboard: the old load-every-completed-order version against $facet and the sales_daily rollup.
+
+Seeds --orders synthetic orders and times each way of building the dashboard,
+then checks that all three report the same totals. The old version is capped
+at 10,000 completed orders, as it was, so its revenue goes wrong past that;
+it also still counts cancelled orders that were paid.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_admin_dashboard --orders 200000 --repeat 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_orders, make_products
+from services.dashboard_service import DashboardService
+from services.sales_rollup_service import CATEGORIES, DAILY, PRODUCTS, SalesRollupService
+from services.index_service import ensure_indexes
+
+
+async def old_dashboard(db):
+    total_orders = await db.orders.count_documents({})
+    total_products = await db.products.count_documents({})
+    total_users = await db.users.count_documents({"role": "customer"})
+    pending_orders = await db.orders.count_documents({"order_status": "pending"})
+    completed_orders = await db.orders.find({"payment_status": "completed"}).to_list(10000)
+    total_revenue = sum(order.get("total", 0) for order in completed_orders)
+    recent_orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).limit(10).to_list(10)
+    low_stock = await db.products.find({"stock": {"$lt": 10}}, {"_id": 0}).limit(10).to_list(10)
+    return {
+        "total_orders": total_orders,
+        "total_products": total_products,
+        "total_users": total_users,
+        "pending_orders": pending_orders,
+        "total_revenue": round(total_revenue, 2),
+        "recent_orders": recent_orders,
+        "low_stock_products": low_stock,
+    }
+
+
+async def seed(db, count: int):
+    products = make_products(2000)
+    await db.products.insert_many([dict(p) for p in products])
+    user_ids = [f"user-{n}" for n in range(5000)]
+    await db.users.insert_many([{"id": uid, "email": f"{uid}@example.com", "role": "customer"} for uid in user_ids])
+    for start in range(0, count, 10000):
+        orders = make_orders(min(10000, count - start), products, user_ids, seed=start)
+        for n, order in enumerate(orders):
+            order["id"] = f"order-{start + n}"
+        await db.orders.insert_many(orders)
+
+
+async def timed(label: str, build, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = await build()
+        timings.append(time.perf_counter() - start)
+    print(f"{label:<18} p50={statistics.median(timings) * 1000:8.1f} ms  max={max(timings) * 1000:8.1f} ms")
+    return result
+
+
+async def main(args):
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    collections = ["orders", "products", "users", DAILY, PRODUCTS, CATEGORIES]
+    for name in collections:
+        await db[name].drop()
+    await seed(db, args.orders)
+    await ensure_indexes(db)
+
+    service = DashboardService(db)
+    start = time.perf_counter()
+    buckets = await SalesRollupService(db).backfill()
+    print(f"{args.orders} orders, sales rollup backfill: {buckets[DAILY]} days in {time.perf_counter() - start:.2f} s")
+
+    old = await timed("old (to_list)", lambda: old_dashboard(db), args.repeat)
+    live = await timed("$facet", lambda: service.get_stats(use_rollups=False), args.repeat)
+    rollups = await timed("rollups", lambda: service.get_stats(use_rollups=True), args.repeat)
+
+    for field in ("total_orders", "total_products", "total_users", "pending_orders", "total_revenue"):
+        marker = "" if old[field] == live[field] == rollups[field] else "  <- differs"
+        print(f"{field:<15} old={old[field]} facet={live[field]} rollups={rollups[field]}{marker}")
+    if live["revenue_series"] != rollups["revenue_series"]:
+        print("revenue series differ between $facet and rollups")
+
+    for name in collections:
+        await db[name].drop()
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,64 @@
+"""Measure how long a catalog cache invalidation takes to reach other workers.
+
+Each simulated worker is a CatalogCache on RedisCacheBackend. By default the
+workers share an in-process fakeredis server; pass --redis-url to use a real
+Redis-protocol server. Run from the backend directory:
+    python -m benchmarks.bench_cache_invalidation --workers 4 --rounds 200
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from services.cache_service import CatalogCache, RedisCacheBackend, product_key
+
+
+def make_client(args, server):
+    if args.redis_url:
+        import redis.asyncio as redis
+        return redis.from_url(args.redis_url)
+    import fakeredis
+    return fakeredis.FakeAsyncRedis(server=server)
+
+
+async def main(args):
+    server = None
+    if not args.redis_url:
+        import fakeredis
+        server = fakeredis.FakeServer()
+
+    workers = [CatalogCache(RedisCacheBackend(client=make_client(args, server))) for _ in range(args.workers)]
+    for worker in workers:
+        await worker.start()
+
+    async def load():
+        return {"name": "Royal Oud"}
+
+    delays = []
+    for round_number in range(args.rounds):
+        key = product_key(f"bench-{round_number}")
+        for worker in workers:
+            await worker.get_or_load(key, load)
+
+        start = time.perf_counter()
+        await workers[0].invalidate(key)
+        # Wait until every other worker has evicted its local copy
+        while any(worker.backend.local.get(key)[0] for worker in workers[1:]):
+            await asyncio.sleep(0)
+        delays.append(time.perf_counter() - start)
+
+    delays.sort()
+    p99 = delays[min(len(delays) - 1, int(len(delays) * 0.99))]
+    print(f"invalidation reached {args.workers - 1} workers: "
+          f"p50={statistics.median(delays) * 1000:.2f} ms p99={p99 * 1000:.2f} ms max={delays[-1] * 1000:.2f} ms")
+
+    for worker in workers:
+        await worker.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--redis-url", default=None)
+    asyncio.run(main(parser.parse_args()))
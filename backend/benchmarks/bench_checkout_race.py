@@ -0,0 +1,89 @@
+"""Flash-sale race: --checkouts simultaneous POST /orders/ for a product with --stock units.
+
+Every checkout asks for one unit, so exactly --stock orders must be created and
+the rest refused with 409, leaving stock at zero. It then expires every hold
+and checks the sweeper puts all the stock back. Exits non-zero if any of that
+fails.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_checkout_race --checkouts 500 --stock 100
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_products
+from controllers.order_controller import get_order_router
+from decorators.authorization import require_auth
+from services.index_service import ensure_indexes
+from services.inventory_service import HELD, InventoryService
+
+ADDRESS = {"street": "1 MG Road", "city": "Pune", "state": "MH", "postal_code": "411001", "phone": "9999999999"}
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in ("products", "orders"):
+        await db[name].drop()
+    await ensure_indexes(db)
+
+    product = make_products(1)[0]
+    product["stock"] = args.stock
+    await db.products.insert_one(dict(product))
+
+    app = FastAPI()
+    app.include_router(get_order_router(db), prefix="/api")
+    # Authentication isn't what's racing here
+    app.dependency_overrides[require_auth] = lambda: {"user_id": "bench-user", "email": "bench@example.com", "role": "customer"}
+
+    body = {"items": [{"product_id": product["id"], "quantity": 1}], "shipping_address": ADDRESS}
+    limits = httpx.Limits(max_connections=args.checkouts)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", limits=limits) as http:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(http.post("/api/orders/", json=body) for _ in range(args.checkouts)))
+        elapsed = time.perf_counter() - start
+
+    statuses = Counter(response.status_code for response in responses)
+    stored = await db.products.find_one({"id": product["id"]})
+    orders = await db.orders.count_documents({})
+    print(f"{args.checkouts} checkouts in {elapsed:.2f} s: {dict(statuses)}")
+    print(f"stock left={stored['stock']} holds={len(stored.get('stock_holds', []))} orders={orders}")
+
+    failures = []
+    if statuses[200] != args.stock:
+        failures.append(f"expected {args.stock} successful checkouts, got {statuses[200]}")
+    if statuses[409] != args.checkouts - args.stock:
+        failures.append(f"expected {args.checkouts - args.stock} refused checkouts, got {statuses[409]}")
+    if stored["stock"] != 0 or orders != args.stock:
+        failures.append("stock or order count out of step with the successful checkouts")
+
+    # Expire every hold and let the sweeper hand the units back
+    await db.orders.update_many({"stock_reservation.status": HELD}, {"$set": {"stock_reservation.expires_at": "2000-01-01T00:00:00+00:00"}})
+    released = await InventoryService(db).release_expired()
+    stored = await db.products.find_one({"id": product["id"]})
+    print(f"sweeper released {released} reservations, stock back to {stored['stock']}")
+    if released != args.stock or stored["stock"] != args.stock or stored.get("stock_holds"):
+        failures.append("expired reservations did not return the stock")
+
+    for name in ("products", "orders"):
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checkouts", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=100)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
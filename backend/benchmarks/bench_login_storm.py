@@ -0,0 +1,128 @@
+"""Login throughput and catalog latency while a login storm is running.
+
+Runs the auth and product routers in-process and measures three phases:
+catalog reads alone, then catalog reads during a login storm with bcrypt
+inline on the event loop (PASSWORD_HASH_WORKERS=0, the old behaviour), then
+the same storm with the bounded hashing pool.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_login_storm --duration 10 --logins 32 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+import services.auth_service as auth_service_module
+from benchmarks.synthetic import make_products
+from controllers.auth_controller import get_auth_router
+from controllers.product_controller import get_product_router
+from services.password_service import PasswordHasher, PASSWORD_HASH_WORKERS
+
+PASSWORD = "bench-password"
+PROBE_INTERVAL_SECONDS = 0.01
+
+
+def percentile(samples: list, pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))] if ordered else 0.0
+
+
+async def run_phase(http: httpx.AsyncClient, product_ids: list, user_count: int, duration: float, logins: int, probes: int) -> dict:
+    stop = time.perf_counter() + duration
+    catalog_latencies = []
+    outcomes = {"ok": 0, "busy": 0, "other": 0}
+
+    async def probe(worker: int):
+        # Latency is measured from when the read was due, so time spent waiting on a frozen loop counts
+        i = worker
+        due = time.perf_counter()
+        while due < stop:
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await http.get(f"/api/products/{product_ids[i % len(product_ids)]}")
+            catalog_latencies.append(time.perf_counter() - due)
+            i += probes
+            due += PROBE_INTERVAL_SECONDS
+
+    async def login(worker: int):
+        i = worker
+        while time.perf_counter() < stop:
+            resp = await http.post("/api/auth/login", json={"email": f"user{i % user_count}@example.com", "password": PASSWORD})
+            if resp.status_code == 200:
+                outcomes["ok"] += 1
+            elif resp.status_code == 503:
+                outcomes["busy"] += 1
+                await asyncio.sleep(float(resp.headers.get("Retry-After", "1")) / 10)
+            else:
+                outcomes["other"] += 1
+            i += logins
+
+    await asyncio.gather(*(probe(w) for w in range(probes)), *(login(w) for w in range(logins)))
+    return {
+        "logins_per_s": outcomes["ok"] / duration,
+        "busy": outcomes["busy"],
+        "errors": outcomes["other"],
+        "catalog_reads": len(catalog_latencies),
+        "p50": percentile(catalog_latencies, 0.5) * 1000,
+        "p99": percentile(catalog_latencies, 0.99) * 1000,
+    }
+
+
+async def main(args):
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+
+    await db.products.drop()
+    await db.users.drop()
+    products = make_products(200)
+    await db.products.insert_many([dict(p) for p in products])
+    password_hash = await PasswordHasher(rounds=args.rounds, workers=0).hash(PASSWORD)
+    await db.users.insert_many([
+        {"id": f"user-{i}", "email": f"user{i}@example.com", "name": f"User {i}", "role": "customer",
+         "password_hash": password_hash, "addresses": [], "created_at": "2024-01-01T00:00:00+00:00"}
+        for i in range(args.users)
+    ])
+    product_ids = [p["id"] for p in products]
+
+    app = FastAPI()
+    app.include_router(get_auth_router(db), prefix="/api")
+    app.include_router(get_product_router(db), prefix="/api")
+
+    phases = [
+        ("catalog only", None, 0),
+        ("storm, inline bcrypt", PasswordHasher(rounds=args.rounds, workers=0), args.logins),
+        (f"storm, {args.workers} hash workers", PasswordHasher(rounds=args.rounds, workers=args.workers), args.logins),
+    ]
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as http:
+        # Warm the catalog cache so probes measure the event loop, not Mongo
+        for product_id in product_ids:
+            await http.get(f"/api/products/{product_id}")
+
+        for label, hasher, logins in phases:
+            if hasher is not None:
+                auth_service_module.password_hasher = hasher
+            result = await run_phase(http, product_ids, args.users, args.duration, logins, args.probes)
+            print(f"{label:<24} logins/s={result['logins_per_s']:6.1f} busy={result['busy']:<4} errors={result['errors']:<3} "
+                  f"catalog reads={result['catalog_reads']:<6} p50={result['p50']:7.2f} ms p99={result['p99']:8.2f} ms")
+            if hasher is not None:
+                hasher.close()
+
+    await db.products.drop()
+    await db.users.drop()
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login loops")
+    parser.add_argument("--probes", type=int, default=4, help="concurrent catalog read loops")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor")
+    parser.add_argument("--workers", type=int, default=max(1, PASSWORD_HASH_WORKERS))
+    asyncio.run(main(parser.parse_args()))
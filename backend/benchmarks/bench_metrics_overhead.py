@@ -0,0 +1,144 @@
+"""Cost of the request instrumentation: the same routes with and without MetricsMiddleware.
+
+Seeds --products products and mounts the product routes twice: "bare" on a
+plain Motor client, and "instrumented" behind MetricsMiddleware on a client
+with the MongoProfiler command listener, logging through the queue-backed
+logger (to /dev/null) with the access log on. Rounds alternate between the
+two so drift in the machine or the database hits both alike. Reports median
+per-request time for each route and the overhead, and fails if it is over
+--max-overhead percent (3 by default). Also checks that /metrics counted
+every instrumented request under its route template, that Mongo time was
+attributed to requests, and that no log record was dropped.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_metrics_overhead --products 5000 --requests 200 --rounds 5
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_products
+from controllers.metrics_controller import get_metrics_router
+from controllers.product_controller import get_product_router
+from services.cache_service import catalog_cache
+from services.index_service import ensure_indexes
+from services.logging_service import configure_logging, dropped_records, stop_logging
+from services.metrics_service import MetricsMiddleware, RequestMetrics
+from services.mongo_profiler_service import mongo_profiler
+
+COLLECTIONS = ["products"]
+
+
+async def run_round(http: httpx.AsyncClient, paths: list) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        resp = await http.get(path)
+        assert resp.status_code == 200, resp.text
+    return (time.perf_counter() - start) / len(paths)
+
+
+async def main(args) -> int:
+    mongo_url = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    db_name = os.environ.get("BENCH_DB_NAME", "mfrida_bench")
+    bare_client = AsyncIOMotorClient(mongo_url)
+    timed_client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_profiler])
+    db = bare_client[db_name]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+    await catalog_cache.invalidate_prefix("product:")
+
+    products = make_products(args.products)
+    await db.products.insert_many([dict(p) for p in products])
+
+    devnull = open(os.devnull, "w")
+    configure_logging(fmt="json", stream=devnull)
+
+    bare = FastAPI()
+    bare.include_router(get_product_router(db), prefix="/api")
+    metrics = RequestMetrics()
+    instrumented = FastAPI()
+    instrumented.include_router(get_product_router(timed_client[db_name]), prefix="/api")
+    instrumented.include_router(get_metrics_router(metrics))
+    instrumented.add_middleware(MetricsMiddleware, metrics=metrics, access_log=True)
+
+    routes = {
+        "list": [f"/api/products/?limit=24&skip={n % 20 * 24}" for n in range(args.requests)],
+        "detail": [f"/api/products/{products[n * 13 % len(products)]['id']}" for n in range(args.requests)],
+        "facets": [f"/api/products/facets?category_id={products[n % 5]['category_id']}&fields=id" for n in range(args.requests)],
+    }
+    samples = {(route, label): [] for route in routes for label in ("bare", "instrumented")}
+    clients = {
+        label: httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+        for label, app in (("bare", bare), ("instrumented", instrumented))
+    }
+    failures = []
+    try:
+        for route, paths in routes.items():
+            # Warm both apps and the catalog cache before timing
+            for http in clients.values():
+                await run_round(http, paths[:20])
+        metrics.routes.clear()
+
+        for n in range(args.rounds):
+            order = ("bare", "instrumented") if n % 2 == 0 else ("instrumented", "bare")
+            for route, paths in routes.items():
+                for label in order:
+                    samples[route, label].append(await run_round(clients[label], paths))
+
+        text = (await clients["instrumented"].get("/metrics")).text
+    finally:
+        for http in clients.values():
+            await http.aclose()
+
+    total_bare = total_instrumented = 0.0
+    for route in routes:
+        bare_time = statistics.median(samples[route, "bare"])
+        instrumented_time = statistics.median(samples[route, "instrumented"])
+        total_bare += bare_time
+        total_instrumented += instrumented_time
+        print(f"{route:<7} bare={bare_time * 1000:7.3f} ms instrumented={instrumented_time * 1000:7.3f} ms "
+              f"overhead={(instrumented_time / bare_time - 1) * 100:+5.1f}%")
+    overhead = (total_instrumented / total_bare - 1) * 100
+    print(f"overall overhead {overhead:+.2f}% (limit {args.max_overhead}%)")
+    if overhead > args.max_overhead:
+        failures.append(f"instrumentation costs {overhead:.2f}% of request time")
+
+    expected = args.requests * args.rounds
+    for template in ("/api/products/", "/api/products/{product_id}", "/api/products/facets"):
+        match = re.search(rf'http_request_duration_seconds_count{{method="GET",route="{re.escape(template)}"}} (\d+)', text)
+        if not match or int(match.group(1)) != expected:
+            failures.append(f"/metrics counted {match.group(1) if match else 0} requests for {template}, expected {expected}")
+    mongo_sum = sum(float(m) for m in re.findall(r'http_request_mongo_seconds_sum\{[^}]*\} (\S+)', text))
+    if mongo_sum <= 0:
+        failures.append("no Mongo time was attributed to requests")
+    if dropped_records():
+        failures.append(f"{dropped_records()} log records were dropped")
+
+    stop_logging()
+    devnull.close()
+    for name in COLLECTIONS:
+        await db[name].drop()
+    bare_client.close()
+    timed_client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--max-overhead", type=float, default=3.0)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,139 @@
+"""Mongo round trips per request, broken down by service method, for the catalog's hot and N+1-prone routes.
+
+Seeds --products products and a review, mounts the product, review and
+wishlist routes behind MetricsMiddleware on a Motor client with the
+MongoProfiler listener, and sends each request below --repeat times. For
+each route it prints the round trips and Mongo time from the X-Mongo-Profile
+header, and which service methods issued them. The wishlist page is sent
+both as one check per card and as one batch check, to show the N+1.
+Fails if a command could not be put down to a request or service method,
+or if the header disagrees with the profiler's own totals.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_mongo_round_trips --products 2000 --repeat 5
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_products
+from controllers.product_controller import get_product_router
+from controllers.review_controller import get_review_router
+from controllers.wishlist_controller import get_wishlist_router
+from decorators.authorization import require_admin, require_auth
+from services.cache_service import catalog_cache
+from services.index_service import ensure_indexes
+from services.metrics_service import MetricsMiddleware, RequestMetrics
+from services.mongo_profiler_service import mongo_profiler
+from services.variant_group_service import VARIANT_GROUPS_COLLECTION
+from services.wishlist_service import WISHLIST_COLLECTION
+
+COLLECTIONS = ["products", "reviews", VARIANT_GROUPS_COLLECTION, WISHLIST_COLLECTION]
+PROFILE_HEADER = re.compile(r"mongo_ops=(\d+), mongo_ms=([\d.]+)")
+
+
+def operation_counts() -> Counter:
+    counts = Counter()
+    for (operation, _, _), values in mongo_profiler.snapshot():
+        counts[operation] += values[0]
+    return counts
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"), event_listeners=[mongo_profiler])
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+
+    products = make_products(args.products)
+    await db.products.insert_many([dict(p) for p in products])
+    await db.reviews.insert_one({
+        "id": "bench-review", "product_id": products[0]["id"], "user_id": "bench-user", "user_name": "Bench",
+        "rating": 4, "comment": "Lasts all day", "is_approved": False,
+        "created_at": products[0]["created_at"], "updated_at": products[0]["created_at"],
+    })
+
+    app = FastAPI()
+    for router in (get_product_router(db), get_review_router(db), get_wishlist_router(db)):
+        app.include_router(router, prefix="/api")
+    user = {"user_id": "bench-user", "email": "bench@example.com", "role": "admin"}
+    app.dependency_overrides[require_auth] = lambda: user
+    app.dependency_overrides[require_admin] = lambda: user
+    app.add_middleware(MetricsMiddleware, metrics=RequestMetrics(), access_log=False, profile_header=True)
+
+    page_ids = [p["id"] for p in products[:24]]
+    requests = [
+        ("product list", "GET", "/api/products/?limit=24", None, True),
+        ("product list (card)", "GET", "/api/products/?limit=24&view=card", None, True),
+        ("product detail (cold)", "GET", f"/api/products/{products[1]['id']}", None, True),
+        ("product detail (warm)", "GET", f"/api/products/{products[1]['id']}", None, False),
+        ("product page", "GET", f"/api/products/slug/{products[2]['slug']}/page", None, True),
+        ("facets", "GET", f"/api/products/facets?category_id={products[0]['category_id']}", None, True),
+        ("update product", "PUT", f"/api/products/{products[3]['id']}", {"stock": 7}, True),
+        ("approve review", "PUT", "/api/reviews/bench-review", {"is_approved": True}, True),
+        ("wishlist add", "POST", "/api/wishlist/add", {"product_id": products[4]["id"]}, False),
+        ("wishlist batch check", "POST", "/api/wishlist/check", {"product_ids": page_ids}, False),
+    ]
+
+    failures = []
+    rows = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        for label, method, path, body, cold in requests:
+            ops, millis, before = [], [], operation_counts()
+            for _ in range(args.repeat):
+                if cold:
+                    await catalog_cache.invalidate_prefix("product:")
+                resp = await http.request(method, path, json=body)
+                if resp.status_code != 200:
+                    failures.append(f"{label}: {method} {path} returned {resp.status_code}")
+                    break
+                match = PROFILE_HEADER.fullmatch(resp.headers.get("x-mongo-profile", ""))
+                if not match:
+                    failures.append(f"{label}: no X-Mongo-Profile header")
+                    break
+                ops.append(int(match.group(1)))
+                millis.append(float(match.group(2)))
+            rows.append((label, ops, millis, operation_counts() - before))
+
+        # A listing page marking its cards one request at a time
+        ops, millis, before = [], [], operation_counts()
+        for _ in range(args.repeat):
+            replies = await asyncio.gather(*(http.get(f"/api/wishlist/check/{pid}") for pid in page_ids))
+            ops.append(sum(int(PROFILE_HEADER.fullmatch(r.headers["x-mongo-profile"]).group(1)) for r in replies))
+            millis.append(sum(float(PROFILE_HEADER.fullmatch(r.headers["x-mongo-profile"]).group(2)) for r in replies))
+        rows.append((f"wishlist check x{len(page_ids)}", ops, millis, operation_counts() - before))
+
+    for label, ops, millis, by_operation in rows:
+        if not ops:
+            continue
+        print(f"{label:<24} round trips={statistics.median(ops):5.0f}  mongo={statistics.median(millis):8.2f} ms")
+        for operation, count in by_operation.most_common():
+            print(f"    {count / len(ops):6.1f}  {operation}")
+        if sum(by_operation.values()) != sum(ops):
+            failures.append(f"{label}: header counted {sum(ops)} round trips, the profiler {sum(by_operation.values())}")
+        if by_operation.get("unattributed"):
+            failures.append(f"{label}: {by_operation['unattributed']} commands were not attributed")
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
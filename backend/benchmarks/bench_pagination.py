@@ -0,0 +1,80 @@
+"""Walk deep into product and order listings with skip/limit and with cursors.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_pagination --pages 1000 --page-size 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_orders, make_products
+from services.index_service import ensure_indexes
+from services.order_service import OrderService
+from services.product_service import ProductService
+
+
+async def walk(fetch_page, pages: int, use_cursor: bool, page_size: int) -> list:
+    """Return the latency of every page, fetched in order"""
+    timings = []
+    cursor = None
+    for page in range(pages):
+        start = time.perf_counter()
+        if use_cursor:
+            items, cursor = await fetch_page(limit=page_size, cursor=cursor)
+        else:
+            items, _ = await fetch_page(limit=page_size, skip=page * page_size)
+        timings.append(time.perf_counter() - start)
+        if not items or (use_cursor and not cursor):
+            break
+    return timings
+
+
+def report(label: str, timings: list):
+    buckets = [(1, 10), (100, 110), (500, 510), (990, 1000)]
+    parts = []
+    for first, last in buckets:
+        window = timings[first - 1:last]
+        if window:
+            parts.append(f"pages {first}-{last}: {statistics.mean(window) * 1000:6.2f} ms")
+    print(f"{label:<18} " + " | ".join(parts))
+
+
+async def main(args):
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    count = args.pages * args.page_size
+
+    await db.products.drop()
+    await db.orders.drop()
+    products = make_products(count)
+    orders = make_orders(count, products[:500], ["bench-user"])
+    for start in range(0, count, 5000):
+        await db.products.insert_many([dict(p) for p in products[start:start + 5000]])
+        await db.orders.insert_many([dict(o) for o in orders[start:start + 5000]])
+    await ensure_indexes(db)
+
+    product_service = ProductService(db)
+    order_service = OrderService(db)
+
+    for label, fetch_page in (
+        ("products", product_service.get_products_page),
+        ("orders", lambda **kw: order_service.get_orders_page(user_id="bench-user", **kw)),
+    ):
+        report(f"{label} skip", await walk(fetch_page, args.pages, False, args.page_size))
+        report(f"{label} cursor", await walk(fetch_page, args.pages, True, args.page_size))
+
+    await db.products.drop()
+    await db.orders.drop()
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
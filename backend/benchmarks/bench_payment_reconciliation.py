@@ -0,0 +1,106 @@
+"""Payment reconciliation against the mock PhonePe server.
+
+Seeds --orders stale pending orders, of which the mock reports 50% completed,
+20% failed and the rest still pending, and runs one reconciliation pass.
+Checks that every completed and failed order was applied, that still-pending
+orders were backed off (a second pass straight after checks none), and that
+the pass stayed within --concurrency checks in flight and --rate checks per
+second. Exits non-zero if any of that fails.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_payment_reconciliation --orders 300 --rate 50 --concurrency 10
+"""
+import argparse
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.mock_phonepe import create_mock_phonepe_app, free_port, start_mock_phonepe
+from benchmarks.synthetic import make_orders, make_products
+from services.index_service import ensure_indexes
+from services.payment_reconciliation_service import PaymentReconciler, ReconciliationMetrics
+from services.phonepe_service import PhonePeClient
+
+COLLECTIONS = ["orders", "products", "sales_daily", "sales_daily_products", "sales_daily_categories"]
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+
+    products = make_products(100)
+    await db.products.insert_many([dict(p) for p in products])
+    orders = make_orders(args.orders, products, ["bench-user"])
+    stale = datetime.now(timezone.utc) - timedelta(hours=1)
+    states = {}
+    for n, order in enumerate(orders):
+        order.update({
+            "payment_status": "pending", "order_status": "pending",
+            "phonepe_merchant_transaction_id": order["id"], "created_at": (stale - timedelta(seconds=n)).isoformat(),
+        })
+        states[order["id"]] = "COMPLETED" if n % 10 < 5 else "FAILED" if n % 10 < 7 else "PENDING"
+    await db.orders.insert_many(orders)
+
+    mock = create_mock_phonepe_app(latency=args.latency, states=states)
+    port = free_port()
+    mock_server = await start_mock_phonepe(mock, port)
+    phonepe = PhonePeClient(
+        base_url=f"http://127.0.0.1:{port}", auth_url=f"http://127.0.0.1:{port}/v1/oauth/token",
+        client_id="bench-client", client_secret="bench-secret"
+    )
+    metrics = ReconciliationMetrics()
+    reconciler = PaymentReconciler(db, client=phonepe, metrics=metrics, batch_size=100, concurrency=args.concurrency, rate_per_second=args.rate)
+
+    start = time.perf_counter()
+    checked = await reconciler.run_once()
+    elapsed = time.perf_counter() - start
+    rechecked = await reconciler.run_once()
+
+    expected = {state: sum(1 for s in states.values() if s == state) for state in ("COMPLETED", "FAILED", "PENDING")}
+    paid = await db.orders.count_documents({"payment_status": "completed"})
+    failed = await db.orders.count_documents({"payment_status": "failed"})
+    backed_off = await db.orders.count_documents({"payment_status": "pending", "payment_reconciliation.attempts": 1})
+    floor = (args.orders - 1) / args.rate
+    print(f"{checked} orders checked in {elapsed:.2f} s ({checked / elapsed:.1f}/s, rate limit {args.rate}/s, floor {floor:.2f} s); "
+          f"max in flight at PhonePe={mock.state.stats.max_in_flight}")
+    print(f"paid={paid}/{expected['COMPLETED']} failed={failed}/{expected['FAILED']} backed off={backed_off}/{expected['PENDING']} "
+          f"second pass checked={rechecked}; metrics={metrics.stats()}")
+
+    failures = []
+    if checked != args.orders:
+        failures.append(f"expected {args.orders} checks, got {checked}")
+    if (paid, failed, backed_off) != (expected["COMPLETED"], expected["FAILED"], expected["PENDING"]):
+        failures.append("orders were not all moved to the state PhonePe reported")
+    if rechecked:
+        failures.append(f"{rechecked} orders were re-polled before their backoff expired")
+    if mock.state.stats.max_in_flight > args.concurrency:
+        failures.append(f"{mock.state.stats.max_in_flight} checks in flight, limit {args.concurrency}")
+    if elapsed < floor * 0.95:
+        failures.append("the pass ran faster than the rate limit allows")
+
+    mock_server.should_exit = True
+    await mock.state.serve_task
+    await phonepe.close()
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds each PhonePe call takes at the mock")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,95 @@
+"""Fire simultaneous /verify-phonepe-payment calls against the mock PhonePe server.
+
+Every status check takes --latency seconds at the mock. If the calls block
+the event loop they finish one after another (about N x latency); with the
+async client they overlap and the whole batch takes about one latency.
+Exits non-zero unless the batch beat the serial time by --min-speedup and
+the mock saw more than one status check in flight at once.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_phonepe_concurrency --requests 200 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.mock_phonepe import create_mock_phonepe_app, free_port, start_mock_phonepe
+from benchmarks.synthetic import make_orders, make_products
+from controllers.order_controller import get_order_router
+from decorators.authentication import create_access_token
+from services.phonepe_service import phonepe_client
+
+USER_ID = "bench-user"
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+
+    await db.orders.drop()
+    orders = make_orders(args.requests, make_products(50), [USER_ID])
+    for order in orders:
+        order.update({"payment_status": "pending", "order_status": "pending", "phonepe_merchant_transaction_id": order["id"]})
+    await db.orders.insert_many([dict(o) for o in orders])
+
+    mock = create_mock_phonepe_app(latency=args.latency)
+    port = free_port()
+    mock_server = await start_mock_phonepe(mock, port)
+    phonepe_client.base_url = f"http://127.0.0.1:{port}"
+    phonepe_client.auth_url = f"http://127.0.0.1:{port}/v1/oauth/token"
+    phonepe_client.client_id = phonepe_client.client_id or "bench-client"
+    phonepe_client.client_secret = phonepe_client.client_secret or "bench-secret"
+
+    app = FastAPI()
+    app.include_router(get_order_router(db), prefix="/api")
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': USER_ID, 'email': 'bench@example.com', 'role': 'customer'})}"}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as http:
+        async def verify(order_id: str) -> httpx.Response:
+            return await http.post("/api/orders/verify-phonepe-payment", json={"order_id": order_id}, headers=headers)
+
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(verify(order["id"]) for order in orders))
+        elapsed = time.perf_counter() - start
+
+    verified = sum(1 for r in responses if r.status_code == 200 and r.json().get("success"))
+    completed = await db.orders.count_documents({"payment_status": "completed"})
+    stats = mock.state.stats
+    serial = args.requests * args.latency
+    print(f"{args.requests} verifications in {elapsed:.2f} s (serial would be ~{serial:.1f} s, {serial / elapsed:.1f}x)")
+    print(f"verified={verified} completed_orders={completed} "
+          f"max_concurrent_at_phonepe={stats.max_in_flight} token_requests={stats.token_requests}")
+
+    mock_server.should_exit = True
+    await mock.state.serve_task
+    await phonepe_client.close()
+    await db.orders.drop()
+    client.close()
+
+    failures = []
+    if verified != args.requests:
+        failures.append(f"only {verified}/{args.requests} verifications succeeded")
+    if elapsed * args.min_speedup > serial:
+        failures.append(f"batch took {elapsed:.2f} s, less than {args.min_speedup}x faster than serial")
+    if stats.max_in_flight < 2:
+        failures.append("status checks reached PhonePe one at a time")
+    if stats.token_requests != 1:
+        failures.append(f"expected one OAuth request, saw {stats.token_requests}")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per mock PhonePe call")
+    parser.add_argument("--min-speedup", type=float, default=10.0)
+    sys.exit(asyncio.run(main(parser.parse_args())))
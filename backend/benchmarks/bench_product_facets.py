@@ -0,0 +1,157 @@
+"""Faceted browsing: one $facet aggregation vs a count_documents call per facet value.
+
+Seeds --products products. For each of a set of filter combinations (none,
+a category, a brand, a price range, a flag plus a rating floor, a search),
+"separate" fetches the page with find and then counts the total and every
+category, brand, flag, price bucket and rating bucket with its own
+count_documents call, the way a facet sidebar is usually filled. "facet"
+calls GET /api/products/facets, which runs one aggregation, or with no
+filters serves the cached counts and fetches only the page. Reports
+p50/p95 per combination and checks that both give the same page, total and
+counts. Exits non-zero if they differ.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_product_facets --products 20000 --requests 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import BRANDS, make_products
+from controllers.product_controller import get_product_router
+from services.cache_service import catalog_cache
+from services.index_service import ensure_indexes
+from services.product_facet_service import FACET_FILTER_KEYS, FLAGS, PRICE_BUCKET_BOUNDARIES
+from services.product_service import ProductService
+
+COLLECTIONS = ["products"]
+PAGE_SIZE = 24
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * q) - 1, 0)]
+
+
+async def separate_counts(db, query: dict, search_query: dict, category_ids: List[str]) -> dict:
+    """The page and every facet count, one find and one count_documents per value"""
+    def match(name: str, extra: dict) -> dict:
+        clauses = [{k: v for k, v in query.items() if k not in FACET_FILTER_KEYS[name]}, extra]
+        if search_query:
+            clauses.append(search_query)
+        return {"$and": [c for c in clauses if c]} if any(clauses) else {}
+
+    full = {"$and": [query, search_query]} if search_query else query
+    page = await db.products.find(full, {"_id": 0, "id": 1}).sort([("created_at", -1), ("id", -1)]).limit(PAGE_SIZE).to_list(PAGE_SIZE)
+    bounds = PRICE_BUCKET_BOUNDARIES + [None]
+    price_ranges = [
+        {"$gte": bounds[n], "$lt": bounds[n + 1]} if bounds[n + 1] is not None else {"$gte": bounds[n]}
+        for n in range(len(PRICE_BUCKET_BOUNDARIES))
+    ]
+    jobs = {
+        "total": db.products.count_documents(full),
+        **{("categories", c): db.products.count_documents(match("categories", {"category_id": c})) for c in category_ids},
+        **{("brands", b): db.products.count_documents(match("brands", {"brand": b})) for b in BRANDS},
+        **{("flags", f): db.products.count_documents(match("flags", {f: True})) for f in FLAGS},
+        **{("price", n): db.products.count_documents(match("price", {"final_price": r})) for n, r in enumerate(price_ranges)},
+        **{("rating", r): db.products.count_documents(match("rating", {"average_rating": {"$gte": r, "$lt": r + 1}})) for r in range(6)},
+    }
+    counts = dict(zip(jobs, [await job for job in jobs.values()]))
+    return {
+        "ids": [doc["id"] for doc in page],
+        "total": counts["total"],
+        "categories": {c: counts["categories", c] for c in category_ids if counts["categories", c]},
+        "brands": {b: counts["brands", b] for b in BRANDS if counts["brands", b]},
+        "flags": {f: counts["flags", f] for f in FLAGS},
+        "price": [counts["price", n] for n in range(len(price_ranges))],
+        "rating": {r: counts["rating", r] for r in range(6) if counts["rating", r]},
+    }
+
+
+def from_response(body: dict) -> dict:
+    facets = body["facets"]
+    return {
+        "ids": [item["id"] for item in body["items"]],
+        "total": body["total"],
+        "categories": {item["value"]: item["count"] for item in facets["categories"]},
+        "brands": {item["value"]: item["count"] for item in facets["brands"]},
+        "flags": facets["flags"],
+        "price": [bucket["count"] for bucket in facets["price"]],
+        "rating": {item["min"]: item["count"] for item in facets["rating"]},
+    }
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+    await catalog_cache.invalidate_prefix("product:")
+
+    products = make_products(args.products)
+    await db.products.insert_many([dict(p) for p in products])
+    category_ids = sorted({p["category_id"] for p in products})
+    service = ProductService(db)
+
+    cases: Dict[str, dict] = {
+        "none": {},
+        "category": {"category_id": category_ids[0]},
+        "brand": {"brand": BRANDS[1]},
+        "price": {"min_price": 500, "max_price": 2000},
+        "flag+rating": {"is_new_arrival": True, "min_rating": 4},
+        "search": {"search": "oud", "search_mode": "regex"},
+    }
+    app = FastAPI()
+    app.include_router(get_product_router(db), prefix="/api")
+
+    failures = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        for label, params in cases.items():
+            query = service.build_filter_query(
+                params.get("category_id"), params.get("is_featured"), params.get("is_best_selling"), params.get("is_new_arrival"),
+                params.get("min_price"), params.get("max_price"), params.get("brand"), params.get("min_rating")
+            )
+            search_query = service.search_filter(params["search"], params["search_mode"]) if "search" in params else None
+
+            separate, facet = [], []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                expected = await separate_counts(db, query, search_query, category_ids)
+                separate.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                resp = await http.get("/api/products/facets", params={**params, "limit": PAGE_SIZE, "fields": "id"})
+                facet.append(time.perf_counter() - start)
+                assert resp.status_code == 200, resp.text
+
+            got = from_response(resp.json())
+            for key in expected:
+                if got[key] != expected[key]:
+                    failures.append(f"{label}: {key} differs: facet={got[key]} separate={expected[key]}")
+            print(f"{label:<12} separate p50={statistics.median(separate) * 1000:8.2f} ms p95={percentile(separate, 0.95) * 1000:8.2f} ms   "
+                  f"facet p50={statistics.median(facet) * 1000:8.2f} ms p95={percentile(facet, 0.95) * 1000:8.2f} ms   "
+                  f"{statistics.median(separate) / statistics.median(facet):5.1f}x")
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=50)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
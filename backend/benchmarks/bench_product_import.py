@@ -0,0 +1,82 @@
+"""Time a bulk product import, a re-import (all updates) and an export.
+
+Writes --rows synthetic products to a temporary CSV or NDJSON file and feeds
+it through ProductImportService exactly as the CLI does.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_product_import --rows 100000 --batch-size 1000 --format csv
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import tempfile
+import time
+
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_products
+from models.product_model import ProductCreate
+from services.index_service import ensure_indexes
+from services.product_import_service import ProductImportService, _csv_cell, iter_rows
+
+
+def write_rows(path: str, fmt: str, count: int):
+    fields = list(ProductCreate.model_fields)
+    with open(path, "w", encoding="utf-8", newline="") as out:
+        writer = csv.DictWriter(out, fieldnames=fields) if fmt == "csv" else None
+        if writer:
+            writer.writeheader()
+        for start in range(0, count, 10000):
+            for product in make_products(min(10000, count - start), seed=start):
+                product["slug"] = f"{product['slug']}-{start}"
+                row = {field: product.get(field) for field in fields}
+                if writer:
+                    writer.writerow({field: _csv_cell(value) for field, value in row.items()})
+                else:
+                    out.write(json.dumps(row) + "\n")
+
+
+async def timed_import(service: ProductImportService, path: str, fmt: str, batch_size: int, label: str):
+    start = time.perf_counter()
+    with open(path, encoding="utf-8-sig", newline="") as source:
+        report = await service.import_rows(iter_rows(source, fmt), batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {report['processed']} rows in {elapsed:6.1f} s ({report['processed'] / elapsed:8.0f} rows/s) "
+          f"inserted={report['inserted']} updated={report['updated']} failed={report['failed']}")
+
+
+async def main(args):
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    await db.products.drop()
+    await ensure_indexes(db)
+    service = ProductImportService(db)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"products.{args.format}")
+        write_rows(path, args.format, args.rows)
+        print(f"{args.rows} rows, {os.path.getsize(path) / 1e6:.1f} MB {args.format}, batch size {args.batch_size}")
+
+        await timed_import(service, path, args.format, args.batch_size, "import")
+        await timed_import(service, path, args.format, args.batch_size, "re-import")
+
+        start = time.perf_counter()
+        size = 0
+        async for chunk in service.export(args.format, args.batch_size):
+            size += len(chunk)
+        elapsed = time.perf_counter() - start
+        print(f"{'export':<10} {args.rows} rows in {elapsed:6.1f} s ({args.rows / elapsed:8.0f} rows/s) {size / 1e6:.1f} MB")
+
+    await db.products.drop()
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    asyncio.run(main(parser.parse_args()))
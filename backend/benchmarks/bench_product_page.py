@@ -0,0 +1,141 @@
+"""Product page: the per-widget request fan-out versus /products/slug/{slug}/page.
+
+The fan-out is the five requests a product page needs without the composite
+endpoint (slug, related, images, frequently-bought, review stats), issued
+one after another as well as all at once. Reports server time per page and
+HTTP/Mongo round trips per page, with the catalog cache cold (cleared before
+every page) and warm.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_product_page --pages 300
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from benchmarks.synthetic import make_products
+from controllers.frequently_bought_controller import get_frequently_bought_router
+from controllers.product_controller import get_product_router
+from controllers.product_image_controller import get_product_image_router
+from controllers.review_controller import get_review_router
+from services.cache_service import catalog_cache
+from services.index_service import ensure_indexes
+from services.rating_service import RatingService
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def seed(db, count: int):
+    rng = random.Random(7)
+    products = make_products(count)
+    ids = [p["id"] for p in products]
+    for product in products:
+        product["related_products"] = rng.sample(ids, 4)
+    await db.products.insert_many([dict(p) for p in products])
+    await db.product_images.insert_many([
+        {"id": f"{p['id']}-{n}", "product_id": p["id"], "image_url": f"/api/uploads/products/{p['slug']}-{n}.webp", "is_primary": n == 0, "sort_order": n}
+        for p in products for n in range(3)
+    ])
+    await db.frequently_bought_together.insert_many([
+        # Overlaps the related list, as merchandisers tend to do
+        {"id": f"fbt-{p['id']}", "product_id": p["id"], "related_product_ids": p["related_products"][:2] + rng.sample(ids, 2)}
+        for p in products
+    ])
+    await db.reviews.insert_many([
+        {"id": f"r-{p['id']}-{n}", "product_id": p["id"], "user_id": f"u{n}", "user_name": "Bench", "rating": rng.randint(1, 5),
+         "comment": "Lovely", "is_approved": True, "created_at": "2024-01-01T00:00:00+00:00"}
+        for p in products for n in range(rng.randrange(0, 20))
+    ])
+    await RatingService(db).reconcile()
+    return products
+
+
+async def fan_out(http: httpx.AsyncClient, product: dict, concurrent: bool):
+    slug_page = (await http.get(f"/api/products/slug/{product['slug']}")).json()
+    product_id = slug_page["id"]
+    paths = [
+        f"/api/products/{product_id}/related",
+        f"/api/product-images/product/{product_id}",
+        f"/api/frequently-bought/product/{product_id}",
+        f"/api/reviews/stats/{product_id}",
+    ]
+    if concurrent:
+        await asyncio.gather(*(http.get(path) for path in paths))
+    else:
+        for path in paths:
+            await http.get(path)
+    return 1 + len(paths)
+
+
+async def composite(http: httpx.AsyncClient, product: dict, concurrent: bool):
+    resp = await http.get(f"/api/products/slug/{product['slug']}/page")
+    assert resp.status_code == 200, resp.text
+    return 1
+
+
+async def main(args):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"), event_listeners=[counter])
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    collections = ["products", "product_images", "frequently_bought_together", "reviews"]
+    for name in collections:
+        await db[name].drop()
+    products = await seed(db, args.products)
+    await ensure_indexes(db)
+
+    app = FastAPI()
+    for router in (get_product_router(db), get_product_image_router(db), get_frequently_bought_router(db), get_review_router(db)):
+        app.include_router(router, prefix="/api")
+
+    sample = random.Random(11).choices(products, k=args.pages)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        for cache in ("cold", "warm"):
+            for label, fetch, concurrent in (
+                ("fan-out sequential", fan_out, False),
+                ("fan-out concurrent", fan_out, True),
+                ("composite /page", composite, False),
+            ):
+                timings, requests = [], 0
+                commands_before = counter.count
+                for product in sample:
+                    if cache == "cold":
+                        await catalog_cache.invalidate_prefix("")
+                    start = time.perf_counter()
+                    requests += await fetch(http, product, concurrent)
+                    timings.append(time.perf_counter() - start)
+                commands = counter.count - commands_before
+                print(f"{cache:<5} {label:<19} p50={statistics.median(timings) * 1000:6.2f} ms "
+                      f"mean={statistics.mean(timings) * 1000:6.2f} ms "
+                      f"http/page={requests / len(sample):.1f} mongo/page={commands / len(sample):.1f}")
+
+    for name in collections:
+        await db[name].drop()
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--pages", type=int, default=300)
+    asyncio.run(main(parser.parse_args()))
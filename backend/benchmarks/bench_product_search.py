@@ -0,0 +1,97 @@
+"""Compare indexed product search against the $regex scan.
+
+Run from the backend directory:
+    python -m benchmarks.bench_product_search --count 100000
+    python -m benchmarks.bench_product_search --count 100000 --mongo   # end-to-end via ProductService
+"""
+import argparse
+import asyncio
+import os
+import re
+import statistics
+import time
+
+from benchmarks.synthetic import make_products
+from services.search_service import ProductSearchIndex, product_search_index
+
+QUERIES = ["oud", "ro", "royal musk", "velvet amber attar", "sandal", "lattafa", "midnight oud spray", "zzz"]
+
+
+def report(label: str, timings: list):
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{label:<28} p50={statistics.median(timings) * 1000:8.2f} ms  p99={p99 * 1000:8.2f} ms")
+
+
+def regex_scan(products: list, search: str) -> list:
+    """What Mongo does for the $regex $or: test every document, field by field"""
+    pattern = re.compile(search, re.IGNORECASE)
+    return [
+        p["id"] for p in products
+        if pattern.search(p["name"]) or pattern.search(p["brand"]) or pattern.search(p["description"])
+    ]
+
+
+def run_in_process(products: list, rounds: int):
+    index = ProductSearchIndex()
+    start = time.perf_counter()
+    index.build(products)
+    print(f"index build: {time.perf_counter() - start:.2f} s for {len(products)} products")
+
+    index_timings, regex_timings = [], []
+    for _ in range(rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            index.search(query, limit=50)
+            index_timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            regex_scan(products, query)
+            regex_timings.append(time.perf_counter() - start)
+
+    report("index search", index_timings)
+    report("regex scan (in-process)", regex_timings)
+
+
+async def run_mongo(products: list, rounds: int):
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from services.product_service import ProductService
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    await db.products.drop()
+    for start in range(0, len(products), 5000):
+        await db.products.insert_many([dict(p) for p in products[start:start + 5000]])
+    await db.products.create_index("id", unique=True)
+
+    await product_search_index.build_from_collection(db.products)
+    service = ProductService(db)
+
+    for mode in ("index", "regex"):
+        timings = []
+        for _ in range(rounds):
+            for query in QUERIES:
+                start = time.perf_counter()
+                await service.get_products(search=query, limit=50, search_mode=mode)
+                timings.append(time.perf_counter() - start)
+        report(f"get_products search_mode={mode}", timings)
+
+    await db.products.drop()
+    client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mongo", action="store_true", help="also run end-to-end against a local mongod")
+    args = parser.parse_args()
+
+    products = make_products(args.count)
+    run_in_process(products, args.rounds)
+    if args.mongo:
+        asyncio.run(run_mongo(products, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
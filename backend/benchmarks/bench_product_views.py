@@ -0,0 +1,137 @@
+"""Payload size and latency of product listings in the full, card and fields= views.
+
+Seeds --products products with catalog-sized descriptions, specifications,
+several images and related ids, and a user whose wishlist holds --wishlist of
+them. Then requests the listing, related products and the wishlist in each
+view and reports body size, p50/p95 latency and CPU per request. Checks that
+the card view returns the same products in the same order as the full view,
+keyset pages included, and that card items carry only ProductCard fields.
+Exits non-zero if not.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_product_views --products 2000 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import NOTES, make_products
+from controllers.product_controller import get_product_router
+from controllers.wishlist_controller import get_wishlist_router
+from decorators.authorization import require_auth
+from models.product_model import ProductCard
+from services.index_service import ensure_indexes
+from services.wishlist_service import WISHLIST_COLLECTION
+
+COLLECTIONS = ["products", WISHLIST_COLLECTION]
+VIEWS = {"full": "view=full", "card": "view=card", "fields": "fields=name,slug,final_price"}
+USER = {"user_id": "bench-user", "email": "bench@example.com", "role": "user"}
+
+
+def enrich(products: list):
+    """Give the synthetic products the long-form content real product pages carry"""
+    for n, product in enumerate(products):
+        notes = ", ".join(NOTES[(n + k) % len(NOTES)] for k in range(6))
+        product["description"] = " ".join([product["description"]] + [f"Opens with {notes}, settling into a warm, long-lasting base."] * 12)
+        product["fragrance_notes"] = f"Top: {notes}. Heart: {notes}. Base: {notes}."
+        product["images"] = [f"/api/uploads/products/{n}-{k}.webp" for k in range(5)]
+        product["specifications"] = {f"Spec {k}": f"Value {k} for {product['name']}" for k in range(10)}
+        product["related_products"] = [products[(n + k) % len(products)]["id"] for k in range(1, 9)]
+
+
+async def timed(http: httpx.AsyncClient, path: str, requests: int):
+    latencies = []
+    cpu = time.process_time()
+    for _ in range(requests):
+        start = time.perf_counter()
+        resp = await http.get(path)
+        latencies.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.text
+    cpu = (time.process_time() - cpu) / requests
+    latencies.sort()
+    return resp, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1], cpu
+
+
+async def walk(http: httpx.AsyncClient, path: str) -> list:
+    """Ids over every keyset page of a listing"""
+    ids, cursor = [], None
+    while True:
+        resp = await http.get(path + (f"&cursor={cursor}" if cursor else ""))
+        ids.extend(item["id"] for item in resp.json())
+        cursor = resp.headers.get("x-next-cursor")
+        if not cursor:
+            return ids
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+
+    products = make_products(args.products)
+    enrich(products)
+    await db.products.insert_many([dict(p) for p in products])
+    await db[WISHLIST_COLLECTION].insert_many([
+        {"user_id": USER["user_id"], "product_id": p["id"], "created_at": p["created_at"]} for p in products[:args.wishlist]
+    ])
+
+    app = FastAPI()
+    app.include_router(get_product_router(db), prefix="/api")
+    app.include_router(get_wishlist_router(db), prefix="/api")
+    app.dependency_overrides[require_auth] = lambda: USER
+
+    endpoints = {
+        "listing": "/api/products/?limit=50&",
+        "related": f"/api/products/{products[0]['id']}/related?",
+        "wishlist": "/api/wishlist/?",
+    }
+    failures = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        for endpoint, prefix in endpoints.items():
+            bodies, sizes = {}, {}
+            for view, query in VIEWS.items():
+                await timed(http, prefix + query, 3)
+                resp, p50, p95, cpu = await timed(http, prefix + query, args.requests)
+                bodies[view], sizes[view] = resp.json(), len(resp.content)
+                print(f"{endpoint:<9} {view:<7} body={len(resp.content) / 1024:7.1f} KiB items={len(bodies[view]):3} "
+                      f"p50={p50 * 1000:6.2f} ms p95={p95 * 1000:6.2f} ms cpu/request={cpu * 1000:6.2f} ms")
+            full, card = bodies["full"], bodies["card"]
+            print(f"{'':<9} card is {(1 - sizes['card'] / sizes['full']) * 100:.0f}% smaller than full")
+            if [item["id"] for item in card] != [item["id"] for item in full]:
+                failures.append(f"{endpoint}: card view returned different products than the full view")
+            if any(set(item) != set(ProductCard.model_fields) or len(item["images"]) > 1 for item in card):
+                failures.append(f"{endpoint}: card items do not match ProductCard")
+            if any(set(item) != {"id", "name", "slug", "final_price"} for item in bodies["fields"]):
+                failures.append(f"{endpoint}: fields= items carry other fields")
+
+        for sort in ("", "&sort_by=price&sort_order=1"):
+            if await walk(http, f"/api/products/?limit=100&view=card{sort}") != await walk(http, f"/api/products/?limit=100&view=full{sort}"):
+                failures.append(f"card view pages differ from full view pages (sort{sort or ' default'})")
+        resp = await http.get("/api/products/?fields=name,nope")
+        if resp.status_code != 400:
+            failures.append(f"unknown field answered {resp.status_code}, expected 400")
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--wishlist", type=int, default=40)
+    parser.add_argument("--requests", type=int, default=200)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
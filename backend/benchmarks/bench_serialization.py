@@ -0,0 +1,167 @@
+"""CPU per request for the product, order and review list endpoints, before and after the serialization fast path.
+
+"before" mounts handlers written the old way: one model per document, then
+response_model validating and serializing every object again. "after" mounts
+the real routers. Both read the same pages from Mongo, so the difference is
+Python work; the script checks they return the same JSON. It also times
+the serialization step alone on the same page, since on a slow or remote
+database the query can hide it. With --profile it
+prints the top functions by own time for each run.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_serialization --requests 200 --limit 100 [--profile]
+"""
+import argparse
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import time
+from typing import List
+
+import httpx
+from fastapi import APIRouter, FastAPI, Query, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_orders, make_products
+from controllers.order_controller import get_order_router
+from controllers.product_controller import get_product_router
+from controllers.review_controller import get_review_router
+from decorators.authorization import require_auth
+from models.order_model import Order
+from models.product_model import Product
+from models.review_model import Review
+from services.http_cache_service import collection_validators, conditional_response
+from services.index_service import ensure_indexes
+from services.pagination_service import find_page
+from services.serialization_service import model_response, validate_list
+
+COLLECTIONS = ["products", "orders", "reviews"]
+
+
+def get_legacy_router(db) -> APIRouter:
+    """The list handlers as they were: same queries, one model per document, response_model re-validating"""
+    router = APIRouter()
+
+    @router.get("/products/", response_model=List[Product])
+    async def products(request: Request, response: Response, limit: int = Query(50)):
+        validators = await collection_validators(db.products, {}, "products", request.url.query)
+        not_modified = conditional_response(request, response, "product_list", validators)
+        if not_modified:
+            return not_modified
+        docs, _ = await find_page(db.products, {}, "created_at", -1, limit)
+        return [Product(**doc) for doc in docs]
+
+    @router.get("/orders/", response_model=List[Order])
+    async def orders(limit: int = Query(50)):
+        docs, _ = await find_page(db.orders, {}, "created_at", -1, limit)
+        return [Order(**doc) for doc in docs]
+
+    @router.get("/reviews/", response_model=List[Review])
+    async def reviews(limit: int = Query(50)):
+        docs, _ = await find_page(db.reviews, {}, "created_at", -1, limit)
+        return [Review(**doc) for doc in docs]
+
+    return router
+
+
+async def seed(db, count: int):
+    products = make_products(count)
+    await db.products.insert_many([dict(p) for p in products])
+    await db.orders.insert_many(make_orders(count, products, [f"user-{n}" for n in range(50)]))
+    await db.reviews.insert_many([
+        {"id": f"review-{n}", "product_id": products[n % len(products)]["id"], "user_id": f"user-{n % 50}", "user_name": "Bench",
+         "rating": 1 + n % 5, "comment": "Long-lasting and warm, lovely in the evening.", "is_approved": True,
+         "created_at": f"2024-01-01T00:{n // 60 % 60:02d}:{n % 60:02d}+00:00", "updated_at": "2024-01-01T00:00:00+00:00"}
+        for n in range(count)
+    ])
+
+
+async def measure_encoding(model, docs: List[dict], rounds: int):
+    """CPU per page for the serialization step alone, without Mongo or HTTP"""
+    field = create_response_field(name="Response", type_=List[model])
+    start = time.process_time()
+    for _ in range(rounds):
+        content = await serialize_response(field=field, response_content=[model(**doc) for doc in docs])
+        JSONResponse(content).body
+    before = (time.process_time() - start) / rounds
+    start = time.process_time()
+    for _ in range(rounds):
+        model_response(validate_list(model, docs), model).body
+    return before, (time.process_time() - start) / rounds
+
+
+async def measure(http: httpx.AsyncClient, path: str, requests: int, profile: bool):
+    profiler = cProfile.Profile() if profile else None
+    cpu, wall = time.process_time(), time.perf_counter()
+    if profiler:
+        profiler.enable()
+    for _ in range(requests):
+        resp = await http.get(path)
+        assert resp.status_code == 200, resp.text
+    if profiler:
+        profiler.disable()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    report = None
+    if profiler:
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("tottime").print_stats(15)
+        report = out.getvalue()
+    return cpu / requests, wall / requests, len(resp.content), resp.json(), report
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await seed(db, max(args.limit, 500))
+    await ensure_indexes(db)
+
+    user = {"user_id": "bench-admin", "email": "admin@example.com", "role": "admin"}
+    before = FastAPI()
+    before.include_router(get_legacy_router(db), prefix="/api")
+    after = FastAPI()
+    for router in (get_product_router(db), get_order_router(db), get_review_router(db)):
+        after.include_router(router, prefix="/api")
+    after.dependency_overrides[require_auth] = lambda: user
+
+    mismatched = []
+    for name, model in (("products", Product), ("orders", Order), ("reviews", Review)):
+        docs, _ = await find_page(db[name], {}, "created_at", -1, args.limit)
+        path = f"/api/{name}/?limit={args.limit}"
+        results = {}
+        for label, app in (("before", before), ("after", after)):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+                await measure(http, path, 5, False)
+                results[label] = await measure(http, path, args.requests, args.profile)
+        for label, (cpu, wall, size, _, report) in results.items():
+            print(f"{path:<28} {label:<6} cpu/request={cpu * 1000:7.2f} ms wall/request={wall * 1000:7.2f} ms body={size / 1024:.1f} KiB")
+            if report:
+                print(report)
+        encode_before, encode_after = await measure_encoding(model, docs, args.requests)
+        print(f"{'':<28} cpu saved: {(1 - results['after'][0] / results['before'][0]) * 100:.0f}%; "
+              f"encoding alone {encode_before * 1000:.2f} ms -> {encode_after * 1000:.2f} ms per page")
+        if results["before"][3] != results["after"][3]:
+            mismatched.append(path)
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for path in mismatched:
+        print(f"FAIL: {path} returns different JSON before and after")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--profile", action="store_true")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,176 @@
+"""Variant lookups and the variant-group list: query-and-sort per request vs the variant_groups index.
+
+Seeds --products products in groups of --group-size, with variant names
+mixing decimal, litre and unitless sizes. "before" mounts the old handlers,
+which query products by variant_group, build Product models and sort by the
+digits in the name, and aggregate the whole catalog for the group list.
+"after" mounts the real routes. Both are timed with the catalog cache cold
+and warm. Then the script checks that:
+- variants come back in true size order ("2.5 ML" before "3 ML", "1 L" after "500 ML");
+- a name without a size ("Travel") sorts last instead of failing the request;
+- creating, renaming, moving, deleting and importing products keep
+  variant_groups equal to a full rebuild.
+Exits non-zero if either check fails.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_variant_groups --products 5000 --requests 300
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+from fastapi import APIRouter, FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_products
+from controllers.product_controller import get_product_router
+from models.product_model import Product, ProductCreate, ProductUpdate
+from services.cache_service import catalog_cache
+from services.index_service import ensure_indexes
+from services.product_import_service import ProductImportService
+from services.product_service import ProductService
+from services.variant_group_service import VARIANT_GROUPS_COLLECTION, VariantGroupService, parse_size
+
+COLLECTIONS = ["products", VARIANT_GROUPS_COLLECTION]
+NAMES = ["12 ML", "2.5 ML", "3 ML", "1 L", "500 ML", "6 ML", "3.4 fl oz", "100ml"]
+
+
+def get_legacy_router(db) -> APIRouter:
+    router = APIRouter()
+
+    @router.get("/products/{product_id}/variants", response_model=List[Product])
+    async def variants(product_id: str):
+        product = await db.products.find_one({"id": product_id}, {"_id": 0})
+        if not product or not product.get("variant_group"):
+            return []
+        docs = await db.products.find({"variant_group": product["variant_group"], "id": {"$ne": product_id}}, {"_id": 0}).to_list(100)
+        variants_list = [Product(**doc) for doc in docs]
+        variants_list.sort(key=lambda x: float(''.join(filter(str.isdigit, x.variant_name or '0'))) if x.variant_name else 0)
+        return variants_list
+
+    @router.get("/products/variant-groups/list")
+    async def groups():
+        pipeline = [
+            {"$match": {"variant_group": {"$ne": None, "$exists": True}}},
+            {"$group": {"_id": "$variant_group"}},
+            {"$sort": {"_id": 1}}
+        ]
+        result = await db.products.aggregate(pipeline).to_list(100)
+        return {"variant_groups": [doc["_id"] for doc in result if doc["_id"]]}
+
+    return router
+
+
+async def timed(http: httpx.AsyncClient, paths: List[str], cold: bool):
+    latencies = []
+    if not cold:
+        for path in dict.fromkeys(paths):
+            await http.get(path)
+    for path in paths:
+        if cold:
+            await catalog_cache.invalidate_prefix("product:")
+        start = time.perf_counter()
+        resp = await http.get(path)
+        latencies.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.text
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+async def snapshot(db) -> dict:
+    return {doc["group"]: doc["members"] async for doc in db[VARIANT_GROUPS_COLLECTION].find({}, {"_id": 0})}
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+    await catalog_cache.invalidate_prefix("product:")
+
+    products = make_products(args.products)
+    for n, product in enumerate(products):
+        product["variant_group"] = f"group-{n // args.group_size:05d}"
+        product["variant_name"] = NAMES[n % len(NAMES)]
+    await db.products.insert_many([dict(p) for p in products])
+    groups = VariantGroupService(db)
+    start = time.perf_counter()
+    count = await groups.rebuild()
+    print(f"variant_groups rebuilt: {count} groups in {time.perf_counter() - start:.2f} s")
+
+    before = FastAPI()
+    before.include_router(get_legacy_router(db), prefix="/api")
+    after = FastAPI()
+    after.include_router(get_product_router(db), prefix="/api")
+
+    failures = []
+    variant_paths = [f"/api/products/{products[n * 7 % len(products)]['id']}/variants" for n in range(args.requests)]
+    list_paths = ["/api/products/variant-groups/list"] * max(args.requests // 10, 5)
+    for label, app in (("before", before), ("after", after)):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+            for cold in (True, False):
+                p50, p95 = await timed(http, variant_paths, cold)
+                print(f"variants     {label:<6} cache={'cold' if cold else 'warm'} p50={p50 * 1000:7.2f} ms p95={p95 * 1000:7.2f} ms")
+            p50, p95 = await timed(http, list_paths, False)
+            print(f"group list   {label:<6} p50={p50 * 1000:7.2f} ms p95={p95 * 1000:7.2f} ms")
+
+            names = [v["variant_name"] for v in (await http.get(f"/api/products/{products[0]['id']}/variants")).json()]
+            print(f"{label:<6} variants of a {NAMES[0]} product: {names}")
+            if label == "after":
+                sizes = [parse_size(name)[0] for name in names]
+                sized = [size for size in sizes if size is not None]
+                if sized != sorted(sized) or None in sizes[:len(sized)]:
+                    failures.append(f"variants are not in size order: {names}")
+                listed = (await http.get(list_paths[0])).json()["variant_groups"]
+                if listed != sorted({p["variant_group"] for p in products}):
+                    failures.append("group list does not hold every group")
+
+    service = ProductService(db)
+    created = await service.create_product(ProductCreate(
+        name="New Oud", slug="new-oud", brand="Bench", category_id="c", price=100, description="d",
+        variant_group="group-new", variant_name="7.5 ML"
+    ))
+    await service.update_product(products[1]["id"], ProductUpdate(variant_name="0.5 ML"))
+    # The old sort raised on names without digits
+    await service.update_product(products[5]["id"], ProductUpdate(variant_name="Travel"))
+    await service.update_product(products[2]["id"], ProductUpdate(variant_group="group-new"))
+    await service.delete_product(products[3]["id"])
+    for product in products[args.group_size:args.group_size * 2]:
+        await service.delete_product(product["id"])
+    await ProductImportService(db).import_rows([
+        (1, {"name": "Imported", "slug": products[4]["slug"], "brand": "Bench", "category_id": "c", "price": 10,
+             "description": "d", "variant_group": "group-imported", "variant_name": "30 ML"}, None),
+    ])
+    maintained = await snapshot(db)
+    await groups.rebuild()
+    rebuilt = await snapshot(db)
+    if maintained != rebuilt:
+        failures.append(f"{sum(1 for g in set(maintained) | set(rebuilt) if maintained.get(g) != rebuilt.get(g))} groups drifted from a full rebuild")
+    if "group-new" not in maintained or created.id not in [m["id"] for m in maintained["group-new"]]:
+        failures.append("a created product's group was not indexed")
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=after), base_url="http://bench") as http:
+        names = [v["variant_name"] for v in (await http.get(f"/api/products/{products[0]['id']}/variants")).json()]
+        if names[-1:] != ["Travel"]:
+            failures.append(f"a variant without a size is not listed last: {names}")
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--group-size", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=300)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
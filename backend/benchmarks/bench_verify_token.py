@@ -0,0 +1,98 @@
+"""Requests per second on an authenticated endpoint, before and after the verified-token cache.
+
+"before" replays the old dependency chain: sync verify_token and require_auth
+run on the threadpool, decode the JWT every time and print nine debug lines
+(sent to /dev/null here, so terminal cost is not counted). "no cache" is the
+new path with TOKEN_CACHE_MAX_ENTRIES=0, "cached" the default.
+No database needed. Run from the backend directory:
+    python -m benchmarks.bench_verify_token --requests 20000 --sessions 50
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import time
+
+import httpx
+import jwt
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials
+
+import decorators.authentication as authentication
+from decorators.authentication import ALGORITHM, SECRET_KEY, create_access_token, security
+from decorators.authorization import require_auth
+from services.cache_service import TTLCache
+
+
+def legacy_verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    print(f"DEBUG: Token received: {token[:20]}...")
+    print(f"DEBUG: SECRET_KEY: {SECRET_KEY}")
+    print(f"DEBUG: ALGORITHM: {ALGORITHM}")
+    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    print(f"DEBUG: Decoded payload: {payload}")
+    user_id, email, role = payload.get("sub"), payload.get("email"), payload.get("role")
+    print(f"DEBUG: user_id={user_id}, email={email}, role={role}")
+    if user_id is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
+    return {"user_id": user_id, "email": email, "role": role}
+
+
+def legacy_require_auth(current_user: dict = Depends(legacy_verify_token)):
+    return current_user
+
+
+async def measure(app: FastAPI, tokens: list, requests: int, concurrency: int) -> float:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        async def worker(offset: int):
+            for i in range(offset, requests, concurrency):
+                resp = await http.get("/me", headers={"Authorization": f"Bearer {tokens[i % len(tokens)]}"})
+                assert resp.status_code == 200, resp.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(offset) for offset in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main(args):
+    app = FastAPI()
+
+    @app.get("/me")
+    async def me(current_user: dict = Depends(require_auth)):
+        return current_user
+
+    tokens = [create_access_token({"sub": f"user-{i}", "email": f"user{i}@example.com", "role": "customer"}) for i in range(args.sessions)]
+
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        app.dependency_overrides[require_auth] = legacy_require_auth
+        results["before"] = await measure(app, tokens, args.requests, args.concurrency)
+        app.dependency_overrides.clear()
+
+    authentication._verified_tokens = TTLCache(max_entries=0)
+    results["no cache"] = await measure(app, tokens, args.requests, args.concurrency)
+    authentication._verified_tokens = TTLCache(max_entries=authentication.TOKEN_CACHE_MAX_ENTRIES, ttl=authentication.TOKEN_CACHE_TTL_SECONDS)
+    results["cached"] = await measure(app, tokens, args.requests, args.concurrency)
+
+    for label, rps in results.items():
+        print(f"{label:<9} {rps:8.0f} req/s  ({rps / results['before']:.2f}x)")
+
+    # The dependency alone, without the HTTP stack
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=tokens[0])
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        authentication._decode_claims(tokens[0])
+    decode_us = (time.perf_counter() - start) / args.requests * 1e6
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        await authentication.verify_token(credentials)
+    cached_us = (time.perf_counter() - start) / args.requests * 1e6
+    print(f"verify_token: decode {decode_us:.1f} us, cache hit {cached_us:.1f} us")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=50, help="distinct tokens in rotation")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,123 @@
+"""Duplicate webhook storm: --webhooks PhonePe success callbacks spread over --orders orders.
+
+Every order gets the same completed callback --webhooks / --orders times, sent
+concurrently and shuffled, while the inbox consumer runs alongside as it does
+in the server. Reports acknowledgement latency and how long the consumer took
+to settle, then checks each order was confirmed exactly once: one inbox entry,
+payment completed and a single confirmed tracking update. Exits non-zero if
+not.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_webhook_storm --webhooks 10000 --orders 1000 --concurrency 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_orders, make_products
+from controllers.order_controller import get_order_router
+from services.index_service import ensure_indexes
+from services.webhook_inbox_service import INBOX_COLLECTION, PENDING, PROCESSING, WebhookInboxService
+
+COLLECTIONS = ["orders", "products", INBOX_COLLECTION, "sales_daily", "sales_daily_products", "sales_daily_categories"]
+
+
+def callback(order_id: str) -> str:
+    return json.dumps({
+        "event": "checkout.order.completed",
+        "payload": {
+            "merchantOrderId": order_id,
+            "state": "COMPLETED",
+            "paymentDetails": [{"transactionId": f"T-{order_id}", "paymentMode": "UPI_INTENT"}],
+        },
+    })
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+
+    products = make_products(200)
+    await db.products.insert_many([dict(p) for p in products])
+    orders = make_orders(args.orders, products, ["bench-user"])
+    for order in orders:
+        order["payment_status"] = order["order_status"] = "pending"
+    await db.orders.insert_many(orders)
+
+    bodies = [callback(order["id"]) for order in orders for _ in range(args.webhooks // args.orders)]
+    random.Random(3).shuffle(bodies)
+
+    app = FastAPI()
+    app.include_router(get_order_router(db), prefix="/api")
+    inbox = WebhookInboxService(db)
+    consumer = asyncio.create_task(inbox.run_consumer(poll_interval=0.5))
+
+    gate = asyncio.Semaphore(args.concurrency)
+    latencies, replies = [], Counter()
+
+    async def send(http: httpx.AsyncClient, body: str):
+        async with gate:
+            start = time.perf_counter()
+            resp = await http.post("/api/orders/phonepe-webhook", content=body, headers={"Content-Type": "application/json"})
+            latencies.append(time.perf_counter() - start)
+            reply = resp.json()
+            replies["duplicate" if reply.get("duplicate") else ("new" if resp.status_code == 200 and reply.get("success") else f"error {resp.status_code}")] += 1
+
+    start = time.perf_counter()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        await asyncio.gather(*(send(http, body) for body in bodies))
+    sent = time.perf_counter() - start
+
+    while await db[INBOX_COLLECTION].count_documents({"status": {"$in": [PENDING, PROCESSING]}}):
+        await asyncio.sleep(0.05)
+    settled = time.perf_counter() - start
+    consumer.cancel()
+
+    latencies.sort()
+    print(f"{len(bodies)} webhooks for {args.orders} orders sent in {sent:.2f} s ({len(bodies) / sent:.0f}/s): {dict(replies)}")
+    print(f"ack p50={statistics.median(latencies) * 1000:.2f} ms p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f} ms; "
+          f"inbox settled after {settled:.2f} s")
+
+    entries = await db[INBOX_COLLECTION].count_documents({})
+    paid = await db.orders.count_documents({"payment_status": "completed"})
+    tracking = Counter()
+    async for order in db.orders.find({}, {"_id": 0, "tracking_updates": 1}):
+        tracking[sum(1 for update in order["tracking_updates"] if update["status"] == "confirmed")] += 1
+    print(f"inbox entries={entries} paid orders={paid} confirmed-updates-per-order={dict(tracking)}")
+
+    failures = []
+    if entries != args.orders:
+        failures.append(f"expected {args.orders} inbox entries, found {entries}")
+    if paid != args.orders:
+        failures.append(f"expected {args.orders} paid orders, found {paid}")
+    if set(tracking) != {1}:
+        failures.append("some orders were confirmed more or less than once")
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--webhooks", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,134 @@
+"""Wishlist membership for a listing page: one check per card vs one batch check.
+
+Seeds --products products and --users users. Each user has an embedded
+wishlist array the way wishlists used to be stored, and the script migrates
+it into wishlist_items (twice, to check the migration is idempotent). Then,
+for --pages listing pages of --cards products, it marks each card either with
+a GET /wishlist/check/{id} per card, fired concurrently like the cards
+render, or with a single POST /wishlist/check. Reports page latency for both
+and checks they agree with the migrated wishlists. Also checks that
+concurrent adds of one product leave a single item and that add/remove
+report what they did. Exits non-zero if any of that fails.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). Run from
+the backend directory:
+    python -m benchmarks.bench_wishlist_check --products 2000 --users 200 --cards 24 --pages 100
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from benchmarks.synthetic import make_products
+from controllers.wishlist_controller import get_wishlist_router
+from decorators.authorization import require_auth
+from services.index_service import ensure_indexes
+from services.wishlist_service import WISHLIST_COLLECTION, WishlistService
+
+COLLECTIONS = ["products", "users", WISHLIST_COLLECTION]
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * q) - 1, 0)]
+
+
+async def main(args) -> int:
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client[os.environ.get("BENCH_DB_NAME", "mfrida_bench")]
+    for name in COLLECTIONS:
+        await db[name].drop()
+    await ensure_indexes(db)
+
+    rng = random.Random(7)
+    products = make_products(args.products)
+    await db.products.insert_many([dict(p) for p in products])
+    product_ids = [p["id"] for p in products]
+    wishlists = {f"user-{n}": rng.sample(product_ids, rng.randrange(0, 60)) for n in range(args.users)}
+    await db.users.insert_many([
+        {"id": user_id, "email": f"{user_id}@example.com", "name": user_id, "password_hash": "x" * 60,
+         "addresses": [{"street": "1 Main St", "city": "Pune", "state": "MH", "postal_code": "411001", "phone": "9999999999"}] * 3,
+         "wishlist": wishlist}
+        for user_id, wishlist in wishlists.items()
+    ])
+
+    failures = []
+    service = WishlistService(db)
+    start = time.perf_counter()
+    counts = await service.migrate_embedded()
+    migrated = time.perf_counter() - start
+    again = await service.migrate_embedded()
+    items = await db[WISHLIST_COLLECTION].count_documents({})
+    print(f"migrated {counts['items']} items from {counts['users']} users in {migrated:.2f} s; second run moved {again['items']}")
+    if items != sum(len(w) for w in wishlists.values()) or again["items"]:
+        failures.append(f"migration left {items} items, expected {sum(len(w) for w in wishlists.values())}")
+    if await db.users.count_documents({"wishlist": {"$exists": True}}):
+        failures.append("embedded wishlist arrays were not removed")
+    user_id = max(wishlists, key=lambda u: len(wishlists[u]))
+    listed = [p.id for p in await service.get_wishlist(user_id)]
+    if listed != list(reversed(wishlists[user_id])):
+        failures.append("migrated wishlist is not newest-first in the original order")
+
+    app = FastAPI()
+    app.include_router(get_wishlist_router(db), prefix="/api")
+    current = {}
+    app.dependency_overrides[require_auth] = lambda: current
+
+    per_card, batch = [], []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        for _ in range(args.pages):
+            user_id = rng.choice(list(wishlists))
+            current.update({"user_id": user_id, "email": f"{user_id}@example.com", "role": "customer"})
+            page = rng.sample(product_ids, args.cards - 4) + wishlists[user_id][:4]
+            expected = {pid: pid in wishlists[user_id] for pid in page}
+
+            start = time.perf_counter()
+            replies = await asyncio.gather(*(http.get(f"/api/wishlist/check/{pid}") for pid in page))
+            per_card.append(time.perf_counter() - start)
+            if {pid: reply.json()["in_wishlist"] for pid, reply in zip(page, replies)} != expected:
+                failures.append(f"per-card checks disagree with the wishlist of {user_id}")
+
+            start = time.perf_counter()
+            reply = await http.post("/api/wishlist/check", json={"product_ids": page})
+            batch.append(time.perf_counter() - start)
+            if reply.json()["in_wishlist"] != expected:
+                failures.append(f"batch check disagrees with the wishlist of {user_id}")
+
+        current.update({"user_id": "bench-new-user", "email": "new@example.com", "role": "customer"})
+        adds = await asyncio.gather(*(http.post("/api/wishlist/add", json={"product_id": product_ids[0]}) for _ in range(20)))
+        added = sum(1 for reply in adds if reply.json()["message"] == "Product added to wishlist")
+        if added != 1 or await db[WISHLIST_COLLECTION].count_documents({"user_id": "bench-new-user"}) != 1:
+            failures.append(f"20 concurrent adds reported {added} additions")
+        removed = [(await http.post("/api/wishlist/remove", json={"product_id": product_ids[0]})).json()["message"] for _ in range(2)]
+        if removed != ["Product removed from wishlist", "Product not in wishlist"]:
+            failures.append(f"remove replied {removed}")
+        if (await http.post("/api/wishlist/add", json={"product_id": "missing"})).status_code != 404:
+            failures.append("adding a missing product did not 404")
+
+    for label, latencies, requests in (("per card", per_card, args.cards), ("batch", batch, 1)):
+        print(f"{label:<9} {requests:3} requests/page p50={statistics.median(latencies) * 1000:7.2f} ms "
+              f"p95={percentile(latencies, 0.95) * 1000:7.2f} ms")
+    print(f"batch check is {statistics.median(per_card) / statistics.median(batch):.1f}x faster per page")
+
+    for name in COLLECTIONS:
+        await db[name].drop()
+    client.close()
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--cards", type=int, default=24)
+    parser.add_argument("--pages", type=int, default=100)
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
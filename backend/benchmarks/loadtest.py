@@ -0,0 +1,428 @@
+"""Load test: scripted shopper journeys against the whole app, compared with a stored baseline.
+
+Seeds a throwaway database with a synthetic catalog (--categories,
+--products with variant groups, images and frequently-bought lists,
+--reviews-per-product, --users and --orders), then starts server.app
+itself, startup hooks and middleware included, with PhonePe pointed at the
+mock server (--phonepe-latency per call). After --warmup unrecorded
+journeys, --concurrency shoppers work through --journeys journeys, --rounds
+times over:
+
+    session   most shoppers are signed in already; --login-ratio log in
+              and --signup-ratio sign up first, then GET /auth/me
+    browse    categories, a category listing (sometimes its second page),
+              its facets, and sometimes a search
+    product   a product page from the listing and its reviews
+    wishlist  the listing's wishlist marks, sometimes an add, the wishlist
+    checkout  for --checkout-ratio of journeys: create an order, start the
+              PhonePe payment, verify it, then the order history
+
+Every request is timed from the client and labelled with its route. For each
+route it reports requests, RPS, p50/p95/p99 latency and Mongo round trips
+per request (from the X-Mongo-Profile header), each the median over the
+rounds.
+
+The result is compared with --baseline (benchmarks/loadtest_baseline.json):
+a route fails if a latency percentile grew by more than --tolerance and
+--min-delta-ms, its RPS fell by more than --tolerance, or it makes more
+round trips than before; a percentile is only judged once the route has
+enough requests for it (200 for p99), and routes with fewer than 20
+requests a round are not judged. Any error response, a verified order
+left unpaid or a missing baseline file also fails the run. --save-baseline
+records this run as the new baseline instead; baselines only compare on the
+machine and with the workload flags they were recorded with, so record one
+per machine.
+
+Needs a local mongod (MONGO_URL, default mongodb://localhost:27017). The
+BENCH_DB_NAME database (default mfrida_bench) is dropped before and after.
+Run from the backend directory:
+    python -m benchmarks.loadtest --save-baseline
+    python -m benchmarks.loadtest
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+from benchmarks.mock_phonepe import create_mock_phonepe_app, free_port, start_mock_phonepe
+from benchmarks.synthetic import NOTES, make_categories, make_orders, make_products, make_reviews, make_users
+
+PASSWORD = "bench-password"
+ADDRESS = {"street": "1 MG Road", "city": "Pune", "state": "MH", "postal_code": "411001", "phone": "9999999999"}
+PROFILE_HEADER = re.compile(r"mongo_ops=(\d+), mongo_ms=([\d.]+)")
+DEFAULT_BASELINE = Path(__file__).with_name("loadtest_baseline.json")
+# Flags that change what is measured; a baseline only compares with runs that share them
+WORKLOAD_FLAGS = (
+    "categories", "products", "reviews_per_product", "users", "orders", "journeys", "rounds", "warmup", "concurrency",
+    "login_ratio", "signup_ratio", "checkout_ratio", "phonepe_latency", "seed",
+)
+MAX_RETRIES = 5
+# Routes with fewer requests per round are reported but too thin to judge
+MIN_REQUESTS = 20
+
+
+def percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[max(int(len(values) * q) - 1, 0)]
+
+
+class Recorder:
+    """Sends requests and keeps, per route label, latencies, statuses and Mongo round trips"""
+
+    def __init__(self, http: httpx.AsyncClient):
+        self.http = http
+        self.recording = False
+        self.latencies = defaultdict(list)
+        self.mongo_ops = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = []
+
+    def start_round(self):
+        """Record from here on; latencies and round trips start over, statuses and errors add up"""
+        self.recording = True
+        self.latencies.clear()
+        self.mongo_ops.clear()
+
+    async def call(self, label: str, method: str, path: str, ok=(200,), **kwargs) -> httpx.Response:
+        """One request; a 503 with Retry-After (load shedding) is counted and retried like a browser would"""
+        for _ in range(MAX_RETRIES):
+            start = time.perf_counter()
+            resp = await self.http.request(method, path, **kwargs)
+            elapsed = time.perf_counter() - start
+            if self.recording:
+                self.statuses[label][resp.status_code] += 1
+                if resp.status_code in ok:
+                    self.latencies[label].append(elapsed)
+                    match = PROFILE_HEADER.fullmatch(resp.headers.get("x-mongo-profile", ""))
+                    if match:
+                        self.mongo_ops[label].append(int(match.group(1)))
+            if resp.status_code != 503 or "retry-after" not in resp.headers:
+                break
+            await asyncio.sleep(float(resp.headers["retry-after"]))
+        if resp.status_code not in ok and self.recording:
+            self.errors.append(f"{label}: {method} {path} returned {resp.status_code}: {resp.text[:200]}")
+        return resp
+
+
+class Catalog:
+    def __init__(self, categories: list, products: list, users: list):
+        self.category_ids = [c["id"] for c in categories]
+        self.products = products
+        self.users = users
+
+
+async def seed(db, args) -> Catalog:
+    from services.password_service import PasswordHasher
+    from services.rating_service import RatingService
+
+    rng = random.Random(args.seed)
+    categories = make_categories(args.categories, seed=args.seed)
+    products = make_products(args.products, [c["id"] for c in categories], seed=args.seed)
+    ids = [p["id"] for p in products]
+    for product in products:
+        product["related_products"] = rng.sample(ids, min(4, len(ids)))
+    # Every shopper gets the same password, so it is hashed once
+    password_hash = await PasswordHasher(workers=0).hash(PASSWORD)
+    users = make_users(args.users, password_hash, seed=args.seed)
+
+    await db.categories.insert_many([dict(c) for c in categories])
+    await db.products.insert_many([dict(p) for p in products])
+    await db.product_images.insert_many([
+        {"id": f"{p['id']}-{n}", "product_id": p["id"], "image_url": f"/api/uploads/products/{p['slug']}-{n}.webp", "is_primary": n == 0, "sort_order": n}
+        for p in products for n in range(3)
+    ])
+    await db.frequently_bought_together.insert_many([
+        {"id": f"fbt-{p['id']}", "product_id": p["id"], "related_product_ids": rng.sample(ids, min(4, len(ids)))}
+        for p in products
+    ])
+    await db.users.insert_many([dict(u) for u in users])
+    reviews = make_reviews(products, users, args.reviews_per_product, seed=args.seed)
+    if reviews:
+        await db.reviews.insert_many(reviews)
+    if args.orders:
+        await db.orders.insert_many(make_orders(args.orders, products, [u["id"] for u in users], seed=args.seed))
+    await RatingService(db).reconcile()
+    print(f"seeded {len(categories)} categories, {len(products)} products, {len(reviews)} reviews, "
+          f"{len(users)} users, {args.orders} orders")
+    return Catalog(categories, products, users)
+
+
+async def journey(recorder: Recorder, catalog: Catalog, n: int, args, paid_orders: list):
+    from decorators.authentication import create_access_token
+
+    rng = random.Random(args.seed * 1_000_003 + n)
+    call = recorder.call
+
+    # Session
+    user = rng.choice(catalog.users)
+    roll = rng.random()
+    if roll < args.signup_ratio:
+        resp = await call("POST /api/auth/signup", "POST", "/api/auth/signup", json={
+            "email": f"journey{n}-{args.seed}@example.com", "name": f"Journey {n}", "password": PASSWORD,
+        })
+        token = resp.json().get("token") if resp.status_code == 200 else None
+    elif roll < args.signup_ratio + args.login_ratio:
+        resp = await call("POST /api/auth/login", "POST", "/api/auth/login", json={"email": user["email"], "password": PASSWORD})
+        token = resp.json().get("token") if resp.status_code == 200 else None
+    else:
+        token = create_access_token({"sub": user["id"], "email": user["email"], "role": user["role"]})
+    if not token:
+        return
+    headers = {"Authorization": f"Bearer {token}"}
+    await call("GET /api/auth/me", "GET", "/api/auth/me", headers=headers)
+
+    # Browse
+    await call("GET /api/categories/", "GET", "/api/categories/")
+    category_id = rng.choice(catalog.category_ids)
+    listing = f"/api/products/?category_id={category_id}&view=card&limit=24"
+    resp = await call("GET /api/products/", "GET", listing)
+    cards = resp.json() if resp.status_code == 200 else []
+    next_cursor = resp.headers.get("x-next-cursor")
+    if next_cursor and rng.random() < 0.3:
+        resp = await call("GET /api/products/", "GET", f"{listing}&cursor={next_cursor}")
+        if resp.status_code == 200:
+            cards += resp.json()
+    await call("GET /api/products/facets", "GET", f"/api/products/facets?category_id={category_id}")
+    if rng.random() < 0.3:
+        resp = await call("GET /api/products/ (search)", "GET", f"/api/products/?search={rng.choice(NOTES)}&view=card&limit=24")
+        if resp.status_code == 200:
+            cards += resp.json()
+    if not cards:
+        return
+
+    # Product page
+    product = rng.choice(cards)
+    await call("GET /api/products/slug/{slug}/page", "GET", f"/api/products/slug/{product['slug']}/page")
+    await call("GET /api/reviews/", "GET", f"/api/reviews/?product_id={product['id']}&is_approved=true&limit=20")
+
+    # Wishlist
+    await call("POST /api/wishlist/check", "POST", "/api/wishlist/check", headers=headers,
+               json={"product_ids": [card["id"] for card in cards[:200]]})
+    if rng.random() < 0.5:
+        await call("POST /api/wishlist/add", "POST", "/api/wishlist/add", headers=headers, json={"product_id": product["id"]})
+    await call("GET /api/wishlist/", "GET", "/api/wishlist/?view=card", headers=headers)
+
+    # Checkout
+    if rng.random() >= args.checkout_ratio:
+        return
+    in_stock = [card for card in cards if card.get("stock", 0) > 0]
+    if not in_stock:
+        return
+    items = [{"product_id": card["id"], "quantity": 1} for card in rng.sample(in_stock, min(len(in_stock), rng.randint(1, 2)))]
+    # A sold-out item is refused with 409, which is the shop working, not failing
+    resp = await call("POST /api/orders/", "POST", "/api/orders/", ok=(200, 409), headers=headers,
+                      json={"items": items, "shipping_address": ADDRESS})
+    if resp.status_code != 200:
+        return
+    order_id = resp.json()["id"]
+    resp = await call("POST /api/orders/create-phonepe-payment", "POST", f"/api/orders/create-phonepe-payment?order_id={order_id}", headers=headers)
+    if resp.status_code != 200:
+        return
+    resp = await call("POST /api/orders/verify-phonepe-payment", "POST", "/api/orders/verify-phonepe-payment",
+                      headers=headers, json={"order_id": order_id})
+    if resp.status_code == 200 and resp.json().get("success") and recorder.recording:
+        paid_orders.append(order_id)
+    await call("GET /api/orders/", "GET", "/api/orders/?limit=20", headers=headers)
+
+
+async def run_journeys(recorder: Recorder, catalog: Catalog, first: int, count: int, args, paid_orders: list):
+    numbers = iter(range(first, first + count))
+
+    async def shopper():
+        for n in numbers:
+            await journey(recorder, catalog, n, args, paid_orders)
+
+    await asyncio.gather(*(shopper() for _ in range(args.concurrency)))
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    routes = {}
+    for label, latencies in sorted(recorder.latencies.items()):
+        ops = recorder.mongo_ops.get(label)
+        routes[label] = {
+            "requests": len(latencies),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "mongo_ops": percentile(ops, 0.50) if ops else None,
+        }
+    requests = sum(route["requests"] for route in routes.values())
+    return {"elapsed_s": round(elapsed, 2), "rps": round(requests / elapsed, 2), "requests": requests, "routes": routes}
+
+
+def median_of(rounds: list) -> dict:
+    """Each figure's median over the rounds, so one disturbed round can't make or hide a regression"""
+    routes = {}
+    for label in sorted({label for result in rounds for label in result["routes"]}):
+        measured = [result["routes"][label] for result in rounds if label in result["routes"]]
+        routes[label] = {
+            key: None if any(route[key] is None for route in measured) else statistics.median(route[key] for route in measured)
+            for key in ("requests", "rps", "p50_ms", "p95_ms", "p99_ms", "mongo_ops")
+        }
+    return {
+        "elapsed_s": round(sum(result["elapsed_s"] for result in rounds), 2),
+        "rps": statistics.median(result["rps"] for result in rounds),
+        "requests": sum(result["requests"] for result in rounds),
+        "routes": routes,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    """Regressions of `result` against `baseline`, one message each"""
+    regressions = []
+    for label, base in baseline["routes"].items():
+        current = result["routes"].get(label)
+        if current is None:
+            regressions.append(f"{label}: in the baseline but not exercised by this run")
+            continue
+        if current["requests"] < MIN_REQUESTS:
+            continue
+        for key, q in (("p50_ms", 0.50), ("p95_ms", 0.95), ("p99_ms", 0.99)):
+            # Without a couple of requests above it, the percentile is just the slowest one
+            if current["requests"] * (1 - q) < 2:
+                continue
+            if current[key] > base[key] * (1 + tolerance) and current[key] - base[key] > min_delta_ms:
+                regressions.append(f"{label}: {key[:3]} {base[key]:.1f} -> {current[key]:.1f} ms "
+                                   f"(+{(current[key] / base[key] - 1) * 100:.0f}%)")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{label}: {base['rps']:.1f} -> {current['rps']:.1f} requests/s")
+        if base["mongo_ops"] is not None and current["mongo_ops"] is not None and current["mongo_ops"] > base["mongo_ops"]:
+            regressions.append(f"{label}: {base['mongo_ops']} -> {current['mongo_ops']} Mongo round trips per request")
+    if result["rps"] < baseline["rps"] * (1 - tolerance):
+        regressions.append(f"overall: {baseline['rps']:.1f} -> {result['rps']:.1f} requests/s")
+    return regressions
+
+
+def print_report(result: dict, recorder: Recorder, baseline: dict = None):
+    base_routes = baseline["routes"] if baseline else {}
+    print(f"{'route':<44} {'reqs':>6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mongo':>5}  non-200")
+    for label, route in result["routes"].items():
+        others = {code: n for code, n in recorder.statuses[label].items() if code != 200}
+        mongo = "-" if route["mongo_ops"] is None else f"{route['mongo_ops']:g}"
+        line = (f"{label:<44} {route['requests']:>6.0f} {route['rps']:>8.1f} {route['p50_ms']:>8.1f} "
+                f"{route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f} {mongo:>5}  {others or ''}")
+        base = base_routes.get(label)
+        if base:
+            line += f"  (p95 {(route['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}% vs baseline)"
+        print(line)
+    print(f"{result['requests']} requests in {result['elapsed_s']:.2f} s, {result['rps']:.1f} requests/s")
+
+
+async def main(args) -> int:
+    # server.py connects on import, so point it at the throwaway database first
+    os.environ["MONGO_URL"] = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+    os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "mfrida_bench")
+    os.environ.setdefault("MONGO_PROFILE_HEADER", "true")
+    # An access-log line per request would bury the report; LOG_LEVEL=INFO measures with it
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import server
+    from services.phonepe_service import phonepe_client
+
+    db = server.db
+    await db.client.drop_database(db.name)
+    catalog = await seed(db, args)
+
+    mock = create_mock_phonepe_app(latency=args.phonepe_latency)
+    port = free_port()
+    mock_server = await start_mock_phonepe(mock, port)
+    phonepe_client.base_url = f"http://127.0.0.1:{port}"
+    phonepe_client.auth_url = f"http://127.0.0.1:{port}/v1/oauth/token"
+    phonepe_client.client_id = phonepe_client.client_id or "bench-client"
+    phonepe_client.client_secret = phonepe_client.client_secret or "bench-secret"
+
+    # Index, search index, variant group and cache bootstrap plus the background workers, as in production
+    await server.app.router.startup()
+
+    paid_orders = []
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://bench", limits=limits, timeout=None) as http:
+        recorder = Recorder(http)
+        await run_journeys(recorder, catalog, 0, args.warmup, args, paid_orders)
+        rounds = []
+        for n in range(args.rounds):
+            recorder.start_round()
+            start = time.perf_counter()
+            await run_journeys(recorder, catalog, args.warmup + n * args.journeys, args.journeys, args, paid_orders)
+            rounds.append(summarize(recorder, time.perf_counter() - start))
+
+    unpaid = 0
+    if paid_orders:
+        unpaid = len(paid_orders) - await db.orders.count_documents({"id": {"$in": paid_orders}, "payment_status": "completed"})
+
+    mock_server.should_exit = True
+    await mock.state.serve_task
+    await db.client.drop_database(db.name)
+    await server.app.router.shutdown()
+
+    result = median_of(rounds)
+    result["workload"] = {flag: getattr(args, flag) for flag in WORKLOAD_FLAGS}
+    result["machine"] = {"host": platform.node(), "cpus": os.cpu_count(), "python": platform.python_version()}
+
+    failures = list(recorder.errors[:20])
+    if len(recorder.errors) > 20:
+        failures.append(f"... and {len(recorder.errors) - 20} more error responses")
+    if unpaid:
+        failures.append(f"{unpaid} of {len(paid_orders)} verified orders are not marked paid")
+
+    baseline = None
+    if not args.save_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    print_report(result, recorder, baseline)
+    print(f"{len(paid_orders)} orders paid through PhonePe, mock saw {mock.state.stats.status_requests} status checks")
+
+    if args.save_baseline:
+        if failures:
+            failures.append("not saving a baseline from a failing run")
+        else:
+            args.baseline.write_text(json.dumps(result, indent=2, sort_keys=True) + "\n")
+            print(f"baseline saved to {args.baseline}")
+    elif baseline is None:
+        failures.append(f"no baseline at {args.baseline}; record one with --save-baseline")
+    else:
+        mismatched = [
+            f"{flag}={baseline['workload'].get(flag)} (now {value})"
+            for flag, value in result["workload"].items() if baseline["workload"].get(flag) != value
+        ]
+        if mismatched:
+            failures.append(f"baseline was recorded with a different workload: {', '.join(mismatched)}")
+        elif baseline["machine"] != result["machine"]:
+            failures.append(f"baseline was recorded on another machine: {baseline['machine']}")
+        else:
+            failures.extend(compare(result, baseline, args.tolerance, args.min_delta_ms))
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--reviews-per-product", type=int, default=5, help="average; each product gets 0 to twice this")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--orders", type=int, default=2000, help="order history seeded before the run")
+    parser.add_argument("--journeys", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3, help="times the journeys are run; each figure is the median over rounds")
+    parser.add_argument("--warmup", type=int, default=20, help="journeys run first and left out of the results")
+    parser.add_argument("--concurrency", type=int, default=20, help="shoppers on the site at once")
+    parser.add_argument("--login-ratio", type=float, default=0.1)
+    parser.add_argument("--signup-ratio", type=float, default=0.02)
+    parser.add_argument("--checkout-ratio", type=float, default=0.3)
+    parser.add_argument("--phonepe-latency", type=float, default=0.1, help="seconds each mock PhonePe call takes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown, as a fraction of the baseline")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="latency growth below this never fails")
+    raise SystemExit(asyncio.run(main(parser.parse_args())))
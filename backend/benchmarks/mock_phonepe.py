@@ -0,0 +1,95 @@
+"""A stand-in for the PhonePe PG v2 API with configurable latency.
+
+Implements the OAuth token, pay and order-status endpoints PhonePeService
+uses, and counts concurrent requests so tests can tell whether calls overlap.
+Point the backend at it with:
+    PHONEPE_BASE_URL=http://127.0.0.1:8765 PHONEPE_AUTH_URL=http://127.0.0.1:8765/v1/oauth/token
+Run standalone from the backend directory:
+    python -m benchmarks.mock_phonepe --port 8765 --latency 0.5
+"""
+import argparse
+import asyncio
+import socket
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Form, Request
+
+
+class MockPhonePeStats:
+    def __init__(self):
+        self.token_requests = 0
+        self.pay_requests = 0
+        self.status_requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+
+def create_mock_phonepe_app(latency: float = 0.0, state: str = "COMPLETED", token_ttl: int = 3600, states: dict = None) -> FastAPI:
+    """`states` maps merchant order ids to a state; others get `state`"""
+    app = FastAPI(title="Mock PhonePe")
+    app.state.stats = stats = MockPhonePeStats()
+    states = states if states is not None else {}
+    app.state.order_states = states
+
+    async def simulate_latency():
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            await asyncio.sleep(latency)
+        finally:
+            stats.in_flight -= 1
+
+    @app.post("/v1/oauth/token")
+    async def token(client_id: str = Form(...), client_secret: str = Form(...), grant_type: str = Form(...)):
+        stats.token_requests += 1
+        await simulate_latency()
+        return {"access_token": f"mock-{uuid.uuid4().hex}", "expires_at": int(time.time()) + token_ttl}
+
+    @app.post("/checkout/v2/pay")
+    async def pay(request: Request):
+        stats.pay_requests += 1
+        await simulate_latency()
+        body = await request.json()
+        return {
+            "orderId": f"OMO{uuid.uuid4().hex[:20].upper()}",
+            "state": "PENDING",
+            "redirectUrl": f"https://mercury-uat.phonepe.com/transact/mock?order={body['merchantOrderId']}",
+        }
+
+    @app.get("/checkout/v2/order/{merchant_order_id}/status")
+    async def order_status(merchant_order_id: str):
+        stats.status_requests += 1
+        await simulate_latency()
+        order_state = states.get(merchant_order_id, state)
+        details = []
+        if order_state != "PENDING":
+            details = [{"transactionId": f"T{merchant_order_id[:12]}", "paymentMode": "UPI_QR", "state": order_state}]
+        return {"orderId": f"OMO{merchant_order_id[:12]}", "state": order_state, "amount": 49900, "paymentDetails": details}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_mock_phonepe(app: FastAPI, port: int) -> uvicorn.Server:
+    """Serve `app` on 127.0.0.1:port inside the running loop; stop it with `server.should_exit = True`"""
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off"))
+    app.state.serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds each call takes")
+    parser.add_argument("--state", default="COMPLETED", help="order state returned by the status endpoint")
+    args = parser.parse_args()
+    uvicorn.run(create_mock_phonepe_app(args.latency, args.state), host="127.0.0.1", port=args.port)
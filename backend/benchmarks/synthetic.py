@@ -0,0 +1,165 @@
+"""Synthetic catalog data shared by the benchmark scripts"""
+from datetime import datetime, timezone, timedelta
+import random
+import uuid
+
+BRANDS = ["Mfrida", "Al Haramain", "Ajmal", "Rasasi", "Swiss Arabian", "Lattafa", "Armaf", "Nabeel"]
+NOTES = [
+    "oud", "rose", "musk", "amber", "sandalwood", "jasmine", "vanilla", "saffron", "vetiver",
+    "bergamot", "patchouli", "leather", "citrus", "lavender", "tobacco", "incense", "cedar", "iris",
+]
+ADJECTIVES = ["royal", "midnight", "golden", "velvet", "desert", "mystic", "white", "black", "noble", "silk"]
+FORMS = ["Attar", "Eau de Parfum", "Perfume Spray", "Bakhoor", "Body Mist"]
+VOLUMES = ["3 ML", "6 ML", "8 ML", "12 ML", "20 ML", "50 ML", "100 ML"]
+
+
+def make_products(count: int, category_ids=None, seed: int = 42):
+    """Build `count` product documents shaped like ProductService.create_product output"""
+    rng = random.Random(seed)
+    category_ids = category_ids or [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(5)]
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    products = []
+
+    for i in range(count):
+        notes = rng.sample(NOTES, 3)
+        name = f"{rng.choice(ADJECTIVES).title()} {notes[0].title()} {rng.choice(FORMS)} {i}"
+        price = float(rng.randrange(199, 9999))
+        discount = float(rng.choice([0, 0, 5, 10, 15, 20, 30]))
+        created = (start + timedelta(minutes=i)).isoformat()
+        group = f"group-{i // 4}" if i % 3 == 0 else None
+        products.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": name,
+            "slug": f"product-{i}",
+            "brand": rng.choice(BRANDS),
+            "category_id": rng.choice(category_ids),
+            "price": price,
+            "discount": discount,
+            "final_price": round(price * (1 - discount / 100), 2),
+            "images": [f"/api/uploads/products/{i}.webp"],
+            "stock": rng.randrange(0, 200),
+            "description": f"A {notes[1]} and {notes[2]} blend with a {rng.choice(ADJECTIVES)} {notes[0]} heart.",
+            "fragrance_notes": ", ".join(notes),
+            "variant_group": group,
+            "variant_name": rng.choice(VOLUMES) if group else None,
+            "specifications": {"Fragrance Type": rng.choice(FORMS), "Longevity": "8-10 hours"},
+            "is_featured": rng.random() < 0.05,
+            "is_best_selling": rng.random() < 0.05,
+            "is_new_arrival": rng.random() < 0.1,
+            "related_products": [],
+            "average_rating": round(rng.uniform(3, 5), 1),
+            "total_reviews": rng.randrange(0, 500),
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    return products
+
+
+def make_orders(count: int, products: list, user_ids: list, seed: int = 42):
+    """Build `count` order documents shaped like OrderService.create_order output"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    orders = []
+
+    for i in range(count):
+        items = []
+        for product in rng.sample(products, rng.randrange(1, 4)):
+            items.append({
+                "product_id": product["id"],
+                "product_name": product["name"],
+                "product_image": product["images"][0] if product["images"] else "",
+                "quantity": rng.randrange(1, 3),
+                "price": product["price"],
+                "discount": product["discount"],
+                "final_price": product["final_price"],
+            })
+        subtotal = sum(item["final_price"] * item["quantity"] for item in items)
+        discount = sum((item["price"] - item["final_price"]) * item["quantity"] for item in items)
+        paid = rng.random() < 0.7
+        created = (start + timedelta(minutes=7 * i)).isoformat()
+        orders.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "user_id": rng.choice(user_ids),
+            "items": items,
+            "subtotal": round(subtotal, 2),
+            "discount": round(discount, 2),
+            "total": round(subtotal, 2),
+            "shipping_address": {
+                "street": f"{i} MG Road", "city": "Pune", "state": "MH", "postal_code": "411001", "phone": "9999999999",
+            },
+            "order_status": "confirmed" if paid else "pending",
+            "payment_status": "completed" if paid else "pending",
+            "tracking_updates": [],
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    return orders
+
+
+def make_categories(count: int, seed: int = 42):
+    """Build `count` category documents; make_products(category_ids=...) spreads products over them"""
+    rng = random.Random(seed)
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc).isoformat()
+    return [
+        {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": f"{FORMS[i % len(FORMS)]} {i}",
+            "slug": f"category-{i}",
+            "description": None,
+            "image_url": None,
+            "is_active": True,
+            "display_order": i,
+            "created_at": created,
+            "updated_at": created,
+        }
+        for i in range(count)
+    ]
+
+
+def make_users(count: int, password_hash: str, seed: int = 42):
+    """Build `count` customer documents shaped like AuthService.create_user output, all with one password"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    users = []
+
+    for i in range(count):
+        created = (start + timedelta(hours=i)).isoformat()
+        users.append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "email": f"user{i}@example.com",
+            "name": f"User {i}",
+            "role": "customer",
+            "password_hash": password_hash,
+            "addresses": [],
+            "created_at": created,
+            "updated_at": created,
+        })
+
+    return users
+
+
+def make_reviews(products: list, users: list, per_product: int, seed: int = 42):
+    """Build 0 to 2 x `per_product` reviews per product from random users; about 90% approved"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    reviews = []
+
+    for product in products:
+        for _ in range(rng.randrange(0, 2 * per_product + 1)):
+            user = rng.choice(users)
+            created = (start + timedelta(minutes=len(reviews))).isoformat()
+            reviews.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "product_id": product["id"],
+                "user_id": user["id"],
+                "user_name": user["name"],
+                "rating": rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 6])[0],
+                "comment": f"{rng.choice(ADJECTIVES).title()} {rng.choice(NOTES)}, lasts {rng.randrange(2, 12)} hours",
+                "is_approved": rng.random() < 0.9,
+                "created_at": created,
+                "updated_at": created,
+            })
+
+    return reviews
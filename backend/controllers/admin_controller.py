@@ -1,51 +1,85 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.homepage_model import HomepageConfig, HomepageConfigUpdate
 from models.navigation_model import NavigationItem, NavigationItemCreate, NavigationItemUpdate
 from models.user_model import User
 from decorators.authorization import require_admin
+from services.cache_service import catalog_cache, HOMEPAGE_KEY, NAVIGATION_KEY
+from services.http_cache_service import conditional_response, item_validators
+from services.dashboard_service import DashboardService
+from services.sales_rollup_service import SalesRollupService, day_range
+from services.payment_reconciliation_service import reconciliation_metrics
 import uuid
-from datetime import datetime, timezone
-from typing import List
+from datetime import date, datetime, timezone
+from typing import List, Optional
 
 def get_admin_router(db: AsyncIOMotorDatabase) -> APIRouter:
     router = APIRouter(prefix="/admin", tags=["Admin"])
+    dashboard_service = DashboardService(db)
+    sales_rollups = SalesRollupService(db)
     
     @router.get("/dashboard")
-    async def get_dashboard_stats(current_user: dict = Depends(require_admin)):
-        # Get stats
-        total_orders = await db.orders.count_documents({})
-        total_products = await db.products.count_documents({})
-        total_users = await db.users.count_documents({"role": "customer"})
-        pending_orders = await db.orders.count_documents({"order_status": "pending"})
-        
-        # Calculate total revenue
-        completed_orders = await db.orders.find({"payment_status": "completed"}).to_list(10000)
-        total_revenue = sum(order.get("total", 0) for order in completed_orders)
-        
-        # Get recent orders
-        recent_orders = await db.orders.find({}, {"_id": 0}).sort("created_at", -1).limit(10).to_list(10)
-        
-        # Get low stock products
-        low_stock = await db.products.find({"stock": {"$lt": 10}}, {"_id": 0}).limit(10).to_list(10)
-        
-        return {
-            "total_orders": total_orders,
-            "total_products": total_products,
-            "total_users": total_users,
-            "pending_orders": pending_orders,
-            "total_revenue": total_revenue,
-            "recent_orders": recent_orders,
-            "low_stock_products": low_stock
-        }
+    async def get_dashboard_stats(
+        period: str = Query("day", pattern="^(day|week|month)$"),
+        points: Optional[int] = Query(None, ge=1, le=366),
+        current_user: dict = Depends(require_admin)
+    ):
+        return await dashboard_service.get_stats(period, points)
+    
+    @router.get("/sales/daily")
+    async def get_daily_sales(
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        current_user: dict = Depends(require_admin)
+    ):
+        try:
+            first_day, last_day = day_range(start, end)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return await sales_rollups.daily(first_day, last_day)
+    
+    @router.get("/sales/products")
+    async def get_product_sales(
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        limit: int = Query(20, ge=1, le=500),
+        sort: str = Query("net", pattern="^(orders|units|gross|discount|net)$"),
+        current_user: dict = Depends(require_admin)
+    ):
+        try:
+            first_day, last_day = day_range(start, end)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return await sales_rollups.by_product(first_day, last_day, limit, sort)
+    
+    @router.get("/sales/categories")
+    async def get_category_sales(
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        limit: int = Query(20, ge=1, le=500),
+        sort: str = Query("net", pattern="^(orders|units|gross|discount|net)$"),
+        current_user: dict = Depends(require_admin)
+    ):
+        try:
+            first_day, last_day = day_range(start, end)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return await sales_rollups.by_category(first_day, last_day, limit, sort)
+    
+    @router.get("/cache-stats")
+    async def get_cache_stats(current_user: dict = Depends(require_admin)):
+        return catalog_cache.stats()
+    
+    @router.get("/payment-reconciliation")
+    async def get_payment_reconciliation_stats(current_user: dict = Depends(require_admin)):
+        return reconciliation_metrics.stats()
     
     @router.get("/users", response_model=List[User])
     async def get_all_users(current_user: dict = Depends(require_admin)):
         users = await db.users.find({}, {"_id": 0, "password_hash": 0}).sort("created_at", -1).to_list(1000)
         return [User(**user) for user in users]
     
-    @router.get("/homepage", response_model=HomepageConfig)
-    async def get_homepage_config():
+    async def load_homepage_config() -> HomepageConfig:
         config = await db.homepage_config.find_one({"id": "homepage_config"}, {"_id": 0})
         if not config:
             default_config = HomepageConfig(id="homepage_config")
@@ -55,6 +89,14 @@ def get_admin_router(db: AsyncIOMotorDatabase) -> APIRouter:
             return default_config
         return HomepageConfig(**config)
     
+    @router.get("/homepage", response_model=HomepageConfig)
+    async def get_homepage_config(request: Request, response: Response):
+        config = await catalog_cache.get_or_load(HOMEPAGE_KEY, load_homepage_config)
+        not_modified = conditional_response(request, response, "homepage", item_validators([config], "homepage"))
+        if not_modified:
+            return not_modified
+        return config
+    
     @router.put("/homepage", response_model=HomepageConfig)
     async def update_homepage_config(config_data: HomepageConfigUpdate, current_user: dict = Depends(require_admin)):
         update_data = {k: v for k, v in config_data.model_dump().items() if v is not None}
@@ -65,6 +107,7 @@ def get_admin_router(db: AsyncIOMotorDatabase) -> APIRouter:
                 {"$set": update_data},
                 upsert=True
             )
+            await catalog_cache.invalidate(HOMEPAGE_KEY)
         
         config = await db.homepage_config.find_one({"id": "homepage_config"}, {"_id": 0})
         return HomepageConfig(**config)
@@ -84,12 +127,20 @@ def get_admin_router(db: AsyncIOMotorDatabase) -> APIRouter:
         
         await db.navigation_items.insert_one(doc)
         doc.pop("_id", None)
+        await catalog_cache.invalidate(NAVIGATION_KEY)
         return NavigationItem(**doc)
     
     @router.get("/navigation", response_model=List[NavigationItem])
-    async def get_navigation_items():
-        items = await db.navigation_items.find({}, {"_id": 0}).sort("display_order", 1).to_list(1000)
-        return [NavigationItem(**item) for item in items]
+    async def get_navigation_items(request: Request, response: Response):
+        async def load() -> List[NavigationItem]:
+            items = await db.navigation_items.find({}, {"_id": 0}).sort("display_order", 1).to_list(1000)
+            return [NavigationItem(**item) for item in items]
+        
+        items = await catalog_cache.get_or_load(NAVIGATION_KEY, load)
+        not_modified = conditional_response(request, response, "navigation", item_validators(items, "navigation", *(item.id for item in items)))
+        if not_modified:
+            return not_modified
+        return items
     
     @router.put("/navigation/{nav_id}", response_model=NavigationItem)
     async def update_navigation_item(nav_id: str, nav_data: NavigationItemUpdate, current_user: dict = Depends(require_admin)):
@@ -100,6 +151,7 @@ def get_admin_router(db: AsyncIOMotorDatabase) -> APIRouter:
                 {"id": nav_id},
                 {"$set": update_data}
             )
+            await catalog_cache.invalidate(NAVIGATION_KEY)
         
         nav_item = await db.navigation_items.find_one({"id": nav_id}, {"_id": 0})
         if not nav_item:
@@ -109,6 +161,7 @@ def get_admin_router(db: AsyncIOMotorDatabase) -> APIRouter:
     @router.delete("/navigation/{nav_id}")
     async def delete_navigation_item(nav_id: str, current_user: dict = Depends(require_admin)):
         result = await db.navigation_items.delete_one({"id": nav_id})
+        await catalog_cache.invalidate(NAVIGATION_KEY)
         if result.deleted_count == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Navigation item not found")
         return {"message": "Navigation item deleted successfully"}
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Depends
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.user_model import UserCreate, UserLogin, UserResponse, Address
 from services.auth_service import AuthService
+from services.password_service import PasswordHasherBusy
 from decorators.authentication import create_access_token, verify_token
 from decorators.authorization import require_auth
 
@@ -25,10 +26,15 @@ def get_auth_router(db: AsyncIOMotorDatabase) -> APIRouter:
             }
         except ValueError as e:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        except PasswordHasherBusy as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
     
     @router.post("/login", response_model=dict)
     async def login(credentials: UserLogin):
-        user = await auth_service.authenticate_user(credentials.email, credentials.password)
+        try:
+            user = await auth_service.authenticate_user(credentials.email, credentials.password)
+        except PasswordHasherBusy as e:
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e), headers={"Retry-After": "1"})
         
         if not user:
             raise HTTPException(
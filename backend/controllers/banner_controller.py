@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.banner_model import Banner, BannerCreate, BannerUpdate
 from decorators.authorization import require_admin
+from services.cache_service import catalog_cache, BANNERS_PREFIX
+from services.http_cache_service import conditional_response, item_validators
 from typing import List
 import uuid
 from datetime import datetime, timezone
@@ -24,16 +26,24 @@ def get_banner_router(db: AsyncIOMotorDatabase) -> APIRouter:
         
         await db.banners.insert_one(doc)
         doc.pop("_id", None)
+        await catalog_cache.invalidate_prefix(BANNERS_PREFIX)
         return Banner(**doc)
     
     @router.get("/", response_model=List[Banner])
-    async def get_banners(is_active: bool = None):
-        query = {}
-        if is_active is not None:
-            query["is_active"] = is_active
+    async def get_banners(request: Request, response: Response, is_active: bool = None):
+        async def load() -> List[Banner]:
+            query = {}
+            if is_active is not None:
+                query["is_active"] = is_active
+            
+            banners = await db.banners.find(query, {"_id": 0}).sort("display_order", 1).to_list(1000)
+            return [Banner(**banner) for banner in banners]
         
-        banners = await db.banners.find(query, {"_id": 0}).sort("display_order", 1).to_list(1000)
-        return [Banner(**banner) for banner in banners]
+        banners = await catalog_cache.get_or_load(f"{BANNERS_PREFIX}{is_active}", load)
+        not_modified = conditional_response(request, response, "banners", item_validators(banners, "banners", is_active, *(b.id for b in banners)))
+        if not_modified:
+            return not_modified
+        return banners
     
     @router.get("/{banner_id}", response_model=Banner)
     async def get_banner(banner_id: str):
@@ -51,6 +61,7 @@ def get_banner_router(db: AsyncIOMotorDatabase) -> APIRouter:
                 {"id": banner_id},
                 {"$set": update_data}
             )
+            await catalog_cache.invalidate_prefix(BANNERS_PREFIX)
         
         banner = await db.banners.find_one({"id": banner_id}, {"_id": 0})
         if not banner:
@@ -60,6 +71,7 @@ def get_banner_router(db: AsyncIOMotorDatabase) -> APIRouter:
     @router.delete("/{banner_id}")
     async def delete_banner(banner_id: str, current_user: dict = Depends(require_admin)):
         result = await db.banners.delete_one({"id": banner_id})
+        await catalog_cache.invalidate_prefix(BANNERS_PREFIX)
         if result.deleted_count == 0:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Banner not found")
         return {"message": "Banner deleted successfully"}
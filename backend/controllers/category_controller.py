@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.category_model import CategoryCreate, CategoryUpdate, Category
 from services.category_service import CategoryService
+from services.http_cache_service import conditional_response, item_validators
 from decorators.authorization import require_admin
 from typing import List, Optional
 
@@ -14,8 +15,12 @@ def get_category_router(db: AsyncIOMotorDatabase) -> APIRouter:
         return await category_service.create_category(category_data)
     
     @router.get("/", response_model=List[Category])
-    async def get_categories(is_active: Optional[bool] = None):
-        return await category_service.get_categories(is_active=is_active)
+    async def get_categories(request: Request, response: Response, is_active: Optional[bool] = None):
+        categories = await category_service.get_categories(is_active=is_active)
+        not_modified = conditional_response(request, response, "categories", item_validators(categories, "categories", is_active, *(c.id for c in categories)))
+        if not_modified:
+            return not_modified
+        return categories
     
     @router.get("/{category_id}", response_model=Category)
     async def get_category(category_id: str):
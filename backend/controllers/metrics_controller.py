@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+from services.metrics_service import RequestMetrics, request_metrics, METRICS_TOKEN
+import hmac
+
+
+def get_metrics_router(metrics: RequestMetrics = request_metrics) -> APIRouter:
+    router = APIRouter(tags=["Metrics"])
+
+    @router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def get_metrics(request: Request):
+        """Request metrics in the Prometheus text exposition format"""
+        if METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"
+        ):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+    return router
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query, Request
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.order_model import OrderCreate, OrderUpdate, Order, OrderStatus, OrderTrackingUpdate , PaymentStatus
 from services.order_service import OrderService
+from services.inventory_service import InsufficientStockError
+from services.webhook_inbox_service import WebhookInboxService, parse_callback
+from services.serialization_service import model_response
 from services.phonepe_service import PhonePeService
 from decorators.authorization import require_auth, require_admin
 from typing import List, Optional
@@ -22,10 +25,16 @@ class PaymentStatusCheck(BaseModel):
 def get_order_router(db: AsyncIOMotorDatabase) -> APIRouter:
     router = APIRouter(prefix="/orders", tags=["Orders"])
     order_service = OrderService(db)
+    webhook_inbox = WebhookInboxService(db)
     
     @router.post("/", response_model=Order)
     async def create_order(order_data: OrderCreate, current_user: dict = Depends(require_auth)):
-        return await order_service.create_order(current_user["user_id"], order_data)
+        try:
+            return await order_service.create_order(current_user["user_id"], order_data)
+        except InsufficientStockError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
     @router.post("/create-phonepe-payment", response_model=dict)
     async def create_phonepe_payment(order_id: str, current_user: dict = Depends(require_auth)):
@@ -44,7 +53,7 @@ def get_order_router(db: AsyncIOMotorDatabase) -> APIRouter:
         # callback_url = f"{BACKEND_API_URL}/orders/phonepe-webhook"
         
         # Create PhonePe payment order
-        phonepe_response = PhonePeService.create_payment_order(
+        phonepe_response = await PhonePeService.create_payment_order(
             amount=order.total,
             merchant_order_id=order_id,
             redirect_url=redirect_url,
@@ -104,9 +113,12 @@ def get_order_router(db: AsyncIOMotorDatabase) -> APIRouter:
                 "transaction_id": order.phonepe_transaction_id or ""
             }
 
-        status_response = PhonePeService.check_payment_status(merchant_txn_id)
+        status_response = await PhonePeService.check_payment_status(merchant_txn_id)
 
         if not status_response.get("success"):
+            # A timed-out status check says nothing about the payment, so leave the order pending
+            if status_response.get("retryable"):
+                return {"success": False, "message": status_response.get("error")}
             await order_service.update_payment_failed(
                 payment_check.order_id,
                 status_response.get("error") or f"Payment state: {status_response.get('state', 'UNKNOWN')}"
@@ -138,67 +150,33 @@ def get_order_router(db: AsyncIOMotorDatabase) -> APIRouter:
         """
         Handle PhonePe V2 webhook callback.
         V2 uses HTTP Basic Auth: Authorization header is SHA256(username:password).
+        The callback is only recorded here; the inbox consumer applies it to the order.
         """
-        try:
-            # 1. Read and decode the raw body
-            body = await request.body()
-            body_str = body.decode("utf-8")
-            
-            # 2. Verify Authorization header
-            auth_header = request.headers.get("Authorization", "")
-            if not verify_phonepe_webhook(auth_header):
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED, 
-                    detail="Invalid webhook signature"
-                )
+        # 1. Verify Authorization header
+        auth_header = request.headers.get("Authorization", "")
+        if not verify_phonepe_webhook(auth_header):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED, 
+                detail="Invalid webhook signature"
+            )
 
-            # 3. Parse JSON Data
+        # 2. Parse JSON Data
+        body_str = (await request.body()).decode("utf-8")
+        try:
             data = json.loads(body_str)
-            event = data.get("event", "")
-            payload = data.get("payload", {})
-            
-            merchant_order_id = payload.get("merchantOrderId")
-            state = payload.get("state", "").upper()
-
-            if not merchant_order_id:
-                return {"success": False, "error": "Missing merchantOrderId"}
-
-            # 4. Fetch the order from DB
-            order = await db.orders.find_one({"id": merchant_order_id})
-            if not order:
-                # We return 200 even if not found to stop PhonePe from retrying a dead order
-                return {"success": False, "error": "Order not found"}
-
-            # 5. Process Payment Success
-            if state == "COMPLETED" or event == "checkout.order.completed":
-                # Safely extract payment details
-                details = payload.get("paymentDetails", [{}])[0]
-                transaction_id = details.get("transactionId", "")
-                payment_instrument = details.get("paymentMode") or details.get("instrumentType") or "UNKNOWN"
-
-                await order_service.update_payment_info_phonepe(
-                    order_id=order["id"],
-                    merchant_order_id=merchant_order_id,
-                    transaction_id=transaction_id,
-                    state=state,
-                    payment_instrument=payment_instrument,
-                )
-
-            # 6. Process Payment Failure
-            elif state == "FAILED" or event == "checkout.order.failed":
-                await order_service.update_payment_failed(
-                    order["id"], 
-                    f"PhonePe reported failure: {state}"
-                )
-
-            return {"success": True}
-
         except json.JSONDecodeError:
             raise HTTPException(status_code=400, detail="Invalid JSON body")
-        except Exception as e:
-            # Log the error properly in a production environment
-            print(f"[PhonePe Webhook Error]: {e}")
-            return {"success": False, "message": "Internal processing error"}
+        if not isinstance(data, dict):
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+
+        callback = parse_callback(data)
+        if not callback["merchant_order_id"]:
+            return {"success": False, "error": "Missing merchantOrderId"}
+
+        # 3. One insert; a retry of an event we already hold is acknowledged as is.
+        # A database error propagates as a 500 so PhonePe retries the callback.
+        recorded = await webhook_inbox.record(callback, body_str)
+        return {"success": True, "duplicate": not recorded}
     
     def verify_phonepe_webhook(authorization_header: str) -> bool:
         """
@@ -217,15 +195,24 @@ def get_order_router(db: AsyncIOMotorDatabase) -> APIRouter:
 
     @router.get("/", response_model=List[Order])
     async def get_orders(
+        response: Response,
         status_filter: Optional[OrderStatus] = None,
         skip: int = Query(0, ge=0),
         limit: int = Query(50, ge=1, le=100),
+        cursor: Optional[str] = None,
         current_user: dict = Depends(require_auth)
     ):
-        if current_user["role"] == "admin":
-            return await order_service.get_orders(status=status_filter, skip=skip, limit=limit)
-        else:
-            return await order_service.get_orders(user_id=current_user["user_id"], status=status_filter, skip=skip, limit=limit)
+        user_id = None if current_user["role"] == "admin" else current_user["user_id"]
+        try:
+            orders, next_cursor = await order_service.get_orders_page(
+                user_id=user_id, status=status_filter, skip=skip, limit=limit, cursor=cursor
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return model_response(orders, Order, response)
     
     @router.get("/{order_id}", response_model=Order)
     async def get_order(order_id: str, current_user: dict = Depends(require_auth)):
@@ -236,7 +223,7 @@ def get_order_router(db: AsyncIOMotorDatabase) -> APIRouter:
         if current_user["role"] != "admin" and order.user_id != current_user["user_id"]:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
         
-        return order
+        return model_response(order)
     
     @router.put("/{order_id}", response_model=Order)
     async def update_order(order_id: str, order_data: OrderUpdate, current_user: dict = Depends(require_admin)):
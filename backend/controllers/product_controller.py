@@ -1,48 +1,161 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response, UploadFile, File
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models.product_model import ProductCreate, ProductUpdate, Product
-from services.product_service import ProductService
+from models.product_model import ProductCreate, ProductUpdate, Product, ProductCard
+from services.product_service import ProductService, SlugTakenError
+from services.product_page_service import ProductPageService
+from services.product_facet_service import ProductFacetService
+from services.product_import_service import ProductImportService, detect_format, iter_rows, PRODUCT_IMPORT_BATCH_SIZE
+from services.http_cache_service import conditional_response, collection_validators, item_validators
+from services.serialization_service import json_response, model_response
 from decorators.authorization import require_admin
-from typing import List, Optional
+from typing import List, Optional, Union
+import io
 
 def get_product_router(db: AsyncIOMotorDatabase) -> APIRouter:
     router = APIRouter(prefix="/products", tags=["Products"])
     product_service = ProductService(db)
+    product_page_service = ProductPageService(db)
+    product_facet_service = ProductFacetService(db)
+    product_import_service = ProductImportService(db)
     
     @router.post("/", response_model=Product)
     async def create_product(product_data: ProductCreate, current_user: dict = Depends(require_admin)):
-        return await product_service.create_product(product_data)
+        try:
+            return await product_service.create_product(product_data)
+        except SlugTakenError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     
-    @router.get("/", response_model=List[Product])
+    @router.post("/import")
+    async def import_products(
+        file: UploadFile = File(...),
+        format: Optional[str] = Query(None, regex="^(csv|ndjson)$"),
+        batch_size: int = Query(PRODUCT_IMPORT_BATCH_SIZE, ge=1, le=10000),
+        dry_run: bool = False,
+        current_user: dict = Depends(require_admin)
+    ):
+        """Upsert products by slug from a CSV or NDJSON upload; rows that fail are listed with their errors"""
+        try:
+            fmt = detect_format(file.filename, format)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
+        # Uploads are spooled to a temp file, so rows are read from it batch by batch
+        stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        try:
+            return await product_import_service.import_rows(iter_rows(stream, fmt), batch_size, dry_run)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be UTF-8 encoded")
+        finally:
+            stream.detach()
+    
+    @router.get("/export")
+    async def export_products(
+        format: str = Query("ndjson", regex="^(csv|ndjson)$"),
+        current_user: dict = Depends(require_admin)
+    ):
+        media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+        return StreamingResponse(
+            product_import_service.export(format),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="products.{format}"'}
+        )
+    
+    @router.get("/", response_model=Union[List[Product], List[ProductCard]])
     async def get_products(
+        request: Request,
+        response: Response,
+        category_id: Optional[str] = None,
+        is_featured: Optional[bool] = None,
+        is_best_selling: Optional[bool] = None,
+        is_new_arrival: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        search: Optional[str] = None,
+        search_mode: Optional[str] = Query(None, regex="^(index|regex)$"),
+        sort_by: Optional[str] = Query(None, regex="^(name|price|final_price|created_at|average_rating|relevance)$"),
+        sort_order: int = Query(-1, ge=-1, le=1),
+        skip: int = Query(0, ge=0),
+        limit: int = Query(50, ge=1, le=100),
+        cursor: Optional[str] = None,
+        view: str = Query("full", regex="^(card|full)$"),
+        fields: Optional[str] = None
+    ):
+        """Without sort_by, searches are ranked by relevance and plain listings by created_at.
+        
+        The X-Next-Cursor response header holds the token for the next page. view=card returns
+        ProductCard items; fields=a,b returns just those product fields (plus id).
+        """
+        # The ETag covers every product matching the filters, so any change to one invalidates all pages
+        filter_query = product_service.build_filter_query(category_id, is_featured, is_best_selling, is_new_arrival, min_price, max_price)
+        validators = await collection_validators(db.products, filter_query, "products", request.url.query)
+        not_modified = conditional_response(request, response, "product_list", validators)
+        if not_modified:
+            return not_modified
+        
+        try:
+            products, next_cursor = await product_service.get_products_page(
+                category_id=category_id,
+                is_featured=is_featured,
+                is_best_selling=is_best_selling,
+                is_new_arrival=is_new_arrival,
+                min_price=min_price,
+                max_price=max_price,
+                search=search,
+                sort_by=sort_by,
+                sort_order=sort_order,
+                skip=skip,
+                limit=limit,
+                search_mode=search_mode,
+                cursor=cursor,
+                view=view,
+                fields=fields
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return model_response(products, response=response)
+    
+    @router.get("/facets")
+    async def get_product_facets(
         category_id: Optional[str] = None,
+        brand: Optional[str] = None,
         is_featured: Optional[bool] = None,
         is_best_selling: Optional[bool] = None,
         is_new_arrival: Optional[bool] = None,
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
+        min_rating: Optional[float] = Query(None, ge=0, le=5),
         search: Optional[str] = None,
+        search_mode: Optional[str] = Query(None, regex="^(index|regex)$"),
         sort_by: str = Query("created_at", regex="^(name|price|final_price|created_at|average_rating)$"),
         sort_order: int = Query(-1, ge=-1, le=1),
         skip: int = Query(0, ge=0),
-        limit: int = Query(50, ge=1, le=100)
+        limit: int = Query(24, ge=1, le=100),
+        cursor: Optional[str] = None,
+        view: str = Query("card", regex="^(card|full)$"),
+        fields: Optional[str] = None
     ):
-        return await product_service.get_products(
-            category_id=category_id,
-            is_featured=is_featured,
-            is_best_selling=is_best_selling,
-            is_new_arrival=is_new_arrival,
-            min_price=min_price,
-            max_price=max_price,
-            search=search,
-            sort_by=sort_by,
-            sort_order=sort_order,
-            skip=skip,
-            limit=limit
+        """A page of products with the total and the category, brand, flag, price and rating counts.
+        
+        Each facet is counted with every filter but its own applied, so the choices stay visible once one is picked.
+        """
+        filter_query = product_service.build_filter_query(
+            category_id, is_featured, is_best_selling, is_new_arrival, min_price, max_price, brand, min_rating
         )
+        search_query = product_service.search_filter(search, search_mode) if search else None
+        try:
+            result = await product_facet_service.browse(
+                filter_query, search_query, sort_by, sort_order, skip, limit, cursor, view, fields
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return json_response(result)
     
     @router.get("/slug/{slug}")
-    async def get_product_by_slug(slug: str):
+    async def get_product_by_slug(slug: str, request: Request, response: Response):
         product = await product_service.get_product_by_slug(slug)
         if not product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
@@ -52,43 +165,66 @@ def get_product_router(db: AsyncIOMotorDatabase) -> APIRouter:
         if product.variant_group:
             variants = await product_service.get_variants_by_group(product.variant_group, product.id)
         
+        not_modified = conditional_response(request, response, "product", item_validators([product, *variants], product.id, *(v.id for v in variants)))
+        if not_modified:
+            return not_modified
+        
         # Return product with variants
         product_dict = product.model_dump()
         product_dict['variants'] = [v.model_dump() for v in variants]
         
-        return product_dict
+        return json_response(product_dict, response)
+    
+    @router.get("/slug/{slug}/page")
+    async def get_product_page(slug: str):
+        """Product with variants, images, related and frequently-bought products and review stats in one response"""
+        page = await product_page_service.get_page(slug)
+        if not page:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
+        return json_response(page)
     
     # NEW: Get product variants endpoint
     @router.get("/{product_id}/variants", response_model=List[Product])
     async def get_product_variants(product_id: str):
         """Get all variants of a product"""
         variants = await product_service.get_product_variants(product_id)
-        return variants
+        return model_response(variants, Product)
     
     # NEW: Get related products endpoint
-    @router.get("/{product_id}/related", response_model=List[Product])
-    async def get_related_products(product_id: str):
-        """Get related products for a product"""
+    @router.get("/{product_id}/related", response_model=Union[List[Product], List[ProductCard]])
+    async def get_related_products(
+        product_id: str,
+        view: str = Query("full", regex="^(card|full)$"),
+        fields: Optional[str] = None
+    ):
+        """Get related products for a product, shaped by view/fields as in the listing"""
         product = await product_service.get_product_by_id(product_id)
         if not product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
         
-        if not product.related_products:
-            return []
-        
-        related = await product_service.get_related_products_by_ids(product.related_products)
-        return related
+        try:
+            related = await product_service.get_related_products_by_ids(product.related_products, view, fields)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return model_response(related)
     
     @router.get("/{product_id}", response_model=Product)
-    async def get_product(product_id: str):
+    async def get_product(product_id: str, request: Request, response: Response):
         product = await product_service.get_product_by_id(product_id)
         if not product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
-        return product
+        
+        not_modified = conditional_response(request, response, "product", item_validators([product], product.id))
+        if not_modified:
+            return not_modified
+        return model_response(product, response=response)
     
     @router.put("/{product_id}", response_model=Product)
     async def update_product(product_id: str, product_data: ProductUpdate, current_user: dict = Depends(require_admin)):
-        product = await product_service.update_product(product_id, product_data)
+        try:
+            product = await product_service.update_product(product_id, product_data)
+        except SlugTakenError as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
         if not product:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
         return product
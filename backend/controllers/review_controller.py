@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from models.review_model import ReviewCreate, ReviewUpdate, Review
 from services.review_service import ReviewService
+from services.serialization_service import model_response
 from decorators.authorization import require_auth, require_admin
 from typing import List, Optional
 
@@ -15,12 +16,21 @@ def get_review_router(db: AsyncIOMotorDatabase) -> APIRouter:
     
     @router.get("/", response_model=List[Review])
     async def get_reviews(
+        response: Response,
         product_id: Optional[str] = None,
         is_approved: Optional[bool] = None,
         skip: int = Query(0, ge=0),
-        limit: int = Query(50, ge=1, le=100)
+        limit: int = Query(50, ge=1, le=100),
+        cursor: Optional[str] = None
     ):
-        return await review_service.get_reviews(product_id, is_approved, skip, limit)
+        try:
+            reviews, next_cursor = await review_service.get_reviews_page(product_id, is_approved, skip, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return model_response(reviews, Review, response)
     
     @router.get("/stats/{product_id}")
     async def get_review_stats(product_id: str):
@@ -32,7 +42,7 @@ def get_review_router(db: AsyncIOMotorDatabase) -> APIRouter:
         review = await review_service.get_review_by_id(review_id)
         if not review:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
-        return review
+        return model_response(review)
     
     @router.put("/user/{review_id}", response_model=Review)
     async def update_user_review(
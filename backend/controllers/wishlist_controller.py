@@ -1,12 +1,18 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from models.product_model import Product, ProductCard
 from services.wishlist_service import WishlistService
+from services.serialization_service import model_response
 from decorators.authorization import require_auth
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional, Union
 
 class WishlistRequest(BaseModel):
     product_id: str
 
+class WishlistCheckRequest(BaseModel):
+    product_ids: List[str] = Field(min_length=1, max_length=200)
+
 def get_wishlist_router(db: AsyncIOMotorDatabase) -> APIRouter:
     router = APIRouter(prefix="/wishlist", tags=["Wishlist"])
     wishlist_service = WishlistService(db)
@@ -36,10 +42,30 @@ def get_wishlist_router(db: AsyncIOMotorDatabase) -> APIRouter:
         )
         return result
     
-    @router.get("/")
-    async def get_wishlist(current_user: dict = Depends(require_auth)):
-        products = await wishlist_service.get_wishlist(current_user["user_id"])
-        return products
+    @router.get("/", response_model=Union[List[Product], List[ProductCard]])
+    async def get_wishlist(
+        view: str = Query("full", regex="^(card|full)$"),
+        fields: Optional[str] = None,
+        current_user: dict = Depends(require_auth)
+    ):
+        """view=card returns ProductCard items; fields=a,b returns just those product fields"""
+        try:
+            products = await wishlist_service.get_wishlist(current_user["user_id"], view, fields)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return model_response(products)
+    
+    @router.post("/check")
+    async def check_many_in_wishlist(
+        request: WishlistCheckRequest,
+        current_user: dict = Depends(require_auth)
+    ):
+        """Membership for a whole listing page in one call: {"in_wishlist": {product_id: bool}}"""
+        in_wishlist = await wishlist_service.check_many_in_wishlist(
+            current_user["user_id"],
+            request.product_ids
+        )
+        return {"in_wishlist": in_wishlist}
     
     @router.get("/check/{product_id}")
     async def check_in_wishlist(
@@ -3,9 +3,12 @@ from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
 import os
+import time
+import hashlib
 from datetime import datetime, timezone, timedelta
 
-from jwt import ExpiredSignatureError, InvalidTokenError
+from jwt import ExpiredSignatureError
+from services.cache_service import TTLCache
 
 
 security = HTTPBearer()
@@ -14,6 +17,13 @@ SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "mfrida-fragrance-secret-key-2025"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 30
 
+# Verified tokens by SHA-256 digest, so repeat requests skip the HMAC check and JSON decoding.
+# Entries never outlive the token's exp; 0 disables the cache.
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get("TOKEN_CACHE_MAX_ENTRIES", "4096"))
+TOKEN_CACHE_TTL_SECONDS = float(os.environ.get("TOKEN_CACHE_TTL_SECONDS", "300"))
+
+_verified_tokens = TTLCache(max_entries=TOKEN_CACHE_MAX_ENTRIES, ttl=TOKEN_CACHE_TTL_SECONDS)
+
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
@@ -21,49 +31,42 @@ def create_access_token(data: dict) -> str:
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+def _decode_claims(token: str) -> dict:
     try:
-        print(f"DEBUG: Token received: {token[:20]}...")  # Print first 20 chars
-        print(f"DEBUG: SECRET_KEY: {SECRET_KEY}")
-        print(f"DEBUG: ALGORITHM: {ALGORITHM}")
-        
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(f"DEBUG: Decoded payload: {payload}")
-        
-        user_id: str = payload.get("sub")
-        email: str = payload.get("email")
-        role: str = payload.get("role")
-        
-        print(f"DEBUG: user_id={user_id}, email={email}, role={role}")
-        
-        if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid authentication credentials",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        return {"user_id": user_id, "email": email, "role": role}
-    
-    except ExpiredSignatureError as e:
-        print(f"DEBUG: Token expired: {str(e)}")
+    except ExpiredSignatureError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token has expired",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except InvalidTokenError as e:
-        print(f"DEBUG: Invalid token error: {str(e)}")
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except Exception as e:
-        print(f"DEBUG: Unexpected error: {type(e).__name__} - {str(e)}")
+    
+    user_id: str = payload.get("sub")
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
+            detail="Invalid authentication credentials",
             headers={"WWW-Authenticate": "Bearer"},
-        )
\ No newline at end of file
+        )
+    
+    return {"user_id": user_id, "email": payload.get("email"), "role": payload.get("role"), "exp": payload.get("exp")}
+
+async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    # Runs on the event loop: a cache hit is a hash and a dict lookup, cheaper than a threadpool hop
+    token = credentials.credentials
+    key = hashlib.sha256(token.encode()).digest()
+    found, claims = _verified_tokens.get(key)
+    if not found or (claims["exp"] is not None and claims["exp"] <= time.time()):
+        claims = _decode_claims(token)
+        ttl = TOKEN_CACHE_TTL_SECONDS
+        if claims["exp"] is not None:
+            ttl = min(ttl, claims["exp"] - time.time())
+        _verified_tokens.set(key, claims, ttl)
+    
+    return {"user_id": claims["user_id"], "email": claims["email"], "role": claims["role"]}
@@ -54,8 +54,13 @@ class Order(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class OrderItemCreate(BaseModel):
+    # Name, image and prices are read from the catalog when the order is placed
+    product_id: str
+    quantity: int = Field(..., ge=1)
+
 class OrderCreate(BaseModel):
-    items: List[OrderItem]
+    items: List[OrderItemCreate] = Field(..., min_length=1)
     shipping_address: Address
 
 class OrderUpdate(BaseModel):
@@ -34,6 +34,26 @@ class Product(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+class ProductCard(BaseModel):
+    """The fields listing pages render; images holds only the first image"""
+    model_config = ConfigDict(extra="ignore")
+    
+    id: str
+    name: str
+    slug: str
+    brand: str
+    category_id: str
+    price: float
+    discount: float = 0
+    final_price: float
+    images: List[str] = []
+    stock: int = 0
+    is_featured: bool = False
+    is_best_selling: bool = False
+    is_new_arrival: bool = False
+    average_rating: float = 0
+    total_reviews: int = 0
+
 class ProductCreate(BaseModel):
     name: str
     slug: str
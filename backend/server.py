@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import asyncio
 import logging
 from pathlib import Path
 
@@ -19,17 +20,35 @@ from controllers.wishlist_controller import get_wishlist_router
 from controllers.product_image_controller import get_product_image_router
 from controllers.product_variant_controller import get_product_variant_router
 from controllers.frequently_bought_controller import get_frequently_bought_router
+from controllers.metrics_controller import get_metrics_router
+from services.search_service import product_search_index
+from services.index_service import ensure_indexes
+from services.cache_service import catalog_cache
+from services.product_service import ProductService
+from services.variant_group_service import VariantGroupService
+from services.wishlist_service import WishlistService
+from services.phonepe_service import phonepe_client
+from services.password_service import password_hasher
+from services.inventory_service import InventoryService, ORDER_RESERVATION_SWEEP_SECONDS
+from services.webhook_inbox_service import WebhookInboxService
+from services.payment_reconciliation_service import PaymentReconciler, PAYMENT_RECONCILE_INTERVAL_SECONDS
+from services.logging_service import configure_logging, stop_logging
+from services.metrics_service import MetricsMiddleware
+from services.mongo_profiler_service import mongo_profiler, MONGO_SLOW_QUERY_EXPLAIN
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# Logging goes through a queue, so handlers never wait on stderr
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# MongoDB connection; mongo_profiler puts each command down to the request and service method that ran it
 mongo_url = os.environ['MONGO_URL']
-print(f"MongoDB URL: {mongo_url}")
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_profiler])
 db = client[os.environ['DB_NAME']]
-print(f"Connected to MongoDB database: {os.environ['DB_NAME']}")
+logger.info(f"Using MongoDB database: {os.environ['DB_NAME']}")
 
 # Create the main app without a prefix
 app = FastAPI(title="Mfrida Fragrance API")
@@ -59,6 +78,7 @@ api_router.include_router(get_frequently_bought_router(db))
 
 # Include the router in the main app
 app.include_router(api_router)
+app.include_router(get_metrics_router())
 
 # Serve uploaded files (Windows + Linux safe)
 BASE_DIR = Path(__file__).resolve().parent
@@ -76,15 +96,83 @@ app.add_middleware(
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", "X-Request-ID"],
 )
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Added last so it is outermost and times everything, CORS included
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+
+@app.on_event("startup")
+async def start_catalog_cache():
+    # With the redis backend, product changes made by other workers also refresh our search index
+    catalog_cache.add_invalidation_listener(ProductService(db).sync_search_index)
+    try:
+        await catalog_cache.start()
+    except Exception as e:
+        logger.error(f"Catalog cache backend failed to start: {e}")
+
+@app.on_event("startup")
+async def build_search_index():
+    # Until the index is ready, product search falls back to the $regex scan
+    try:
+        await product_search_index.build_from_collection(db.products)
+        logger.info(f"Product search index built with {len(product_search_index)} products")
+    except Exception as e:
+        logger.error(f"Product search index build failed, using regex search: {e}")
+
+@app.on_event("startup")
+async def build_variant_groups():
+    # Product writes keep variant_groups current; this only fills it on first deploy
+    try:
+        if await VariantGroupService(db).ensure_built():
+            logger.info("Variant group index built")
+    except Exception as e:
+        logger.error(f"Variant group index build failed: {e}")
+
+@app.on_event("startup")
+async def migrate_wishlists():
+    # Wishlists are read from wishlist_items, so arrays left on user documents are moved there first
+    try:
+        counts = await WishlistService(db).ensure_migrated()
+        if counts:
+            logger.info(f"{counts['items']} wishlist items migrated from {counts['users']} users")
+    except Exception as e:
+        logger.error(f"Wishlist migration failed: {e}")
+
+@app.on_event("startup")
+async def start_reservation_sweeper():
+    if ORDER_RESERVATION_SWEEP_SECONDS > 0:
+        app.state.reservation_sweeper_task = asyncio.create_task(InventoryService(db).run_expiry_sweeper())
+
+@app.on_event("startup")
+async def start_webhook_inbox_consumer():
+    app.state.webhook_inbox_task = asyncio.create_task(WebhookInboxService(db).run_consumer())
+
+@app.on_event("startup")
+async def start_payment_reconciler():
+    if PAYMENT_RECONCILE_INTERVAL_SECONDS > 0:
+        app.state.payment_reconciler_task = asyncio.create_task(PaymentReconciler(db).run())
+
+@app.on_event("startup")
+async def start_slow_query_explainer():
+    if MONGO_SLOW_QUERY_EXPLAIN:
+        app.state.slow_query_explainer_task = asyncio.create_task(mongo_profiler.run_explainer(db))
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for name in ("reservation_sweeper_task", "webhook_inbox_task", "payment_reconciler_task", "slow_query_explainer_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    await catalog_cache.close()
+    await phonepe_client.close()
+    password_hasher.close()
     client.close()
+    stop_logging()
@@ -1,21 +1,21 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
 from models.user_model import UserCreate, UserResponse, Address
-from passlib.context import CryptContext
+from services.password_service import password_hasher
 import uuid
 from datetime import datetime, timezone
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
+@profiled
 class AuthService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.collection = db.users
     
-    def hash_password(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        return await password_hasher.hash(password)
     
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await password_hasher.verify(plain_password, hashed_password)
     
     async def create_user(self, user_data: UserCreate) -> UserResponse:
         existing_user = await self.collection.find_one({"email": user_data.email}, {"_id": 0})
@@ -23,7 +23,7 @@ class AuthService:
             raise ValueError("Email already registered")
         
         user_dict = user_data.model_dump()
-        hashed_password = self.hash_password(user_dict.pop("password"))
+        hashed_password = await self.hash_password(user_dict.pop("password"))
         
         user_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
@@ -55,9 +55,14 @@ class AuthService:
         if not user:
             return None
         
-        if not self.verify_password(password, user["password_hash"]):
+        valid, new_hash = await password_hasher.verify_and_update(password, user["password_hash"])
+        if not valid:
             return None
         
+        if new_hash:
+            # Stored hash predates the current PASSWORD_HASH_ROUNDS
+            await self.collection.update_one({"id": user["id"]}, {"$set": {"password_hash": new_hash}})
+        
         return user
     
     async def get_user_by_id(self, user_id: str) -> dict:
@@ -0,0 +1,556 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+from models.banner_model import Banner
+from models.category_model import Category
+from models.homepage_model import HomepageConfig
+from models.navigation_model import NavigationItem
+from models.product_model import Product
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CACHE_BACKEND = os.environ.get("CATALOG_CACHE_BACKEND", "local")  # local | redis
+CATALOG_CACHE_REDIS_URL = os.environ.get("CATALOG_CACHE_REDIS_URL", "redis://localhost:6379/0")
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get("CATALOG_CACHE_TTL_SECONDS", "300"))
+CATALOG_CACHE_LOCAL_TTL_SECONDS = float(os.environ.get("CATALOG_CACHE_LOCAL_TTL_SECONDS", "60"))
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get("CATALOG_CACHE_MAX_ENTRIES", "10000"))
+# How long Redis keeps a key's invalidation count; must outlast the slowest load
+CATALOG_CACHE_VERSION_TTL_SECONDS = float(os.environ.get("CATALOG_CACHE_VERSION_TTL_SECONDS", "86400"))
+
+InvalidationListener = Callable[[List[str], List[str]], Awaitable[None]]
+
+
+class LoadAbandoned(Exception):
+    """Set on a shared load whose leader was cancelled; waiters retry rather than inherit the cancellation"""
+
+# Models the shared tier stores; they are written as JSON and validated again on the way back
+SHARED_CACHE_MODELS = {model.__name__: model for model in (Banner, Category, HomepageConfig, NavigationItem, Product)}
+
+
+def encode_shared(value: Any) -> bytes:
+    """JSON for the shared tier: models and lists of one model carry their class name, anything else must be plain JSON"""
+    if isinstance(value, BaseModel):
+        payload = {"model": type(value).__name__, "one": value.model_dump(mode="json")}
+    elif isinstance(value, list) and value and isinstance(value[0], BaseModel):
+        payload = {"model": type(value[0]).__name__, "many": [item.model_dump(mode="json") for item in value]}
+    else:
+        payload = {"value": value}
+    if "model" in payload and payload["model"] not in SHARED_CACHE_MODELS:
+        raise TypeError(f"{payload['model']} is not registered in SHARED_CACHE_MODELS")
+    return orjson.dumps(payload)
+
+
+def decode_shared(raw: bytes) -> Any:
+    """The value encode_shared wrote; raises ValueError (or a ValidationError) for anything else"""
+    payload = orjson.loads(raw)
+    if "value" in payload:
+        return payload["value"]
+    model = SHARED_CACHE_MODELS.get(payload.get("model"))
+    if model is None:
+        raise ValueError(f"Unknown cached model {payload.get('model')!r}")
+    if "one" in payload:
+        return model.model_validate(payload["one"])
+    return [model.model_validate(item) for item in payload["many"]]
+
+
+class TTLCache:
+    """Bounded LRU map whose entries also expire after a TTL"""
+
+    def __init__(self, max_entries: int = CATALOG_CACHE_MAX_ENTRIES, ttl: float = CATALOG_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value); expired entries count as missing"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._entries[key] = (time.monotonic() + (ttl if ttl is not None else self.ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def clear(self):
+        self._entries.clear()
+
+
+class CacheBackend:
+    """Storage used by CatalogCache"""
+
+    # Called with (keys, prefixes) when another process invalidated entries
+    on_remote_invalidate: Optional[InvalidationListener] = None
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        raise NotImplementedError
+
+    async def versions(self, keys: List[str]) -> Dict[str, Any]:
+        """Opaque per-key stamps taken before a load; set() drops the value if the key was invalidated since"""
+        return {}
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, version: Any = None):
+        raise NotImplementedError
+
+    async def delete(self, keys: List[str]):
+        raise NotImplementedError
+
+    async def delete_prefix(self, prefix: str):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """Process-local LRU+TTL storage; each uvicorn worker has its own copy"""
+
+    def __init__(self, store: Optional[TTLCache] = None):
+        self.store = store or TTLCache()
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        return self.store.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, version: Any = None):
+        self.store.set(key, value, ttl)
+
+    async def delete(self, keys: List[str]):
+        for key in keys:
+            self.store.delete(key)
+
+    async def delete_prefix(self, prefix: str):
+        self.store.delete_prefix(prefix)
+
+    def stats(self) -> dict:
+        return {"backend": "local", "entries": len(self.store), "evictions": self.store.evictions}
+
+
+class RedisCacheBackend(CacheBackend):
+    """Storage shared by every worker through a Redis-protocol server.
+
+    Values live in Redis as JSON with a short-lived local LRU in front;
+    models are validated again on read, and an entry that no longer decodes
+    (say, written by a worker running an older model) counts as a miss.
+    Invalidations delete the Redis keys and are published on a channel, and
+    every other worker evicts its local copies when the message arrives. They
+    also bump a per-key version (prefix invalidations a shared epoch), and a
+    load only writes its value back if neither moved since it started, so a
+    worker that read Mongo before another worker's write can't put the old
+    value back into Redis. If Redis is unreachable, reads fall through to
+    Mongo and writes only touch the local tier, so entries can be stale
+    across workers until the local TTL runs out.
+    """
+
+    def __init__(
+        self,
+        url: str = CATALOG_CACHE_REDIS_URL,
+        client=None,
+        local: Optional[TTLCache] = None,
+        local_ttl: float = CATALOG_CACHE_LOCAL_TTL_SECONDS,
+        namespace: str = "mfrida:catalog:",
+        channel: str = "mfrida:catalog:invalidate"
+    ):
+        self.url = url
+        self.client = client
+        self.local = local or TTLCache()
+        self.local_ttl = local_ttl
+        self.namespace = namespace
+        # Outside the value namespace, so delete_prefix never scans them
+        self.version_namespace = f"{namespace.rstrip(':')}-version:"
+        self.epoch_key = f"{namespace.rstrip(':')}-epoch"
+        self.channel = channel
+        self.instance_id = uuid.uuid4().hex
+        self.remote_hits = 0
+        self.errors = 0
+        self.stale_writes = 0
+        self.invalidations_received = 0
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.client is None:
+            # Optional dependency, only needed when CATALOG_CACHE_BACKEND=redis
+            import redis.asyncio as redis
+            self.client = redis.from_url(self.url)
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+        if self.client is not None:
+            await self.client.aclose()
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        found, value = self.local.get(key)
+        if found:
+            return True, value
+        try:
+            raw = await self.client.get(self.namespace + key)
+        except Exception as e:
+            self._record_error("get", e)
+            return False, None
+        if raw is None:
+            return False, None
+        try:
+            value = decode_shared(raw)
+        except Exception as e:
+            self._record_error("decode", e)
+            return False, None
+        self.remote_hits += 1
+        self.local.set(key, value, self.local_ttl)
+        return True, value
+
+    async def versions(self, keys: List[str]) -> Dict[str, Any]:
+        try:
+            values = await self.client.mget([self.version_namespace + key for key in keys] + [self.epoch_key])
+        except Exception as e:
+            self._record_error("versions", e)
+            return {}
+        return {key: (version, values[-1]) for key, version in zip(keys, values)}
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None, version: Any = None):
+        ttl = ttl if ttl is not None else CATALOG_CACHE_TTL_SECONDS
+        try:
+            raw = encode_shared(value)
+            if version is None:
+                await self.client.set(self.namespace + key, raw, px=int(ttl * 1000))
+            elif not await self._set_if_current(key, raw, ttl, version):
+                # Invalidated while loading: the value may predate the write, so keep it out of both tiers
+                self.stale_writes += 1
+                return
+        except Exception as e:
+            self._record_error("set", e)
+        self.local.set(key, value, min(ttl, self.local_ttl))
+
+    async def _set_if_current(self, key: str, raw: bytes, ttl: float, version: Tuple[Any, Any]) -> bool:
+        """SET unless the key's version or the prefix epoch changed since version was read (WATCH/MULTI)"""
+        from redis.exceptions import WatchError
+        version_key = self.version_namespace + key
+        async with self.client.pipeline(transaction=True) as pipe:
+            await pipe.watch(version_key, self.epoch_key)
+            if (await pipe.get(version_key), await pipe.get(self.epoch_key)) != tuple(version):
+                return False
+            pipe.multi()
+            pipe.set(self.namespace + key, raw, px=int(ttl * 1000))
+            try:
+                await pipe.execute()
+            except WatchError:
+                return False
+        return True
+
+    async def delete(self, keys: List[str]):
+        for key in keys:
+            self.local.delete(key)
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                for key in keys:
+                    pipe.incr(self.version_namespace + key)
+                    pipe.pexpire(self.version_namespace + key, int(CATALOG_CACHE_VERSION_TTL_SECONDS * 1000))
+                pipe.delete(*[self.namespace + key for key in keys])
+                await pipe.execute()
+            await self._publish({"keys": keys, "prefixes": []})
+        except Exception as e:
+            self._record_error("delete", e)
+
+    async def delete_prefix(self, prefix: str):
+        self.local.delete_prefix(prefix)
+        try:
+            await self.client.incr(self.epoch_key)
+            batch = []
+            async for redis_key in self.client.scan_iter(match=f"{self.namespace}{prefix}*", count=500):
+                batch.append(redis_key)
+                if len(batch) >= 500:
+                    await self.client.delete(*batch)
+                    batch = []
+            if batch:
+                await self.client.delete(*batch)
+            await self._publish({"keys": [], "prefixes": [prefix]})
+        except Exception as e:
+            self._record_error("delete_prefix", e)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "entries": len(self.local),
+            "evictions": self.local.evictions,
+            "remote_hits": self.remote_hits,
+            "errors": self.errors,
+            "stale_writes": self.stale_writes,
+            "invalidations_received": self.invalidations_received,
+        }
+
+    async def _publish(self, message: dict):
+        await self.client.publish(self.channel, json.dumps({**message, "origin": self.instance_id}))
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    payload = json.loads(message["data"])
+                    if payload.get("origin") == self.instance_id:
+                        continue
+                    self.invalidations_received += 1
+                    for key in payload.get("keys", []):
+                        self.local.delete(key)
+                    for prefix in payload.get("prefixes", []):
+                        self.local.delete_prefix(prefix)
+                    if self.on_remote_invalidate:
+                        await self.on_remote_invalidate(payload.get("keys", []), payload.get("prefixes", []))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Messages sent while disconnected are lost, so drop the local tier
+                self._record_error("listen", e)
+                self.local.clear()
+                await asyncio.sleep(1)
+                try:
+                    await self._pubsub.subscribe(self.channel)
+                except Exception:
+                    pass
+
+    def _record_error(self, operation: str, error: Exception):
+        self.errors += 1
+        logger.warning(f"Catalog cache redis {operation} failed: {error}")
+
+
+class CatalogCache:
+    """Read-through cache for catalog data that changes only on admin writes.
+
+    Concurrent misses for the same key share a single load (single-flight);
+    if the caller running it is cancelled, the others start a fresh one.
+    Writers await invalidate()/invalidate_prefix() after changing Mongo; a load
+    that overlaps an invalidation of its key, local or from another worker, is
+    returned to its callers but not stored. Key invalidations only affect
+    loads of those keys; prefix invalidations affect every load in flight.
+    """
+
+    def __init__(self, backend: Optional[CacheBackend] = None):
+        self.backend = backend or LocalCacheBackend()
+        self.backend.on_remote_invalidate = self._on_remote_invalidate
+        self.hits = 0
+        self.misses = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._generation = 0
+        # key -> [loads running, invalidations seen since the first began]; only keys being loaded are tracked
+        self._loads: Dict[str, List[int]] = {}
+        self._listeners: List[InvalidationListener] = []
+
+    async def start(self):
+        await self.backend.start()
+
+    async def close(self):
+        await self.backend.close()
+
+    def add_invalidation_listener(self, listener: InvalidationListener):
+        """Register a callback for invalidations published by other workers"""
+        self._listeners.append(listener)
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        """Return the cached value for key, calling loader once on a miss. None results are not cached."""
+        found, value = await self.backend.get(key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            try:
+                return await asyncio.shield(inflight)
+            except LoadAbandoned:
+                # The entry is already gone, so the first waiter back in leads the next load
+                return await self.get_or_load(key, loader, ttl)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on the future; don't warn about an unretrieved exception
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        stamp = self._begin_load([key])
+        try:
+            versions = await self.backend.versions([key])
+            value = await loader()
+            if value is not None and self._unchanged(stamp, key):
+                await self.backend.set(key, value, ttl, versions.get(key))
+        except asyncio.CancelledError:
+            future.set_exception(LoadAbandoned(key))
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            self._end_load([key])
+
+        future.set_result(value)
+        return value
+
+    async def get_many_or_load(
+        self,
+        keys: List[str],
+        loader: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+        ttl: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Batch lookup: loader receives every missing key at once and returns {key: value}"""
+        results = {}
+        missing = []
+        for key in keys:
+            found, value = await self.backend.get(key)
+            if found:
+                self.hits += 1
+                results[key] = value
+            else:
+                self.misses += 1
+                missing.append(key)
+
+        if missing:
+            stamp = self._begin_load(missing)
+            try:
+                versions = await self.backend.versions(missing)
+                loaded = await loader(missing)
+                for key, value in loaded.items():
+                    if value is not None and key in stamp[1] and self._unchanged(stamp, key):
+                        await self.backend.set(key, value, ttl, versions.get(key))
+            finally:
+                self._end_load(missing)
+            results.update(loaded)
+        return results
+
+    async def invalidate(self, *keys: str):
+        self._invalidate_keys(keys)
+        await self.backend.delete(list(keys))
+
+    async def invalidate_prefix(self, prefix: str):
+        self._generation += 1
+        self._drop_inflight_prefix(prefix)
+        await self.backend.delete_prefix(prefix)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "inflight": len(self._inflight),
+            **self.backend.stats(),
+        }
+
+    def _begin_load(self, keys: List[str]) -> Tuple[int, Dict[str, int]]:
+        """Snapshot of the generations a load of keys must still see before storing its result"""
+        for key in keys:
+            self._loads.setdefault(key, [0, 0])[0] += 1
+        return self._generation, {key: self._loads[key][1] for key in keys}
+
+    def _unchanged(self, stamp: Tuple[int, Dict[str, int]], key: str) -> bool:
+        generation, key_generations = stamp
+        return generation == self._generation and self._loads[key][1] == key_generations[key]
+
+    def _end_load(self, keys: List[str]):
+        for key in keys:
+            load = self._loads[key]
+            load[0] -= 1
+            if not load[0]:
+                del self._loads[key]
+
+    def _invalidate_keys(self, keys: Iterable[str]):
+        for key in keys:
+            self._inflight.pop(key, None)
+            load = self._loads.get(key)
+            if load:
+                load[1] += 1
+
+    def _drop_inflight_prefix(self, prefix: str):
+        for key in [key for key in self._inflight if key.startswith(prefix)]:
+            del self._inflight[key]
+
+    async def _on_remote_invalidate(self, keys: List[str], prefixes: List[str]):
+        self._invalidate_keys(keys)
+        if prefixes:
+            self._generation += 1
+        for prefix in prefixes:
+            self._drop_inflight_prefix(prefix)
+        for listener in self._listeners:
+            try:
+                await listener(keys, prefixes)
+            except Exception as e:
+                logger.error(f"Cache invalidation listener failed: {e}")
+
+
+def create_cache_backend(name: str = CATALOG_CACHE_BACKEND) -> CacheBackend:
+    if name == "redis":
+        return RedisCacheBackend()
+    if name == "local":
+        return LocalCacheBackend()
+    raise ValueError(f"Unknown CATALOG_CACHE_BACKEND: {name}")
+
+
+# Cache keys, kept in one place so readers and invalidating writers agree
+PRODUCT_KEY_PREFIX = "product:id:"
+
+
+def product_key(product_id: str) -> str:
+    return f"{PRODUCT_KEY_PREFIX}{product_id}"
+
+
+def product_slug_key(slug: str) -> str:
+    return f"product:slug:{slug}"
+
+
+def variant_group_key(variant_group: str) -> str:
+    return f"product:group:{variant_group}"
+
+
+# Facet counts over the whole catalog; evicted by every product write
+PRODUCT_FACETS_KEY = "product:facets"
+
+
+CATEGORIES_PREFIX = "categories:"
+BANNERS_PREFIX = "banners:"
+HOMEPAGE_KEY = "homepage_config"
+NAVIGATION_KEY = "navigation_items"
+
+# Shared by every service and router in this process
+catalog_cache = CatalogCache(create_cache_backend())
@@ -1,9 +1,12 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
 from models.category_model import CategoryCreate, CategoryUpdate, Category
+from services.cache_service import catalog_cache, CATEGORIES_PREFIX
 import uuid
 from datetime import datetime, timezone
 from typing import List, Optional
 
+@profiled
 class CategoryService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
@@ -23,15 +26,20 @@ class CategoryService:
         
         await self.collection.insert_one(doc)
         doc.pop("_id", None)
+        await catalog_cache.invalidate_prefix(CATEGORIES_PREFIX)
         return Category(**doc)
     
     async def get_categories(self, is_active: Optional[bool] = None) -> List[Category]:
-        query = {}
-        if is_active is not None:
-            query["is_active"] = is_active
+        async def load() -> List[Category]:
+            query = {}
+            if is_active is not None:
+                query["is_active"] = is_active
+            
+            categories = await self.collection.find(query, {"_id": 0}).sort("display_order", 1).to_list(1000)
+            return [Category(**cat) for cat in categories]
         
-        categories = await self.collection.find(query, {"_id": 0}).sort("display_order", 1).to_list(1000)
-        return [Category(**cat) for cat in categories]
+        # Callers get a fresh list so they can't reorder the cached one
+        return list(await catalog_cache.get_or_load(f"{CATEGORIES_PREFIX}{is_active}", load))
     
     async def get_category_by_id(self, category_id: str) -> Optional[Category]:
         category = await self.collection.find_one({"id": category_id}, {"_id": 0})
@@ -50,9 +58,11 @@ class CategoryService:
             {"id": category_id},
             {"$set": update_data}
         )
+        await catalog_cache.invalidate_prefix(CATEGORIES_PREFIX)
         
         return await self.get_category_by_id(category_id)
     
     async def delete_category(self, category_id: str) -> bool:
         result = await self.collection.delete_one({"id": category_id})
+        await catalog_cache.invalidate_prefix(CATEGORIES_PREFIX)
         return result.deleted_count > 0
@@ -0,0 +1,195 @@
+"""Admin dashboard figures computed inside MongoDB.
+
+Order counts, revenue and the recent orders come from one $facet aggregation
+over orders, and the product figures from one $facet over products, so no
+order document is shipped to Python. Revenue series are built from per-day
+buckets and rolled up into weeks or months. Revenue and paid orders count
+sales as sales_rollup_service does: paid and not cancelled.
+
+With DASHBOARD_USE_ROLLUPS revenue and paid orders are read from the
+sales_daily rollup instead (one small document per day, kept current by
+order transitions), so the dashboard and the sales reports agree. Only the
+series window's orders are counted from the orders collection.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from services.sales_rollup_service import DAILY, SALE_FILTER
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+import asyncio
+import os
+
+DASHBOARD_USE_ROLLUPS = os.environ.get("DASHBOARD_USE_ROLLUPS", "false").lower() in ("1", "true", "yes")
+LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", "10"))
+
+PERIODS = ("day", "week", "month")
+DEFAULT_POINTS = {"day": 30, "week": 12, "month": 12}
+RECENT_ORDERS = 10
+LOW_STOCK_PRODUCTS = 10
+
+# created_at is an ISO-8601 UTC string, so its first 10 characters are the day
+DAY_EXPRESSION = {"$substrBytes": ["$created_at", 0, 10]}
+# SALE_FILTER as an aggregation expression
+SALE_EXPRESSION = {"$and": [{"$eq": ["$payment_status", "completed"]}, {"$ne": ["$order_status", "cancelled"]}]}
+
+
+def period_start(period: str, points: int, today: Optional[date] = None) -> date:
+    """First day of the oldest bucket in a series of `points` buckets ending with the current one"""
+    today = today or datetime.now(timezone.utc).date()
+    if period == "day":
+        return today - timedelta(days=points - 1)
+    if period == "week":
+        return today - timedelta(days=today.weekday(), weeks=points - 1)
+    month = today.year * 12 + today.month - 1 - (points - 1)
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def period_key(day: str, period: str) -> str:
+    """Bucket a YYYY-MM-DD day into its day, ISO week (Monday) or month"""
+    if period == "day":
+        return day
+    if period == "month":
+        return day[:7]
+    parsed = date.fromisoformat(day)
+    return (parsed - timedelta(days=parsed.weekday())).isoformat()
+
+
+def build_series(days: List[dict], period: str, points: int, today: Optional[date] = None) -> List[dict]:
+    """Roll daily buckets up into `points` consecutive periods, oldest first, with empty periods as zeros"""
+    start = period_start(period, points, today)
+    series: Dict[str, dict] = {}
+    cursor = start
+    end = today or datetime.now(timezone.utc).date()
+    while cursor <= end:
+        key = period_key(cursor.isoformat(), period)
+        series.setdefault(key, {"period": key, "orders": 0, "paid_orders": 0, "revenue": 0.0})
+        cursor += timedelta(days=1)
+
+    for bucket in days:
+        point = series.get(period_key(bucket["_id"], period))
+        if point is None:
+            continue
+        point["orders"] += bucket.get("orders", 0)
+        point["paid_orders"] += bucket.get("paid_orders", 0)
+        point["revenue"] += bucket.get("revenue", 0)
+
+    for point in series.values():
+        point["revenue"] = round(point["revenue"], 2)
+    return list(series.values())
+
+
+@profiled
+class DashboardService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.orders = db.orders
+        self.products = db.products
+        self.users = db.users
+        self.sales_daily = db[DAILY]
+
+    async def get_stats(self, period: str = "day", points: Optional[int] = None, use_rollups: Optional[bool] = None) -> dict:
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period '{period}', use one of {', '.join(PERIODS)}")
+        points = points or DEFAULT_POINTS[period]
+        use_rollups = DASHBOARD_USE_ROLLUPS if use_rollups is None else use_rollups
+        start = period_start(period, points).isoformat()
+
+        order_stats = self._rollup_order_stats(start) if use_rollups else self._live_order_stats(start)
+        orders, products, total_users = await asyncio.gather(
+            order_stats,
+            self._product_stats(),
+            self.users.count_documents({"role": "customer"}),
+        )
+
+        return {
+            "total_orders": orders["total_orders"],
+            "total_products": products["total_products"],
+            "total_users": total_users,
+            "pending_orders": orders["pending_orders"],
+            "total_revenue": orders["total_revenue"],
+            "recent_orders": orders["recent_orders"],
+            "low_stock_products": products["low_stock_products"],
+            "revenue_series": {
+                "period": period,
+                "points": build_series(orders["days"], period, points),
+            },
+            "source": "rollups" if use_rollups else "orders",
+        }
+
+    async def _live_order_stats(self, series_start: str) -> dict:
+        pipeline = [{"$facet": {
+            "total": [{"$count": "count"}],
+            "pending": [{"$match": {"order_status": "pending"}}, {"$count": "count"}],
+            "revenue": [
+                {"$match": SALE_FILTER},
+                {"$group": {"_id": None, "total": {"$sum": "$total"}}},
+            ],
+            "recent": [
+                {"$sort": {"created_at": -1, "id": -1}},
+                {"$limit": RECENT_ORDERS},
+                {"$project": {"_id": 0}},
+            ],
+            "days": [
+                {"$match": {"created_at": {"$gte": series_start}}},
+                *self._day_buckets(),
+            ],
+        }}]
+        result = (await self.orders.aggregate(pipeline).to_list(1))[0]
+        return {
+            "total_orders": result["total"][0]["count"] if result["total"] else 0,
+            "pending_orders": result["pending"][0]["count"] if result["pending"] else 0,
+            "total_revenue": round(result["revenue"][0]["total"], 2) if result["revenue"] else 0,
+            "recent_orders": result["recent"],
+            "days": result["days"],
+        }
+
+    async def _rollup_order_stats(self, series_start: str) -> dict:
+        totals_pipeline = [{"$group": {"_id": None, "net": {"$sum": "$net"}}}]
+        totals, sales, placed, total_orders, pending, recent = await asyncio.gather(
+            self.sales_daily.aggregate(totals_pipeline).to_list(1),
+            self.sales_daily.find({"day": {"$gte": series_start}}, {"_id": 0, "day": 1, "orders": 1, "net": 1}).to_list(None),
+            # sales_daily only counts sales, so orders placed per day come from the window's slice of the created_at index
+            self.orders.aggregate([
+                {"$match": {"created_at": {"$gte": series_start}}},
+                {"$group": {"_id": DAY_EXPRESSION, "orders": {"$sum": 1}}},
+            ]).to_list(None),
+            self.orders.estimated_document_count(),
+            # Pending orders change status long after their day's bucket, so count them off the index
+            self.orders.count_documents({"order_status": "pending"}),
+            self.orders.find({}, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).limit(RECENT_ORDERS).to_list(RECENT_ORDERS),
+        )
+        days = placed + [{"_id": bucket["day"], "paid_orders": bucket["orders"], "revenue": bucket["net"]} for bucket in sales]
+        return {
+            "total_orders": total_orders,
+            "pending_orders": pending,
+            "total_revenue": round(totals[0]["net"], 2) if totals else 0,
+            "recent_orders": recent,
+            "days": days,
+        }
+
+    async def _product_stats(self) -> dict:
+        pipeline = [{"$facet": {
+            "total": [{"$count": "count"}],
+            "low_stock": [
+                {"$match": {"stock": {"$lt": LOW_STOCK_THRESHOLD}}},
+                {"$sort": {"stock": 1, "id": 1}},
+                {"$limit": LOW_STOCK_PRODUCTS},
+                {"$project": {"_id": 0, "stock_holds": 0}},
+            ],
+        }}]
+        result = (await self.products.aggregate(pipeline).to_list(1))[0]
+        return {
+            "total_products": result["total"][0]["count"] if result["total"] else 0,
+            "low_stock_products": result["low_stock"],
+        }
+
+    @staticmethod
+    def _day_buckets() -> List[dict]:
+        return [
+            {"$group": {
+                "_id": DAY_EXPRESSION,
+                "orders": {"$sum": 1},
+                "paid_orders": {"$sum": {"$cond": [SALE_EXPRESSION, 1, 0]}},
+                "revenue": {"$sum": {"$cond": [SALE_EXPRESSION, "$total", 0]}},
+            }},
+            {"$sort": {"_id": 1}},
+        ]
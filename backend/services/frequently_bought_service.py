@@ -1,34 +1,33 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
 from models.frequently_bought_model import FrequentlyBought, FrequentlyBoughtCreate, FrequentlyBoughtUpdate
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from typing import Optional
 from datetime import datetime, timezone
 import uuid
 
+@profiled
 class FrequentlyBoughtService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db['frequently_bought_together']
     
     async def create_or_update(self, data: FrequentlyBoughtCreate) -> FrequentlyBought:
-        existing = await self.collection.find_one({'product_id': data.product_id})
-        
-        if existing:
-            # Update existing
-            update_dict = data.model_dump()
-            update_dict['updated_at'] = datetime.now(timezone.utc)
-            
+        now = datetime.now(timezone.utc)
+        update = {
+            '$set': {**data.model_dump(), 'updated_at': now},
+            '$setOnInsert': {'id': str(uuid.uuid4()), 'created_at': now}
+        }
+        try:
             result = await self.collection.find_one_and_update(
-                {'product_id': data.product_id},
-                {'$set': update_dict},
-                return_document=True
+                {'product_id': data.product_id}, update, projection={'_id': 0}, upsert=True, return_document=ReturnDocument.AFTER
             )
-            return FrequentlyBought(**result)
-        else:
-            # Create new
-            fbt_dict = data.model_dump()
-            fbt_dict['id'] = str(uuid.uuid4())
-            
-            await self.collection.insert_one(fbt_dict)
-            return FrequentlyBought(**fbt_dict)
+        except DuplicateKeyError:
+            # A concurrent create for the same product inserted first (product_id is unique), so update that entry
+            result = await self.collection.find_one_and_update(
+                {'product_id': data.product_id}, {'$set': update['$set']}, projection={'_id': 0}, return_document=ReturnDocument.AFTER
+            )
+        return FrequentlyBought(**result)
     
     async def get_by_product(self, product_id: str) -> Optional[FrequentlyBought]:
         result = await self.collection.find_one({'product_id': product_id})
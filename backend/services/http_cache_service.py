@@ -0,0 +1,106 @@
+from fastapi import Request, Response
+from motor.motor_asyncio import AsyncIOMotorCollection
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+
+# Cache-Control per route policy; override with HTTP_CACHE_CONTROL='{"product": "no-cache"}'
+DEFAULT_CACHE_CONTROL = {
+    "product": "public, max-age=60",
+    "product_list": "public, max-age=30",
+    "categories": "public, max-age=300",
+    "banners": "public, max-age=300",
+    "navigation": "public, max-age=300",
+    "homepage": "public, max-age=60",
+}
+CACHE_CONTROL = {**DEFAULT_CACHE_CONTROL, **json.loads(os.environ.get("HTTP_CACHE_CONTROL", "{}"))}
+
+Validators = Tuple[str, Optional[datetime]]
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """updated_at is an ISO string in most collections and a datetime in some; normalise to aware UTC"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    # Weak: the same data can serialise to different bytes
+    return f'W/"{digest}"'
+
+
+def item_validators(items: Iterable, *parts) -> Validators:
+    """Validators for models already in memory (cached lists or single documents)"""
+    timestamps = [parse_timestamp(getattr(item, "updated_at", None)) for item in items]
+    timestamps = [ts for ts in timestamps if ts is not None]
+    last_modified = max(timestamps) if timestamps else None
+    return make_etag(*parts, len(timestamps), last_modified.isoformat() if last_modified else ""), last_modified
+
+
+async def collection_validators(collection: AsyncIOMotorCollection, query: dict, *parts) -> Validators:
+    """Validators for a filtered list from the newest updated_at and the count, both answered from indexes"""
+    newest, count = await asyncio.gather(
+        collection.find(query, {"_id": 0, "updated_at": 1}).sort("updated_at", -1).limit(1).to_list(1),
+        collection.count_documents(query)
+    )
+    last_modified = parse_timestamp(newest[0].get("updated_at")) if newest else None
+    return make_etag(*parts, count, last_modified.isoformat() if last_modified else ""), last_modified
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    if "*" in candidates:
+        return True
+    # If-None-Match uses weak comparison
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((c[2:] if c.startswith("W/") else c) == bare for c in candidates)
+
+
+def _not_modified_since(header: str, last_modified: Optional[datetime]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have one-second resolution
+    return last_modified.replace(microsecond=0) <= since
+
+
+def conditional_response(
+    request: Request,
+    response: Response,
+    policy: str,
+    validators: Validators
+) -> Optional[Response]:
+    """Set ETag/Last-Modified/Cache-Control on response, or return a 304 if the client's copy is current"""
+    etag, last_modified = validators
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL[policy]}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        not_modified = _etag_matches(if_none_match, etag)
+    else:
+        not_modified = _not_modified_since(request.headers.get("if-modified-since", ""), last_modified)
+
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
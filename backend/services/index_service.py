@@ -0,0 +1,240 @@
+"""Declarative MongoDB index registry.
+
+ensure_indexes() runs on startup and creates every index below idempotently.
+Run as a module to check which service queries still fall back to COLLSCAN:
+
+    python -m services.index_service --report
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from typing import Dict, List
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("role", ASCENDING), ("created_at", DESCENDING)], name="role_created_at"),
+    ],
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("slug", ASCENDING)], name="slug_unique", unique=True),
+        IndexModel([("variant_group", ASCENDING)], name="variant_group"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("category_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="category_created_at_id"),
+        IndexModel([("brand", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="brand_created_at_id"),
+        IndexModel([("is_featured", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="featured_created_at_id"),
+        IndexModel([("is_best_selling", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="best_selling_created_at_id"),
+        IndexModel([("is_new_arrival", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="new_arrival_created_at_id"),
+        IndexModel([("final_price", ASCENDING), ("id", ASCENDING)], name="final_price_id"),
+        IndexModel([("price", ASCENDING), ("id", ASCENDING)], name="price_id"),
+        IndexModel([("name", ASCENDING), ("id", ASCENDING)], name="name_id"),
+        IndexModel([("average_rating", ASCENDING), ("id", ASCENDING)], name="average_rating_id"),
+        IndexModel([("stock", ASCENDING)], name="stock"),
+        # Newest updated_at for the list ETag (http_cache_service.collection_validators)
+        IndexModel([("updated_at", DESCENDING)], name="updated_at"),
+        IndexModel([("category_id", ASCENDING), ("updated_at", DESCENDING)], name="category_updated_at"),
+    ],
+    "variant_groups": [
+        IndexModel([("group", ASCENDING)], name="group_unique", unique=True),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("display_order", ASCENDING)], name="display_order"),
+    ],
+    "orders": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_created_at_id"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel(
+            [("order_status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="order_status_created_at_id",
+        ),
+        IndexModel([("payment_status", ASCENDING), ("created_at", ASCENDING)], name="payment_status_created_at"),
+        IndexModel(
+            [("phonepe_merchant_transaction_id", ASCENDING)],
+            name="phonepe_merchant_transaction_id",
+            sparse=True,
+        ),
+        IndexModel(
+            [("stock_reservation.status", ASCENDING), ("stock_reservation.expires_at", ASCENDING)],
+            name="stock_reservation_status_expires_at",
+            sparse=True,
+        ),
+    ],
+    "reviews": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel(
+            [("product_id", ASCENDING), ("is_approved", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="product_approved_created_at_id",
+        ),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "product_images": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("product_id", ASCENDING), ("sort_order", ASCENDING)], name="product_sort_order"),
+    ],
+    "product_variants": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("parent_product_id", ASCENDING)], name="parent_product_id"),
+    ],
+    "frequently_bought_together": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("product_id", ASCENDING)], name="product_id_unique", unique=True),
+    ],
+    "banners": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("display_order", ASCENDING)], name="display_order"),
+    ],
+    "navigation_items": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("display_order", ASCENDING)], name="display_order"),
+    ],
+    "homepage_config": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    ],
+    "wishlist_items": [
+        IndexModel([("user_id", ASCENDING), ("product_id", ASCENDING)], name="user_id_product_id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+    ],
+    "phonepe_webhook_inbox": [
+        IndexModel([("status", ASCENDING), ("retry_at", ASCENDING)], name="status_retry_at"),
+        IndexModel([("status", ASCENDING), ("claimed_at", ASCENDING)], name="status_claimed_at"),
+        IndexModel([("merchant_order_id", ASCENDING), ("received_at", ASCENDING)], name="merchant_order_id_received_at"),
+        IndexModel(
+            [("received_at", ASCENDING)],
+            name="received_at_ttl",
+            expireAfterSeconds=int(os.environ.get("WEBHOOK_INBOX_RETENTION_DAYS", "30")) * 86400,
+        ),
+    ],
+    "sales_daily": [
+        IndexModel([("day", ASCENDING)], name="day"),
+    ],
+    "sales_daily_products": [
+        IndexModel([("day", ASCENDING), ("product_id", ASCENDING)], name="day_product_id"),
+        IndexModel([("product_id", ASCENDING), ("day", ASCENDING)], name="product_id_day"),
+    ],
+    "sales_daily_categories": [
+        IndexModel([("day", ASCENDING), ("category_id", ASCENDING)], name="day_category_id"),
+    ],
+}
+
+# Representative query shapes issued by the services: (collection, filter, sort)
+SERVICE_QUERIES = [
+    ("AuthService.authenticate_user", "users", {"email": "x@example.com"}, None),
+    ("AuthService.get_user_by_id", "users", {"id": "x"}, None),
+    ("ProductService.get_products", "products", {}, [("created_at", -1), ("id", -1)]),
+    ("ProductService.get_products(category)", "products", {"category_id": "x"}, [("created_at", -1), ("id", -1)]),
+    ("ProductFacetService.browse(brand)", "products", {"brand": "x"}, [("created_at", -1), ("id", -1)]),
+    ("ProductService.get_products(featured)", "products", {"is_featured": True}, [("created_at", -1), ("id", -1)]),
+    ("ProductService.get_products(price)", "products", {"final_price": {"$gte": 100, "$lte": 500}}, [("final_price", 1), ("id", 1)]),
+    ("collection_validators(products)", "products", {}, [("updated_at", -1)]),
+    ("collection_validators(category)", "products", {"category_id": "x"}, [("updated_at", -1)]),
+    ("ProductService.get_product_by_id", "products", {"id": "x"}, None),
+    ("ProductService.get_product_by_slug", "products", {"slug": "x"}, None),
+    ("VariantGroupService.members", "variant_groups", {"group": "x"}, None),
+    ("VariantGroupService.group_names", "variant_groups", {}, [("group", 1)]),
+    ("VariantGroupService.refresh", "products", {"variant_group": "x"}, None),
+    ("ProductService.get_related_products_by_ids", "products", {"id": {"$in": ["x", "y"]}}, None),
+    ("CategoryService.get_categories", "categories", {}, [("display_order", 1)]),
+    ("CategoryService.get_category_by_id", "categories", {"id": "x"}, None),
+    ("OrderService.get_orders(user)", "orders", {"user_id": "x"}, [("created_at", -1), ("id", -1)]),
+    ("OrderService.get_orders(admin)", "orders", {}, [("created_at", -1), ("id", -1)]),
+    ("OrderService.get_orders(status)", "orders", {"order_status": "pending"}, [("created_at", -1), ("id", -1)]),
+    ("OrderService.get_order_by_id", "orders", {"id": "x"}, None),
+    ("ReviewService.get_reviews(product)", "reviews", {"product_id": "x", "is_approved": True}, [("created_at", -1), ("id", -1)]),
+    ("ReviewService.get_reviews(admin)", "reviews", {}, [("created_at", -1), ("id", -1)]),
+    ("ReviewService.get_review_by_id", "reviews", {"id": "x"}, None),
+    ("ProductImageService.get_product_images", "product_images", {"product_id": "x"}, [("sort_order", 1)]),
+    ("ProductVariantService.get_product_variants", "product_variants", {"parent_product_id": "x"}, None),
+    ("FrequentlyBoughtService.get_by_product", "frequently_bought_together", {"product_id": "x"}, None),
+    ("WishlistService.get_wishlist", "wishlist_items", {"user_id": "x"}, [("created_at", -1)]),
+    ("WishlistService.check_many_in_wishlist", "wishlist_items", {"user_id": "x", "product_id": {"$in": ["x", "y"]}}, None),
+    ("banners.get_banners", "banners", {}, [("display_order", 1)]),
+    ("admin.get_navigation_items", "navigation_items", {}, [("display_order", 1)]),
+    ("admin.get_homepage_config", "homepage_config", {"id": "homepage_config"}, None),
+]
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """Create every registered index; existing identical indexes are a no-op"""
+    for collection_name, indexes in INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Usually duplicate data under a unique index or a conflicting index
+            # created by hand; keep starting up and create what we can one by one
+            logger.warning(f"Bulk index creation failed on {collection_name}: {e}")
+            for index in indexes:
+                try:
+                    await db[collection_name].create_indexes([index])
+                except OperationFailure as index_error:
+                    logger.error(f"Index {index.document['name']} on {collection_name} not created: {index_error}")
+
+
+def plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage", "")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(plan_stages(child))
+    return stages
+
+
+async def report_collscans(db: AsyncIOMotorDatabase) -> List[dict]:
+    """Explain every registered service query and return the winning plan stages"""
+    results = []
+    for label, collection_name, query_filter, sort in SERVICE_QUERIES:
+        command = {"find": collection_name, "filter": query_filter}
+        if sort:
+            command["sort"] = dict(sort)
+        explain = await db.command("explain", command, verbosity="queryPlanner")
+        stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+        results.append({
+            "query": label,
+            "collection": collection_name,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Create indexes and report COLLSCAN query plans")
+    parser.add_argument("--report", action="store_true", help="explain service queries and list COLLSCANs")
+    parser.add_argument("--skip-create", action="store_true", help="do not create indexes before reporting")
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        try:
+            if not args.skip_create:
+                await ensure_indexes(db)
+                print("Indexes ensured")
+            if not args.report:
+                return 0
+
+            results = await report_collscans(db)
+            for result in results:
+                marker = "COLLSCAN" if result["collscan"] else "ok"
+                print(f"{marker:<9} {result['query']:<48} {' <- '.join(result['stages'])}")
+            return 1 if any(result["collscan"] for result in results) else 0
+        finally:
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,267 @@
+"""Server-side order pricing and stock reservation.
+
+An order's lines are priced from the catalog, not from the client, and their
+stock is reserved before the order is written: one bulk_write of conditional
+$inc updates (stock >= quantity) that also push the order id onto the
+product's stock_holds. A line that can't be reserved rolls the others back,
+and because each hold is marked on the product, a release gives back exactly
+what was taken, however often it runs.
+
+The order's stock_reservation records the reserved lines and moves with the
+order:
+
+    held       stock is set aside until expires_at
+    committed  the order was paid; the holds are cleared and the stock stays sold
+    released   the order was cancelled, its payment failed or the hold expired
+
+A move is claimed by switching to an in-between state (committing, releasing,
+or reclaiming for a paid order whose hold had already gone), then the stock
+is changed, then the final state is written. Every stock change is safe to
+repeat, so if the process dies part way the sweeper finishes any move left
+in-between for longer than ORDER_RESERVATION_RETRY_SECONDS.
+
+Holds on unpaid orders expire after ORDER_RESERVATION_TTL_SECONDS; the
+server's sweeper releases them every ORDER_RESERVATION_SWEEP_SECONDS. A payment
+that arrives after its hold was released reserves the stock again, and the
+order is flagged backorder if it has run out in the meantime.
+
+Every stock change bumps the product's updated_at and evicts its cached
+entries, so cached responses and ETags follow the stock.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from pymongo import UpdateOne
+from services.product_service import compute_final_price
+from services.cache_service import catalog_cache, product_key
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ORDER_RESERVATION_TTL_SECONDS = float(os.environ.get("ORDER_RESERVATION_TTL_SECONDS", "900"))
+ORDER_RESERVATION_SWEEP_SECONDS = float(os.environ.get("ORDER_RESERVATION_SWEEP_SECONDS", "60"))
+# A move still in-between after this long is taken to have been interrupted
+ORDER_RESERVATION_RETRY_SECONDS = float(os.environ.get("ORDER_RESERVATION_RETRY_SECONDS", "120"))
+
+HELD = "held"
+COMMITTED = "committed"
+RELEASED = "released"
+BACKORDER = "backorder"
+COMMITTING = "committing"
+RELEASING = "releasing"
+RECLAIMING = "reclaiming"
+IN_BETWEEN = (COMMITTING, RELEASING, RECLAIMING)
+
+PRICING_PROJECTION = {"_id": 0, "id": 1, "name": 1, "images": 1, "price": 1, "discount": 1, "stock": 1}
+
+
+class InsufficientStockError(Exception):
+    """Some order lines asked for more than is in stock; nothing was reserved"""
+
+    def __init__(self, products: List[dict]):
+        self.products = products
+        names = ", ".join(product["name"] for product in products)
+        super().__init__(f"Not enough stock for: {names}")
+
+
+def merge_lines(items) -> Dict[str, int]:
+    """Quantity per product, with repeated lines for one product added together"""
+    lines: Dict[str, int] = {}
+    for item in items:
+        lines[item.product_id] = lines.get(item.product_id, 0) + item.quantity
+    return lines
+
+
+def reservation_lines(order: dict) -> Dict[str, int]:
+    return {line["product_id"]: line["quantity"] for line in order["stock_reservation"]["items"]}
+
+
+@profiled
+class InventoryService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.orders = db.orders
+        self.products = db.products
+
+    async def price_lines(self, lines: Dict[str, int]) -> List[dict]:
+        """Order items priced from the catalog, in line order; raises ValueError for unknown products"""
+        products = {
+            product["id"]: product
+            async for product in self.products.find({"id": {"$in": list(lines)}}, PRICING_PROJECTION)
+        }
+        missing = [product_id for product_id in lines if product_id not in products]
+        if missing:
+            raise ValueError(f"Products not found: {', '.join(missing)}")
+
+        items = []
+        for product_id, quantity in lines.items():
+            product = products[product_id]
+            items.append({
+                "product_id": product_id,
+                "product_name": product["name"],
+                "product_image": product["images"][0] if product.get("images") else "",
+                "quantity": quantity,
+                "price": product["price"],
+                "discount": product.get("discount", 0),
+                "final_price": compute_final_price(product["price"], product.get("discount", 0)),
+            })
+        return items
+
+    async def reserve(self, order_id: str, lines: Dict[str, int]):
+        """Take every line's quantity out of stock for order_id, or none of them (InsufficientStockError).
+
+        Lines order_id already holds count as reserved, so repeating a reservation takes nothing twice.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        result = await self.products.bulk_write([
+            UpdateOne(
+                {"id": product_id, "stock": {"$gte": quantity}, "stock_holds": {"$ne": order_id}},
+                {"$inc": {"stock": -quantity}, "$push": {"stock_holds": order_id}, "$set": {"updated_at": now}}
+            )
+            for product_id, quantity in lines.items()
+        ], ordered=False)
+        if result.modified_count:
+            await self._stock_changed(lines)
+        if result.modified_count == len(lines):
+            return
+
+        short = await self.products.find(
+            {"id": {"$in": list(lines)}, "stock_holds": {"$ne": order_id}},
+            {"_id": 0, "id": 1, "name": 1, "stock": 1}
+        ).to_list(len(lines))
+        if not short:
+            return
+        await self.release(order_id, lines)
+        raise InsufficientStockError(short)
+
+    async def release(self, order_id: str, lines: Dict[str, int]):
+        """Give back the stock order_id holds; lines it doesn't hold are left alone"""
+        now = datetime.now(timezone.utc).isoformat()
+        result = await self.products.bulk_write([
+            UpdateOne(
+                {"id": product_id, "stock_holds": order_id},
+                {"$inc": {"stock": quantity}, "$pull": {"stock_holds": order_id}, "$set": {"updated_at": now}}
+            )
+            for product_id, quantity in lines.items()
+        ], ordered=False)
+        if result.modified_count:
+            await self._stock_changed(lines)
+
+    async def commit(self, order_id: str, lines: Dict[str, int]):
+        """Keep the stock order_id holds as sold"""
+        now = datetime.now(timezone.utc).isoformat()
+        result = await self.products.bulk_write([
+            UpdateOne({"id": product_id, "stock_holds": order_id}, {"$pull": {"stock_holds": order_id}, "$set": {"updated_at": now}})
+            for product_id in lines
+        ], ordered=False)
+        if result.modified_count:
+            await self._stock_changed(lines)
+
+    async def _stock_changed(self, product_ids):
+        """Evict the cached entries of products whose stock just moved.
+
+        Slug entries only map to the id and no facet depends on stock, so only the product keys go.
+        """
+        await catalog_cache.invalidate(*(product_key(product_id) for product_id in product_ids))
+
+    @staticmethod
+    def new_reservation(lines: Dict[str, int]) -> dict:
+        """The stock_reservation stored on an order whose lines were just reserved"""
+        return {
+            "status": HELD,
+            "items": [{"product_id": product_id, "quantity": quantity} for product_id, quantity in lines.items()],
+            "expires_at": (datetime.now(timezone.utc) + timedelta(seconds=ORDER_RESERVATION_TTL_SECONDS)).isoformat(),
+        }
+
+    async def sync_order(self, order_id: str):
+        """Move the order's reservation along with its payment and order status; safe to call any number of times"""
+        order = await self.orders.find_one({"id": order_id}, {"_id": 0, "id": 1, "payment_status": 1, "order_status": 1, "stock_reservation": 1})
+        if not order or not order.get("stock_reservation"):
+            return
+
+        state = order["stock_reservation"]["status"]
+        if order.get("payment_status") == "completed" and order.get("order_status") != "cancelled":
+            if state == HELD:
+                await self._transition(order, HELD, COMMITTING)
+            elif state == RELEASED:
+                await self._transition(order, RELEASED, RECLAIMING)
+        elif state == HELD and (
+            order.get("order_status") == "cancelled" or order.get("payment_status") in ("failed", "refunded")
+        ):
+            await self._transition(order, HELD, RELEASING)
+
+    async def _transition(self, order: dict, from_state: str, to_state: str):
+        # Only the caller that wins the status change touches the stock
+        if await self._set_state(order["id"], from_state, to_state):
+            await self._finish(order["id"], to_state, reservation_lines(order))
+
+    async def _set_state(self, order_id: str, from_state: str, to_state: str) -> bool:
+        result = await self.orders.update_one(
+            {"id": order_id, "stock_reservation.status": from_state},
+            {"$set": {"stock_reservation.status": to_state, "stock_reservation.updated_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        return bool(result.modified_count)
+
+    async def _finish(self, order_id: str, state: str, lines: Dict[str, int]):
+        """Make the stock change an in-between state stands for, then write the final state; safe to repeat"""
+        if state == RECLAIMING:
+            # A payment landed after its hold was released: take the stock again if it's still there
+            try:
+                await self.reserve(order_id, lines)
+            except InsufficientStockError as e:
+                logger.warning(f"Paid order {order_id} is short of stock: {e}")
+                await self._set_state(order_id, RECLAIMING, BACKORDER)
+                return
+            if not await self._set_state(order_id, RECLAIMING, COMMITTING):
+                return
+            state = COMMITTING
+
+        if state == COMMITTING:
+            await self.commit(order_id, lines)
+            await self._set_state(order_id, COMMITTING, COMMITTED)
+        elif state == RELEASING:
+            await self.release(order_id, lines)
+            await self._set_state(order_id, RELEASING, RELEASED)
+        # The order may have been paid or cancelled while the stock was moving
+        await self.sync_order(order_id)
+
+    async def release_expired(self, batch_size: int = 100) -> int:
+        """Release every held reservation past its expiry on an unpaid order; returns how many were released"""
+        now = datetime.now(timezone.utc).isoformat()
+        released = 0
+        while True:
+            expired = await self.orders.find(
+                {"stock_reservation.status": HELD, "stock_reservation.expires_at": {"$lt": now}, "payment_status": {"$ne": "completed"}},
+                {"_id": 0, "id": 1, "stock_reservation": 1}
+            ).limit(batch_size).to_list(batch_size)
+            for order in expired:
+                await self._transition(order, HELD, RELEASING)
+            released += len(expired)
+            if len(expired) < batch_size:
+                return released
+
+    async def resume_interrupted(self, batch_size: int = 100) -> int:
+        """Finish moves left in-between for longer than ORDER_RESERVATION_RETRY_SECONDS; returns how many"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(seconds=ORDER_RESERVATION_RETRY_SECONDS)).isoformat()
+        stalled = await self.orders.find(
+            {"stock_reservation.status": {"$in": list(IN_BETWEEN)}, "stock_reservation.updated_at": {"$lt": cutoff}},
+            {"_id": 0, "id": 1, "stock_reservation": 1}
+        ).limit(batch_size).to_list(batch_size)
+        for order in stalled:
+            logger.warning(f"Finishing interrupted stock move for order {order['id']} ({order['stock_reservation']['status']})")
+            await self._finish(order["id"], order["stock_reservation"]["status"], reservation_lines(order))
+        return len(stalled)
+
+    async def run_expiry_sweeper(self, interval: float = ORDER_RESERVATION_SWEEP_SECONDS):
+        """Release expired reservations and finish interrupted moves until cancelled"""
+        while True:
+            try:
+                await self.resume_interrupted()
+                released = await self.release_expired()
+                if released:
+                    logger.info(f"Released {released} expired stock reservations")
+            except Exception as e:
+                logger.error(f"Stock reservation sweep failed: {e}")
+            await asyncio.sleep(interval)
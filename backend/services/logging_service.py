@@ -0,0 +1,170 @@
+"""Structured logging through a queue, so request handlers never wait on log output.
+
+configure_logging() puts a QueueHandler on the root logger. Records are
+rendered to their message in the calling thread and dropped onto a queue; a
+LogWriter thread takes whatever has piled up, formats it and writes it to
+stderr in one go, so a busy server pays for one wakeup and one write per
+batch rather than per record; lines reach stderr at most LOG_FLUSH_SECONDS
+late. Past LOG_QUEUE_SIZE queued records, new ones are dropped and counted
+rather than blocking the event loop. With LOG_FORMAT=json (the default)
+every record is one JSON object per line, carrying the request_id of the
+request that logged it and any fields passed with extra={...}.
+
+    LOG_LEVEL=INFO LOG_FORMAT=json|text LOG_QUEUE_SIZE=10000 LOG_FLUSH_SECONDS=0.05
+"""
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler
+from typing import Optional, TextIO
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+import orjson
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json").lower()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_FLUSH_SECONDS = float(os.environ.get("LOG_FLUSH_SECONDS", "0.05"))
+
+# Set by the metrics middleware for the duration of each request
+current_request_id: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came in through extra={...}
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "request_id"}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return orjson.dumps(entry, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Enqueues without ever blocking; counts what a full queue turned away"""
+
+    def __init__(self, log_queue: queue.SimpleQueue, max_size: int = LOG_QUEUE_SIZE):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve args and tracebacks here, since the listener thread may see them after they have changed
+        record.request_id = current_request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        # SimpleQueue has no bound of its own, but its put is far cheaper than Queue's
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+        else:
+            self.queue.put(record)
+
+
+class LogWriter:
+    """Background thread writing queued records to a stream, a batch at a time"""
+    _STOP = object()
+    BATCH_SIZE = 512
+
+    def __init__(self, log_queue: queue.SimpleQueue, stream: TextIO, formatter: logging.Formatter):
+        self.queue = log_queue
+        self.stream = stream
+        self.formatter = formatter
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write what is queued and end the thread"""
+        if self._thread is not None:
+            self.queue.put(self._STOP)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            if self.queue.qsize() < self.BATCH_SIZE:
+                # Let a few more records arrive, so the thread wakes and writes less often
+                time.sleep(LOG_FLUSH_SECONDS)
+            try:
+                while len(batch) < self.BATCH_SIZE:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+            stopping = batch[-1] is self._STOP
+            records = batch[:-1] if stopping else batch
+            try:
+                if records:
+                    self.stream.write("\n".join(self.formatter.format(record) for record in records) + "\n")
+                    self.stream.flush()
+            except Exception:
+                # Nowhere left to report a failing log stream; keep serving
+                pass
+            if stopping:
+                return
+
+
+_handler: Optional[DroppingQueueHandler] = None
+_listener: Optional[LogWriter] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT, stream: Optional[TextIO] = None) -> DroppingQueueHandler:
+    """Route the root logger through the queue; safe to call more than once"""
+    global _handler, _listener
+    stop_logging()
+
+    if fmt == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    log_queue = queue.SimpleQueue()
+    _handler = DroppingQueueHandler(log_queue)
+    _listener = LogWriter(log_queue, stream or sys.stderr, formatter)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(level)
+    _listener.start()
+    return _handler
+
+
+def stop_logging():
+    """Write what is queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler else 0
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,205 @@
+"""Per-route request metrics in the Prometheus text format, and a structured access log.
+
+MetricsMiddleware is plain ASGI, so it adds one wrapper call per request
+rather than the task and stream plumbing of BaseHTTPMiddleware. For each
+request it records, under the route template (/api/products/{product_id})
+so ids don't explode the label set:
+- latency in a histogram;
+- the status code;
+- the Mongo round trips and time, which the MongoProfiler command listener
+  puts down to the request that issued them;
+- the number of requests in flight.
+GET /metrics renders everything, along with the profiler's per-service-method
+Mongo totals; with METRICS_TOKEN set it needs "Authorization: Bearer <token>".
+Each request also logs one access line through the queue-backed logger,
+unless ACCESS_LOG is off.
+"""
+from services.logging_service import current_request_id, dropped_records
+from services.mongo_profiler_service import MongoProfiler, RequestStats, current_request, mongo_profiler, MONGO_PROFILE_HEADER
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+import logging
+import os
+import time
+import uuid
+
+ACCESS_LOG = os.environ.get("ACCESS_LOG", "true").lower() in ("1", "true", "yes")
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MONGO_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+access_logger = logging.getLogger("access")
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # bisect_left keeps a value equal to a bound in that bound's bucket, as le= means
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str, lines: List[str]):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "mongo", "mongo_ops", "statuses")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.mongo = Histogram(MONGO_BUCKETS)
+        self.mongo_ops = 0
+        self.statuses: Dict[int, int] = {}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RequestMetrics:
+    def __init__(self, profiler: MongoProfiler = mongo_profiler):
+        self.in_flight = 0
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+        self.profiler = profiler
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float, mongo_seconds: float, mongo_ops: int = 0):
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[method, route] = RouteMetrics()
+        metrics.latency.observe(seconds)
+        metrics.mongo.observe(mongo_seconds)
+        metrics.mongo_ops += mongo_ops
+        metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight Requests being handled right now.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+            "# HELP log_records_dropped_total Log records dropped because the log queue was full.",
+            "# TYPE log_records_dropped_total counter",
+            f"log_records_dropped_total {dropped_records()}",
+        ]
+        routes = sorted(self.routes.items())
+        labels = {key: f'method="{_label(key[0])}",route="{_label(key[1])}"' for key, _ in routes}
+
+        lines += ["# HELP http_request_duration_seconds Request latency by route.", "# TYPE http_request_duration_seconds histogram"]
+        for key, metrics in routes:
+            metrics.latency.render("http_request_duration_seconds", labels[key], lines)
+        lines += ["# HELP http_request_mongo_seconds Time spent in Mongo commands per request, by route.", "# TYPE http_request_mongo_seconds histogram"]
+        for key, metrics in routes:
+            metrics.mongo.render("http_request_mongo_seconds", labels[key], lines)
+        lines += ["# HELP http_responses_total Responses by route and status code.", "# TYPE http_responses_total counter"]
+        for key, metrics in routes:
+            for status_code, count in sorted(metrics.statuses.items()):
+                lines.append(f'http_responses_total{{{labels[key]},status="{status_code}"}} {count}')
+        lines += ["# HELP http_request_mongo_commands_total Mongo round trips by route.", "# TYPE http_request_mongo_commands_total counter"]
+        for key, metrics in routes:
+            lines.append(f"http_request_mongo_commands_total{{{labels[key]}}} {metrics.mongo_ops}")
+        self._render_profile(lines)
+        return "\n".join(lines) + "\n"
+
+    def _render_profile(self, lines: List[str]):
+        totals = self.profiler.snapshot()
+        labels = [
+            f'operation="{_label(operation)}",collection="{_label(collection)}",command="{_label(command)}"'
+            for (operation, collection, command), _ in totals
+        ]
+        lines += ["# HELP mongo_commands_total Mongo round trips by service method, collection and command.", "# TYPE mongo_commands_total counter"]
+        lines += [f"mongo_commands_total{{{label}}} {values[0]}" for label, (_, values) in zip(labels, totals)]
+        lines += ["# HELP mongo_command_seconds_total Time in Mongo commands by service method, collection and command.", "# TYPE mongo_command_seconds_total counter"]
+        lines += [f"mongo_command_seconds_total{{{label}}} {values[1] / 1_000_000}" for label, (_, values) in zip(labels, totals)]
+        lines += ["# HELP mongo_documents_returned_total Documents returned by service method, collection and command.", "# TYPE mongo_documents_returned_total counter"]
+        lines += [f"mongo_documents_returned_total{{{label}}} {values[2]}" for label, (_, values) in zip(labels, totals)]
+        lines += [
+            "# HELP mongo_slow_queries_total Mongo commands slower than MONGO_SLOW_QUERY_MS.",
+            "# TYPE mongo_slow_queries_total counter",
+            f"mongo_slow_queries_total {self.profiler.slow_queries}",
+        ]
+
+
+request_metrics = RequestMetrics()
+
+
+def route_label(scope: dict) -> str:
+    """The matched route's path template; mounts get their prefix, unmatched paths one shared label"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        return f"{scope.get('root_path', '')}/{{path}}"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    def __init__(
+        self, app, metrics: RequestMetrics = request_metrics, access_log: bool = ACCESS_LOG, profile_header: bool = MONGO_PROFILE_HEADER
+    ):
+        self.app = app
+        self.metrics = metrics
+        self.access_log = access_log
+        self.profile_header = profile_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        stats = RequestStats(request_id or uuid.uuid4().hex, scope)
+        stats_token = current_request.set(stats)
+        id_token = current_request_id.set(stats.request_id)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # A copy, since a response object's header list may be reused
+                headers = [*message.get("headers", ()), (b"x-request-id", stats.request_id.encode("latin-1"))]
+                if self.profile_header:
+                    # Commands still running (a streamed body) are not counted yet
+                    profile = f"mongo_ops={stats.mongo_ops}, mongo_ms={stats.mongo_seconds * 1000:.2f}"
+                    headers.append((b"x-mongo-profile", profile.encode()))
+                message["headers"] = headers
+            await send(message)
+
+        self.metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics.in_flight -= 1
+            route = route_label(scope)
+            mongo_seconds = stats.mongo_seconds
+            self.metrics.observe(scope["method"], route, status_code, elapsed, mongo_seconds, stats.mongo_ops)
+            if self.access_log:
+                extra = {
+                    "method": scope["method"], "route": route, "status": status_code,
+                    "duration_ms": round(elapsed * 1000, 2), "mongo_ops": stats.mongo_ops, "mongo_ms": round(mongo_seconds * 1000, 2),
+                }
+                if stats.commands:
+                    extra["mongo_by_operation"] = stats.by_operation()
+                access_logger.info(f"{scope['method']} {scope['path']} {status_code}", extra=extra)
+            current_request_id.reset(id_token)
+            current_request.reset(stats_token)
@@ -0,0 +1,276 @@
+"""Mongo command profiling: round trips and time per request and per service method, and slow-query capture.
+
+MongoProfiler is a pymongo CommandListener on the server's Motor client.
+Motor runs each command on an executor with a copy of the caller's context,
+so the listener sees the request that issued the command (current_request,
+set by the metrics middleware) and the service method it ran in
+(current_operation, set by the @profiled class decorator on the services;
+the innermost method wins). Commands outside any service method are put
+down to the request's route.
+
+For every command it records, per (operation, collection, command):
+round trips, time and documents returned. These are exposed on /metrics,
+and each request's own count and time go into its access-log line and,
+with MONGO_PROFILE_HEADER on, an "X-Mongo-Profile: mongo_ops=N, mongo_ms=X"
+response header.
+
+Commands slower than MONGO_SLOW_QUERY_MS are logged with their filter shape,
+which keeps field names and operators but replaces values with "?". The
+command events don't carry documents examined, so when
+MONGO_SLOW_QUERY_EXPLAIN is on, run_explainer() explains each new slow
+read shape in the background (at most once per MONGO_EXPLAIN_INTERVAL_SECONDS
+per shape) and logs the documents and keys it examined and its plan stages.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import monitoring
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+
+import orjson
+
+from services.index_service import plan_stages
+
+MONGO_SLOW_QUERY_MS = float(os.environ.get("MONGO_SLOW_QUERY_MS", "100"))
+MONGO_SLOW_QUERY_EXPLAIN = os.environ.get("MONGO_SLOW_QUERY_EXPLAIN", "true").lower() in ("1", "true", "yes")
+MONGO_EXPLAIN_INTERVAL_SECONDS = float(os.environ.get("MONGO_EXPLAIN_INTERVAL_SECONDS", "300"))
+MONGO_PROFILE_HEADER = os.environ.get("MONGO_PROFILE_HEADER", "false").lower() in ("1", "true", "yes")
+
+# Where each command keeps its filter
+FILTER_FIELDS = {"find": "filter", "count": "query", "distinct": "query", "findAndModify": "query", "aggregate": "pipeline"}
+EXPLAINABLE = ("find", "count", "distinct", "aggregate")
+# Session and routing fields pymongo adds, which explain refuses
+COMMAND_ENVELOPE = ("lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern")
+
+logger = logging.getLogger(__name__)
+slow_logger = logging.getLogger("mongo.slow")
+
+
+class RequestStats:
+    """What one request spent, filled in while it runs"""
+    __slots__ = ("request_id", "scope", "commands")
+
+    def __init__(self, request_id: str, scope: Optional[dict] = None):
+        self.request_id = request_id
+        self.scope = scope
+        # (operation, duration in µs) per command, appended from Motor's executor threads; list.append is atomic
+        self.commands: List[Tuple[str, int]] = []
+
+    @property
+    def mongo_ops(self) -> int:
+        return len(self.commands)
+
+    @property
+    def mongo_seconds(self) -> float:
+        return sum(micros for _, micros in self.commands) / 1_000_000
+
+    def by_operation(self) -> Dict[str, List[float]]:
+        """[round trips, ms] per service method"""
+        totals: Dict[str, List[float]] = {}
+        for operation, micros in self.commands:
+            entry = totals.setdefault(operation, [0, 0.0])
+            entry[0] += 1
+            entry[1] += micros / 1000
+        return totals
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+current_operation: ContextVar[Optional[str]] = ContextVar("current_operation", default=None)
+
+
+def _attributed(method, label: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = current_operation.set(label)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            current_operation.reset(token)
+    return wrapper
+
+
+def profiled(cls):
+    """Class decorator: Mongo commands issued inside the class's coroutine methods are put down to Class.method"""
+    for name, method in list(vars(cls).items()):
+        if not name.startswith("__") and inspect.iscoroutinefunction(method):
+            setattr(cls, name, _attributed(method, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def shape(value: Any) -> Any:
+    """value with every literal replaced by "?"; field names, operators and $field paths are kept"""
+    if isinstance(value, dict):
+        return {key: shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # Lists of sub-documents ($and, $or, pipelines) keep their structure; lists of values ($in) collapse
+        if value and all(isinstance(item, dict) for item in value):
+            return [shape(item) for item in value]
+        return "?"
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    return "?"
+
+
+def query_shape(command_name: str, command: dict) -> Optional[dict]:
+    """The command's filter (or pipeline) and sort with values stripped; None for commands without one"""
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return {"filter": shape(statements[0].get("q", {}))}
+    field = FILTER_FIELDS.get(command_name)
+    if field is None:
+        return None
+    result = {field: shape(command.get(field, {}))}
+    if command.get("sort"):
+        result["sort"] = dict(command["sort"])
+    return result
+
+
+def _returned(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", ())))
+    if "value" in reply:
+        return 1 if reply["value"] else 0
+    if "values" in reply:
+        return len(reply["values"])
+    return 0
+
+
+class MongoProfiler(monitoring.CommandListener):
+    def __init__(self, slow_ms: float = MONGO_SLOW_QUERY_MS, explain: bool = MONGO_SLOW_QUERY_EXPLAIN):
+        self.slow_micros = slow_ms * 1000
+        self.explain = explain
+        # (operation, collection, command) -> [round trips, µs, documents returned]
+        self.totals: Dict[Tuple[str, str, str], List[int]] = {}
+        self.slow_queries = 0
+        self._lock = threading.Lock()
+        self._started: Dict[Tuple[Any, int], Tuple[dict, str, Optional[str]]] = {}
+        self._explain_queue: deque = deque(maxlen=100)
+        self._explained: Dict[str, float] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        command_name = event.command_name
+        collection = event.command.get(command_name) if command_name != "getMore" else event.command.get("collection")
+        self._started[event.connection_id, event.request_id] = (
+            event.command, collection if isinstance(collection, str) else "", current_operation.get()
+        )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finished(event, _returned(event.reply))
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finished(event, 0)
+
+    def _finished(self, event, returned: int):
+        command, collection, operation = self._started.pop((event.connection_id, event.request_id), (None, "", None))
+        stats = current_request.get()
+        if operation is None:
+            operation = self._route_operation(stats)
+        micros = event.duration_micros
+
+        if stats is not None:
+            stats.commands.append((operation, micros))
+        key = (operation, collection, event.command_name)
+        with self._lock:
+            totals = self.totals.get(key)
+            if totals is None:
+                totals = self.totals[key] = [0, 0, 0]
+            totals[0] += 1
+            totals[1] += micros
+            totals[2] += returned
+
+        if micros >= self.slow_micros and command is not None:
+            self._slow(event, command, collection, operation, micros, returned)
+
+    @staticmethod
+    def _route_operation(stats: Optional[RequestStats]) -> str:
+        # Routers mutate the ASGI scope in place, so the matched route is known once the handler runs
+        route = stats.scope.get("route") if stats is not None and stats.scope is not None else None
+        if route is None:
+            return "unattributed"
+        return f"{stats.scope['method']} {route.path}"
+
+    def _slow(self, event, command: dict, collection: str, operation: str, micros: int, returned: int):
+        self.slow_queries += 1
+        query = query_shape(event.command_name, command)
+        slow_logger.warning(
+            f"Slow Mongo {event.command_name} on {collection} from {operation}: {micros / 1000:.1f} ms",
+            extra={
+                "operation": operation, "command": event.command_name, "collection": collection,
+                "shape": query, "duration_ms": round(micros / 1000, 2), "docs_returned": returned,
+            }
+        )
+        if not self.explain or event.command_name not in EXPLAINABLE:
+            return
+        shape_key = f"{event.database_name}.{collection}.{event.command_name}:{orjson.dumps(query, default=str).decode()}"
+        now = time.monotonic()
+        if now - self._explained.get(shape_key, -MONGO_EXPLAIN_INTERVAL_SECONDS) < MONGO_EXPLAIN_INTERVAL_SECONDS:
+            return
+        self._explained[shape_key] = now
+        explain_command = {
+            key: value for key, value in command.items() if not key.startswith("$") and key not in COMMAND_ENVELOPE
+        }
+        self._explain_queue.append((event.database_name, explain_command, operation, query))
+
+    async def explain_pending(self, db: AsyncIOMotorDatabase):
+        """Explain the queued slow queries and log what they examined"""
+        while self._explain_queue:
+            database_name, command, operation, query = self._explain_queue.popleft()
+            token = current_operation.set("MongoProfiler.explain")
+            try:
+                explain = await db.client[database_name].command({"explain": command, "verbosity": "executionStats"})
+            except Exception as e:
+                logger.warning(f"Explain of a slow query from {operation} failed: {e}")
+                continue
+            finally:
+                current_operation.reset(token)
+            stats = _execution_stats(explain) or {}
+            stages = plan_stages(stats.get("executionStages", {}))
+            slow_logger.warning(
+                f"Slow query plan for {operation}: examined {stats.get('totalDocsExamined')} documents "
+                f"to return {stats.get('nReturned')}",
+                extra={
+                    "operation": operation, "shape": query,
+                    "docs_examined": stats.get("totalDocsExamined"), "keys_examined": stats.get("totalKeysExamined"),
+                    "docs_returned": stats.get("nReturned"), "stages": " <- ".join(stages), "collscan": "COLLSCAN" in stages,
+                }
+            )
+
+    async def run_explainer(self, db: AsyncIOMotorDatabase, interval: float = 1.0):
+        while True:
+            try:
+                await self.explain_pending(db)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Slow query explainer failed: {e}")
+            await asyncio.sleep(interval)
+
+    def snapshot(self) -> List[Tuple[Tuple[str, str, str], List[int]]]:
+        """((operation, collection, command), [round trips, µs, documents returned]), sorted"""
+        with self._lock:
+            return sorted((key, list(values)) for key, values in self.totals.items())
+
+
+def _execution_stats(explain: dict) -> Optional[dict]:
+    """executionStats from a find explain, or from the first $cursor stage of an aggregate explain"""
+    if "executionStats" in explain:
+        return explain["executionStats"]
+    for stage in explain.get("stages", []):
+        if "$cursor" in stage:
+            return stage["$cursor"].get("executionStats")
+    for shard in explain.get("shards", {}).values():
+        stats = _execution_stats(shard)
+        if stats:
+            return stats
+    return None
+
+
+mongo_profiler = MongoProfiler()
@@ -1,26 +1,42 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
 from models.order_model import OrderCreate, OrderUpdate, Order, OrderStatus, PaymentStatus
+from services.pagination_service import find_page
+from services.serialization_service import validate_list
+from services.sales_rollup_service import SalesRollupService
+from services.inventory_service import InventoryService, merge_lines
+import logging
 import uuid
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+logger = logging.getLogger(__name__)
+
+@profiled
 class OrderService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.collection = db.orders
+        self.sales_rollups = SalesRollupService(db)
+        self.inventory = InventoryService(db)
     
     async def create_order(self, user_id: str, order_data: OrderCreate) -> Order:
         order_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
         
-        subtotal = sum(item.final_price * item.quantity for item in order_data.items)
-        discount = sum((item.price - item.final_price) * item.quantity for item in order_data.items)
+        # Prices come from the catalog and stock is reserved before the order exists
+        lines = merge_lines(order_data.items)
+        items = await self.inventory.price_lines(lines)
+        await self.inventory.reserve(order_id, lines)
+        
+        subtotal = sum(item["final_price"] * item["quantity"] for item in items)
+        discount = sum((item["price"] - item["final_price"]) * item["quantity"] for item in items)
         total = subtotal
         
         doc = {
             "id": order_id,
             "user_id": user_id,
-            "items": [item.model_dump() for item in order_data.items],
+            "items": items,
             "subtotal": round(subtotal, 2),
             "discount": round(discount, 2),
             "total": round(total, 2),
@@ -28,29 +44,40 @@ class OrderService:
             "order_status": OrderStatus.PENDING,
             "payment_status": PaymentStatus.PENDING,
             "tracking_updates": [],
+            "stock_reservation": self.inventory.new_reservation(lines),
             "created_at": now.isoformat(),
             "updated_at": now.isoformat()
         }
         
-        await self.collection.insert_one(doc)
+        try:
+            await self.collection.insert_one(doc)
+        except Exception:
+            await self.inventory.release(order_id, lines)
+            raise
         doc.pop("_id", None)
         return Order(**doc)
     
-    async def get_orders(
+    async def get_orders(self, **filters) -> List[Order]:
+        orders, _ = await self.get_orders_page(**filters)
+        return orders
+    
+    async def get_orders_page(
         self,
         user_id: Optional[str] = None,
         status: Optional[OrderStatus] = None,
         skip: int = 0,
-        limit: int = 50
-    ) -> List[Order]:
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Order], Optional[str]]:
+        """Return one page of orders, newest first, and the cursor for the next page"""
         query = {}
         if user_id:
             query["user_id"] = user_id
         if status:
             query["order_status"] = status
         
-        orders = await self.collection.find(query, {"_id": 0}).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
-        return [Order(**order) for order in orders]
+        orders, next_cursor = await find_page(self.collection, query, "created_at", -1, limit, skip, cursor)
+        return validate_list(Order, orders), next_cursor
     
     async def get_order_by_id(self, order_id: str) -> Optional[Order]:
         order = await self.collection.find_one({"id": order_id}, {"_id": 0})
@@ -69,6 +96,7 @@ class OrderService:
             {"id": order_id},
             {"$set": update_data}
         )
+        await self._sync_status_effects(order_id)
         
         return await self.get_order_by_id(order_id)
     
@@ -79,7 +107,8 @@ class OrderService:
         transaction_id: str, 
         response_code: str,
         payment_method: str = None
-    ):
+    ) -> bool:
+        """Mark the order paid; returns False when it already was, so repeated callbacks change nothing"""
         update_data = {
             "phonepe_merchant_transaction_id": merchant_transaction_id,
             "phonepe_transaction_id": transaction_id,
@@ -100,15 +129,20 @@ class OrderService:
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
-        await self.collection.update_one(
-            {"id": order_id},
+        result = await self.collection.update_one(
+            {"id": order_id, "payment_status": {"$ne": PaymentStatus.COMPLETED}},
             {
                 "$set": update_data,
                 "$push": {"tracking_updates": tracking_update}
             }
         )
+        if not result.modified_count:
+            return False
+        await self._sync_status_effects(order_id)
+        return True
     
-    async def update_payment_failed(self, order_id: str, error_message: str = "Payment failed"):
+    async def update_payment_failed(self, order_id: str, error_message: str = "Payment failed") -> bool:
+        """Mark a pending payment failed; returns False when the order wasn't pending (paid, or already failed)"""
         update_data = {
             "payment_status": PaymentStatus.FAILED,
             "updated_at": datetime.now(timezone.utc).isoformat()
@@ -120,10 +154,22 @@ class OrderService:
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
-        await self.collection.update_one(
-            {"id": order_id},
+        result = await self.collection.update_one(
+            {"id": order_id, "payment_status": PaymentStatus.PENDING},
             {
                 "$set": update_data,
                 "$push": {"tracking_updates": tracking_update}
             }
         )
+        if not result.modified_count:
+            return False
+        await self._sync_status_effects(order_id)
+        return True
+    
+    async def _sync_status_effects(self, order_id: str):
+        # The status write has already happened; a failure here is repaired by the sweeper or backfill, not surfaced to the payer
+        for name, sync in (("Stock reservation", self.inventory.sync_order), ("Sales rollup", self.sales_rollups.sync_order)):
+            try:
+                await sync(order_id)
+            except Exception as e:
+                logger.error(f"{name} update failed for order {order_id}: {e}")
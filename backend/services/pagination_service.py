@@ -0,0 +1,77 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from datetime import datetime
+from typing import List, Optional, Tuple
+import base64
+import json
+
+
+def encode_cursor(sort_by: str, sort_order: int, value, last_id: str) -> str:
+    """Opaque continuation token holding the sort key of the last row plus its id"""
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    payload = json.dumps({"k": sort_by, "o": sort_order, "v": value, "id": last_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: int) -> Tuple[object, str]:
+    """Return (value, last_id) from a token, checking it was issued for the same sort"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload["v"], payload["id"]
+        if payload["k"] != sort_by or payload["o"] != sort_order:
+            raise ValueError("Cursor was issued for a different sort order")
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+    if isinstance(value, dict) and "$date" in value:
+        value = datetime.fromisoformat(value["$date"])
+    return value, last_id
+
+
+def keyset_filter(sort_by: str, sort_order: int, value, last_id: str) -> dict:
+    """Match rows strictly after (value, last_id) in (sort_by, id) order.
+
+    Mongo sorts null/missing before everything else, so nulls come last in
+    descending order and first in ascending order.
+    """
+    op = "$gt" if sort_order == 1 else "$lt"
+    if value is None:
+        clauses = [{sort_by: None, "id": {op: last_id}}]
+        if sort_order == 1:
+            clauses.append({sort_by: {"$ne": None}})
+    else:
+        clauses = [{sort_by: {op: value}}, {sort_by: value, "id": {op: last_id}}]
+        if sort_order == -1:
+            clauses.append({sort_by: None})
+    return {"$or": clauses}
+
+
+async def find_page(
+    collection: AsyncIOMotorCollection,
+    query: dict,
+    sort_by: str,
+    sort_order: int,
+    limit: int,
+    skip: int = 0,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page sorted by (sort_by, id) and the cursor for the next page.
+
+    With a cursor the page starts right after the row it encodes and skip is
+    ignored, so page N costs the same index seek as page 1.
+    """
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_by, sort_order)
+        seek = keyset_filter(sort_by, sort_order, value, last_id)
+        query = {"$and": [query, seek]} if query else seek
+        skip = 0
+
+    docs = await collection.find(query, projection if projection is not None else {"_id": 0}) \
+        .sort([(sort_by, sort_order), ("id", sort_order)]).skip(skip).limit(limit).to_list(limit)
+
+    next_cursor = None
+    if len(docs) == limit:
+        last = docs[-1]
+        next_cursor = encode_cursor(sort_by, sort_order, last.get(sort_by), last["id"])
+    return docs, next_cursor
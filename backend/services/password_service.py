@@ -0,0 +1,78 @@
+from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+import asyncio
+import os
+
+# bcrypt cost; raising it re-hashes each user's password on their next login
+PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", "12"))
+# bcrypt releases the GIL, so threads hash in parallel; 0 hashes inline on the event loop.
+# The default leaves a core for the event loop, otherwise hashing threads starve it of CPU instead.
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+# Requests hashing or waiting for a worker beyond this are turned away instead of queueing without bound
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get("PASSWORD_HASH_MAX_PENDING", str(max(1, PASSWORD_HASH_WORKERS) * 8)))
+PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS", "2"))
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue stays full for longer than the queue timeout"""
+
+
+class PasswordHasher:
+    """bcrypt hashing on a bounded thread pool so logins don't stall the event loop"""
+
+    def __init__(
+        self,
+        rounds: int = PASSWORD_HASH_ROUNDS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        queue_timeout: float = PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+    ):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.workers = workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._slots = asyncio.Semaphore(max_pending)
+        self.pending = 0
+        self.rejected = 0
+
+    async def _run(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many sign-ins in progress, please retry shortly")
+
+        self.pending += 1
+        try:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self.context.verify, password, password_hash)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        """Returns (valid, new_hash); new_hash is set when the stored hash uses an outdated work factor"""
+        return await self._run(self.context.verify_and_update, password, password_hash)
+
+    def stats(self) -> dict:
+        return {"workers": self.workers, "pending": self.pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,259 @@
+"""Background reconciliation of PhonePe payments nobody came back to verify.
+
+If both the user's redirect and the webhook are lost, an order stays pending
+forever. The reconciler runs inside the server and, every
+PAYMENT_RECONCILE_INTERVAL_SECONDS, asks PhonePe for the status of pending
+orders that have a merchant transaction id and are older than
+PAYMENT_RECONCILE_MIN_AGE_MINUTES. Checks run concurrently but are capped at
+PAYMENT_RECONCILE_CONCURRENCY in flight and PAYMENT_RECONCILE_RATE_PER_SECOND
+started. Completed and failed payments go through OrderService like any other
+callback. An order that is still pending, or whose check errored, is tried again
+after an exponential backoff kept on the order (payment_reconciliation), so a
+long-abandoned checkout stops costing API calls. Before a check, the order is
+claimed by moving its next check forward, so several server processes don't
+poll the same order.
+
+Run one pass by hand with:
+
+    python -m services.payment_reconciliation_service --once
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from services.order_service import OrderService
+from services.phonepe_service import PhonePeClient, phonepe_client
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the background reconciler
+PAYMENT_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("PAYMENT_RECONCILE_INTERVAL_SECONDS", "60"))
+PAYMENT_RECONCILE_MIN_AGE_MINUTES = float(os.environ.get("PAYMENT_RECONCILE_MIN_AGE_MINUTES", "15"))
+# PhonePe expires unpaid checkouts well before this; older orders are left alone
+PAYMENT_RECONCILE_MAX_AGE_HOURS = float(os.environ.get("PAYMENT_RECONCILE_MAX_AGE_HOURS", "72"))
+PAYMENT_RECONCILE_BATCH_SIZE = int(os.environ.get("PAYMENT_RECONCILE_BATCH_SIZE", "100"))
+PAYMENT_RECONCILE_CONCURRENCY = int(os.environ.get("PAYMENT_RECONCILE_CONCURRENCY", "10"))
+PAYMENT_RECONCILE_RATE_PER_SECOND = float(os.environ.get("PAYMENT_RECONCILE_RATE_PER_SECOND", "5"))
+PAYMENT_RECONCILE_BACKOFF_SECONDS = float(os.environ.get("PAYMENT_RECONCILE_BACKOFF_SECONDS", "60"))
+PAYMENT_RECONCILE_MAX_BACKOFF_SECONDS = float(os.environ.get("PAYMENT_RECONCILE_MAX_BACKOFF_SECONDS", "3600"))
+# How long a claimed order is kept from other reconcilers while its check runs
+PAYMENT_RECONCILE_LEASE_SECONDS = 120
+
+THROUGHPUT_WINDOW_SECONDS = 60
+
+
+class RateLimiter:
+    """Spaces acquisitions at least 1/rate seconds apart"""
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate if rate > 0 else 0
+        self._next = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        if not self.interval:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class ReconciliationMetrics:
+    def __init__(self):
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.outcomes = Counter()
+        self.runs = 0
+        self.last_run_at: Optional[str] = None
+        self.last_run_seconds: Optional[float] = None
+        self._recent = deque()
+
+    def record(self, outcome: str):
+        self.outcomes[outcome] += 1
+        self._recent.append(time.monotonic())
+
+    def stats(self) -> dict:
+        cutoff = time.monotonic() - THROUGHPUT_WINDOW_SECONDS
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "checks_total": sum(self.outcomes.values()),
+            "checks_per_minute": len(self._recent) * 60 / THROUGHPUT_WINDOW_SECONDS,
+            "outcomes": dict(self.outcomes),
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+
+reconciliation_metrics = ReconciliationMetrics()
+
+
+def backoff_seconds(attempts: int) -> float:
+    return min(PAYMENT_RECONCILE_BACKOFF_SECONDS * 2 ** (attempts - 1), PAYMENT_RECONCILE_MAX_BACKOFF_SECONDS)
+
+
+@profiled
+class PaymentReconciler:
+    def __init__(
+        self,
+        db: AsyncIOMotorDatabase,
+        client: PhonePeClient = phonepe_client,
+        metrics: ReconciliationMetrics = reconciliation_metrics,
+        batch_size: int = PAYMENT_RECONCILE_BATCH_SIZE,
+        concurrency: int = PAYMENT_RECONCILE_CONCURRENCY,
+        rate_per_second: float = PAYMENT_RECONCILE_RATE_PER_SECOND,
+        min_age_minutes: float = PAYMENT_RECONCILE_MIN_AGE_MINUTES
+    ):
+        self.orders = db.orders
+        self.order_service = OrderService(db)
+        self.client = client
+        self.metrics = metrics
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_per_second)
+        self.min_age_minutes = min_age_minutes
+
+    def _due_query(self) -> dict:
+        now = datetime.now(timezone.utc)
+        return {
+            "payment_status": "pending",
+            "phonepe_merchant_transaction_id": {"$nin": [None, ""]},
+            "created_at": {
+                "$lt": (now - timedelta(minutes=self.min_age_minutes)).isoformat(),
+                "$gte": (now - timedelta(hours=PAYMENT_RECONCILE_MAX_AGE_HOURS)).isoformat(),
+            },
+            "$or": [
+                {"payment_reconciliation.next_check_at": {"$exists": False}},
+                {"payment_reconciliation.next_check_at": {"$lte": now.isoformat()}},
+            ],
+        }
+
+    async def run_once(self) -> int:
+        """Check every order that is due, batch by batch; returns how many were checked"""
+        started = time.perf_counter()
+        checked = 0
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(order: dict):
+            async with semaphore:
+                await self.rate_limiter.acquire()
+                return await self.reconcile(order)
+
+        while True:
+            self.metrics.queue_depth = await self.orders.count_documents(self._due_query())
+            batch = await self.orders.find(
+                self._due_query(),
+                {"_id": 0, "id": 1, "phonepe_merchant_transaction_id": 1, "payment_reconciliation": 1}
+            ).sort("created_at", 1).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+            results = await asyncio.gather(*(bounded(order) for order in batch))
+            checked += sum(1 for result in results if result)
+            if len(batch) < self.batch_size:
+                break
+
+        self.metrics.queue_depth = 0
+        self.metrics.runs += 1
+        self.metrics.last_run_at = datetime.now(timezone.utc).isoformat()
+        self.metrics.last_run_seconds = round(time.perf_counter() - started, 3)
+        return checked
+
+    async def reconcile(self, order: dict) -> bool:
+        """Poll PhonePe for one order and apply the answer; returns False if another reconciler had claimed it"""
+        state = order.get("payment_reconciliation") or {}
+        attempts = state.get("attempts", 0) + 1
+        now = datetime.now(timezone.utc)
+        claimed = await self.orders.update_one(
+            {"id": order["id"], "payment_status": "pending", "payment_reconciliation.next_check_at": state.get("next_check_at")},
+            {"$set": {"payment_reconciliation.next_check_at": (now + timedelta(seconds=PAYMENT_RECONCILE_LEASE_SECONDS)).isoformat()}}
+        )
+        if not claimed.modified_count:
+            return False
+
+        self.metrics.in_flight += 1
+        try:
+            merchant_txn_id = order["phonepe_merchant_transaction_id"]
+            response = await self.client.check_payment_status(merchant_txn_id)
+            payment_state = response.get("state")
+            if response.get("success"):
+                await self.order_service.update_payment_info_phonepe(
+                    order["id"], merchant_txn_id, response.get("transaction_id") or "", payment_state, response.get("payment_mode") or ""
+                )
+                outcome = "completed"
+            elif payment_state == "FAILED":
+                await self.order_service.update_payment_failed(order["id"], "PhonePe reported failure: FAILED (reconciliation)")
+                outcome = "failed"
+            else:
+                # Still pending at PhonePe, or the check itself failed: try again later
+                outcome = "pending" if payment_state else "error"
+                await self.orders.update_one(
+                    {"id": order["id"]},
+                    {"$set": {"payment_reconciliation": {
+                        "attempts": attempts,
+                        "next_check_at": (datetime.now(timezone.utc) + timedelta(seconds=backoff_seconds(attempts))).isoformat(),
+                        "last_state": payment_state,
+                        "last_error": response.get("error"),
+                        "last_checked_at": datetime.now(timezone.utc).isoformat(),
+                    }}}
+                )
+        except Exception as e:
+            logger.error(f"Payment reconciliation failed for order {order['id']}: {e}")
+            outcome = "error"
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.record(outcome)
+        return True
+
+    async def run(self, interval: float = PAYMENT_RECONCILE_INTERVAL_SECONDS):
+        """Reconcile every `interval` seconds until cancelled"""
+        while True:
+            try:
+                checked = await self.run_once()
+                if checked:
+                    logger.info(f"Payment reconciliation checked {checked} pending orders")
+            except Exception as e:
+                logger.error(f"Payment reconciliation run failed: {e}")
+            await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Poll PhonePe for stale pending orders and apply the results")
+    parser.add_argument("--once", action="store_true", help="run a single reconciliation pass")
+    parser.add_argument("--min-age-minutes", type=float, default=PAYMENT_RECONCILE_MIN_AGE_MINUTES)
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        try:
+            if not args.once:
+                parser.print_help()
+                return 0
+            reconciler = PaymentReconciler(client[os.environ["DB_NAME"]], min_age_minutes=args.min_age_minutes)
+            checked = await reconciler.run_once()
+            print(f"{checked} orders checked: {dict(reconciler.metrics.outcomes)}")
+            return 0
+        finally:
+            await phonepe_client.close()
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
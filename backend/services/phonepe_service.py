@@ -1,11 +1,14 @@
 import os
 import time
-import threading
-import requests
+import asyncio
+import logging
+import httpx
 from typing import Dict, Optional, Tuple
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 PHONEPE_CLIENT_ID = os.environ.get("PHONEPE_CLIENT_ID", "").strip().strip('"').strip("'")
 PHONEPE_CLIENT_SECRET = os.environ.get("PHONEPE_CLIENT_SECRET", "").strip().strip('"').strip("'")
 PHONEPE_CLIENT_VERSION = os.environ.get("PHONEPE_CLIENT_VERSION", "1").strip().strip('"').strip("'")
@@ -18,38 +21,99 @@ else:
     PHONEPE_BASE_URL = "https://api-preprod.phonepe.com/apis/pg-sandbox"
     PHONEPE_AUTH_URL = "https://api-preprod.phonepe.com/apis/pg-sandbox/v1/oauth/token"
 
-_token_lock = threading.Lock()
-_token_cache = {"access_token": None, "expires_at": 0}
-
-
-class PhonePeService:
-
-    @staticmethod
-    def _get_access_token() -> Tuple[Optional[str], Optional[str]]:
+# Explicit URLs win over PHONEPE_ENV, e.g. to point at benchmarks/mock_phonepe.py
+PHONEPE_BASE_URL = os.environ.get("PHONEPE_BASE_URL", PHONEPE_BASE_URL).rstrip("/")
+PHONEPE_AUTH_URL = os.environ.get("PHONEPE_AUTH_URL", PHONEPE_AUTH_URL)
+
+# Deadlines cover the whole call, including fetching a token when the cached one is stale
+PHONEPE_AUTH_TIMEOUT_SECONDS = float(os.environ.get("PHONEPE_AUTH_TIMEOUT_SECONDS", "15"))
+PHONEPE_PAY_TIMEOUT_SECONDS = float(os.environ.get("PHONEPE_PAY_TIMEOUT_SECONDS", "20"))
+PHONEPE_STATUS_TIMEOUT_SECONDS = float(os.environ.get("PHONEPE_STATUS_TIMEOUT_SECONDS", "15"))
+PHONEPE_MAX_CONNECTIONS = int(os.environ.get("PHONEPE_MAX_CONNECTIONS", "100"))
+PHONEPE_KEEPALIVE_SECONDS = float(os.environ.get("PHONEPE_KEEPALIVE_SECONDS", "30"))
+
+# Refresh the token this long before PhonePe says it expires
+TOKEN_REFRESH_MARGIN_SECONDS = 300
+
+
+class PhonePeClient:
+    """Async PhonePe API client sharing one keep-alive connection pool and one cached OAuth token"""
+
+    def __init__(
+        self,
+        base_url: str = PHONEPE_BASE_URL,
+        auth_url: str = PHONEPE_AUTH_URL,
+        client_id: str = PHONEPE_CLIENT_ID,
+        client_secret: str = PHONEPE_CLIENT_SECRET,
+        client_version: str = PHONEPE_CLIENT_VERSION,
+        transport: Optional[httpx.AsyncBaseTransport] = None
+    ):
+        self.base_url = base_url
+        self.auth_url = auth_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.client_version = client_version
+        self.transport = transport
+        self._http: Optional[httpx.AsyncClient] = None
+        self._token_lock: Optional[asyncio.Lock] = None
+        self._token_cache = {"access_token": None, "expires_at": 0}
+
+    def _client(self) -> httpx.AsyncClient:
+        # Created lazily so the pool and lock belong to the running event loop
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=PHONEPE_MAX_CONNECTIONS,
+                    max_keepalive_connections=PHONEPE_MAX_CONNECTIONS,
+                    keepalive_expiry=PHONEPE_KEEPALIVE_SECONDS
+                ),
+                timeout=httpx.Timeout(max(PHONEPE_AUTH_TIMEOUT_SECONDS, PHONEPE_PAY_TIMEOUT_SECONDS, PHONEPE_STATUS_TIMEOUT_SECONDS))
+            )
+            self._token_lock = asyncio.Lock()
+        return self._http
+
+    async def close(self):
+        if self._http is not None:
+            await self._http.aclose()
+        self._http = None
+        self._token_lock = None
+
+    def _cached_token(self) -> Optional[str]:
+        if self._token_cache["access_token"] and time.time() < self._token_cache["expires_at"] - TOKEN_REFRESH_MARGIN_SECONDS:
+            return self._token_cache["access_token"]
+        return None
+
+    async def get_access_token(self) -> Tuple[Optional[str], Optional[str]]:
         """Returns (access_token, error_message). Either token is set OR error is set."""
-        print("Phone pe client id", PHONEPE_CLIENT_ID)
-        if not PHONEPE_CLIENT_ID or not PHONEPE_CLIENT_SECRET:
-            return None, f"Missing env vars. CLIENT_ID set={bool(PHONEPE_CLIENT_ID)}, SECRET set={bool(PHONEPE_CLIENT_SECRET)}"
+        if not self.client_id or not self.client_secret:
+            return None, f"Missing env vars. CLIENT_ID set={bool(self.client_id)}, SECRET set={bool(self.client_secret)}"
+
+        token = self._cached_token()
+        if token:
+            return token, None
 
-        now = int(time.time())
-        with _token_lock:
-            if _token_cache["access_token"] and now < (_token_cache["expires_at"] - 300):
-                return _token_cache["access_token"], None
+        http = self._client()
+        # Only one coroutine refreshes; the others wait and reuse its token
+        async with self._token_lock:
+            token = self._cached_token()
+            if token:
+                return token, None
 
             try:
                 payload = {
-                    "client_id": PHONEPE_CLIENT_ID,
-                    "client_secret": PHONEPE_CLIENT_SECRET,
-                    "client_version": PHONEPE_CLIENT_VERSION,
+                    "client_id": self.client_id,
+                    "client_secret": self.client_secret,
+                    "client_version": self.client_version,
                     "grant_type": "client_credentials",
                 }
                 headers = {"Content-Type": "application/x-www-form-urlencoded"}
-                resp = requests.post(PHONEPE_AUTH_URL, data=payload, headers=headers, timeout=15)
+                resp = await http.post(self.auth_url, data=payload, headers=headers, timeout=PHONEPE_AUTH_TIMEOUT_SECONDS)
 
                 if resp.status_code != 200:
                     # Surface PhonePe's actual error
                     err = f"PhonePe OAuth {resp.status_code}: {resp.text[:300]}"
-                    print(f"[PhonePe] {err}")
+                    logger.warning(f"[PhonePe] {err}")
                     return None, err
 
                 data = resp.json()
@@ -57,18 +121,35 @@ class PhonePeService:
                 if not access_token:
                     return None, f"No access_token in response: {data}"
 
+                now = int(time.time())
                 expires_at = data.get("expires_at") or (now + int(data.get("expires_in", 3600)))
-                _token_cache.update({"access_token": access_token, "expires_at": int(expires_at)})
+                self._token_cache.update({"access_token": access_token, "expires_at": int(expires_at)})
                 return access_token, None
 
-            except requests.exceptions.ConnectionError as e:
+            except httpx.TimeoutException:
+                return None, f"PhonePe OAuth timed out after {PHONEPE_AUTH_TIMEOUT_SECONDS}s"
+            except httpx.TransportError as e:
                 return None, f"Network error reaching PhonePe (firewall/proxy?): {e}"
             except Exception as e:
                 return None, f"OAuth exception: {type(e).__name__}: {e}"
 
-    @staticmethod
-    def create_payment_order(amount: float, merchant_order_id: str, redirect_url: str, merchant_user_id: str = "guest") -> Dict:
-        token, err = PhonePeService._get_access_token()
+    async def create_payment_order(
+        self,
+        amount: float,
+        merchant_order_id: str,
+        redirect_url: str,
+        merchant_user_id: str = "guest",
+        deadline: Optional[float] = None
+    ) -> Dict:
+        deadline = deadline or PHONEPE_PAY_TIMEOUT_SECONDS
+        try:
+            async with asyncio.timeout(deadline):
+                return await self._create_payment_order(amount, merchant_order_id, redirect_url, merchant_user_id)
+        except TimeoutError:
+            return {"success": False, "retryable": True, "error": f"PhonePe pay timed out after {deadline}s"}
+
+    async def _create_payment_order(self, amount: float, merchant_order_id: str, redirect_url: str, merchant_user_id: str) -> Dict:
+        token, err = await self.get_access_token()
         if not token:
             return {"success": False, "error": err or "Auth failed"}
 
@@ -85,7 +166,7 @@ class PhonePeService:
         }
         headers = {"Content-Type": "application/json", "Authorization": f"O-Bearer {token}"}
         try:
-            resp = requests.post(f"{PHONEPE_BASE_URL}/checkout/v2/pay", json=payload, headers=headers, timeout=20)
+            resp = await self._client().post(f"{self.base_url}/checkout/v2/pay", json=payload, headers=headers)
             data = resp.json()
             if resp.status_code == 200 and data.get("redirectUrl"):
                 return {
@@ -99,16 +180,27 @@ class PhonePeService:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    @staticmethod
-    def check_payment_status(merchant_order_id: str) -> Dict:
-        token, err = PhonePeService._get_access_token()
+    async def check_payment_status(self, merchant_order_id: str, deadline: Optional[float] = None) -> Dict:
+        deadline = deadline or PHONEPE_STATUS_TIMEOUT_SECONDS
+        try:
+            async with asyncio.timeout(deadline):
+                return await self._check_payment_status(merchant_order_id)
+        except TimeoutError:
+            return {"success": False, "retryable": True, "error": f"PhonePe status check timed out after {deadline}s"}
+
+    async def _check_payment_status(self, merchant_order_id: str) -> Dict:
+        token, err = await self.get_access_token()
         if not token:
             return {"success": False, "error": err or "Auth failed"}
 
         headers = {"Authorization": f"O-Bearer {token}"}
-        url = f"{PHONEPE_BASE_URL}/checkout/v2/order/{merchant_order_id}/status"
+        url = f"{self.base_url}/checkout/v2/order/{merchant_order_id}/status"
         try:
-            resp = requests.get(url, headers=headers, params={"details": "false"}, timeout=15)
+            try:
+                resp = await self._client().get(url, headers=headers, params={"details": "false"})
+            except (httpx.RemoteProtocolError, httpx.ReadError):
+                # A pooled keep-alive connection can be dropped by the server just as we reuse it; the GET is safe to repeat
+                resp = await self._client().get(url, headers=headers, params={"details": "false"})
             data = resp.json()
             state = data.get("state", "UNKNOWN")
             pi = (data.get("paymentDetails") or [{}])[0]
@@ -119,5 +211,25 @@ class PhonePeService:
                 "transaction_id": pi.get("transactionId"),
                 "payment_mode": pi.get("paymentMode") or pi.get("instrumentType"),
             }
+        except httpx.TransportError as e:
+            return {"success": False, "retryable": True, "error": f"Network error reaching PhonePe: {type(e).__name__}: {e}"}
         except Exception as e:
-            return {"success": False, "error": str(e)}
\ No newline at end of file
+            return {"success": False, "error": str(e)}
+
+
+phonepe_client = PhonePeClient()
+
+
+class PhonePeService:
+
+    @staticmethod
+    async def _get_access_token() -> Tuple[Optional[str], Optional[str]]:
+        return await phonepe_client.get_access_token()
+
+    @staticmethod
+    async def create_payment_order(amount: float, merchant_order_id: str, redirect_url: str, merchant_user_id: str = "guest", deadline: Optional[float] = None) -> Dict:
+        return await phonepe_client.create_payment_order(amount, merchant_order_id, redirect_url, merchant_user_id, deadline)
+
+    @staticmethod
+    async def check_payment_status(merchant_order_id: str, deadline: Optional[float] = None) -> Dict:
+        return await phonepe_client.check_payment_status(merchant_order_id, deadline)
@@ -0,0 +1,152 @@
+"""Faceted catalog browsing: one page of products plus facet counts from a single $facet aggregation.
+
+Facets are counted over the products matching every filter except the
+facet's own. So with a category selected, the category facet still shows
+how many products each other category would give, and the price facet
+ignores the price range. Flags count products that have the flag set.
+
+A search narrows every facet, so it is applied once in a $match ahead of
+the $facet. With no filters and no search, the counts and total are the same for every
+visitor. They are cached under PRODUCT_FACETS_KEY, which product writes
+evict, and the page is then one indexed find.
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from services.product_service import resolve_view, FULL_PROJECTION
+from services.pagination_service import decode_cursor, encode_cursor, find_page, keyset_filter
+from services.serialization_service import validate_list
+from services.cache_service import catalog_cache, PRODUCT_FACETS_KEY
+from typing import List, Optional
+import json
+import os
+
+# Upper bounds of the price buckets on final_price; anything above the last one lands in an open-ended bucket
+PRICE_BUCKET_BOUNDARIES = [float(b) for b in json.loads(os.environ.get("PRODUCT_FACET_PRICE_BUCKETS", "[0, 500, 1000, 2000, 5000]"))]
+PRODUCT_FACETS_CACHE_TTL_SECONDS = float(os.environ.get("PRODUCT_FACETS_CACHE_TTL_SECONDS", "300"))
+FACET_LIMIT = 50
+FLAGS = ("is_featured", "is_best_selling", "is_new_arrival")
+
+# filter keys each facet ignores when counting
+FACET_FILTER_KEYS = {
+    "categories": ("category_id",),
+    "brands": ("brand",),
+    "flags": FLAGS,
+    "price": ("final_price",),
+    "rating": ("average_rating",),
+}
+
+
+def _without(query: dict, keys) -> dict:
+    return {key: value for key, value in query.items() if key not in keys}
+
+
+def aggregation_projection(projection: dict) -> dict:
+    """A find projection as a $project stage: {"$slice": n} only works in find, $project needs the array expression"""
+    return {
+        field: {"$slice": [f"${field}", spec["$slice"]]} if isinstance(spec, dict) and "$slice" in spec else spec
+        for field, spec in projection.items()
+    }
+
+
+def facet_branches(query: dict) -> dict:
+    """The $facet sub-pipelines counting each facet, given the facet filters in query"""
+    def branch(name: str, *stages: dict) -> List[dict]:
+        match = _without(query, FACET_FILTER_KEYS[name])
+        return ([{"$match": match}] if match else []) + list(stages)
+
+    def by_count(field: str) -> List[dict]:
+        # $sortByCount, with ties broken by value so the order is stable
+        return [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}, {"$limit": FACET_LIMIT}]
+
+    return {
+        "categories": branch("categories", *by_count("category_id")),
+        "brands": branch("brands", *by_count("brand")),
+        "flags": branch("flags", {"$group": {
+            "_id": None, **{flag: {"$sum": {"$cond": [{"$eq": [f"${flag}", True]}, 1, 0]}} for flag in FLAGS}
+        }}),
+        "price": branch("price", {"$bucket": {
+            "groupBy": "$final_price", "boundaries": PRICE_BUCKET_BOUNDARIES, "default": "above", "output": {"count": {"$sum": 1}}
+        }}),
+        "rating": branch("rating", {"$group": {"_id": {"$floor": {"$ifNull": ["$average_rating", 0]}}, "count": {"$sum": 1}}}, {"$sort": {"_id": -1}}),
+        "total": ([{"$match": query}] if query else []) + [{"$count": "count"}],
+    }
+
+
+def shape_facets(raw: dict) -> dict:
+    """Turn the $facet output into the response's facets and total"""
+    flags = raw["flags"][0] if raw["flags"] else {}
+    # $bucket ids are each bucket's lower bound, or "above" past the last one
+    buckets = {bucket["_id"]: bucket["count"] for bucket in raw["price"]}
+    bounds = PRICE_BUCKET_BOUNDARIES + [None]
+    price = [
+        {"min": bounds[n], "max": bounds[n + 1], "count": buckets.get(bounds[n] if bounds[n + 1] is not None else "above", 0)}
+        for n in range(len(PRICE_BUCKET_BOUNDARIES))
+    ]
+    return {
+        "total": raw["total"][0]["count"] if raw["total"] else 0,
+        "facets": {
+            "categories": [{"value": item["_id"], "count": item["count"]} for item in raw["categories"] if item["_id"]],
+            "brands": [{"value": item["_id"], "count": item["count"]} for item in raw["brands"] if item["_id"]],
+            "flags": {flag: flags.get(flag, 0) for flag in FLAGS},
+            "price": price,
+            "rating": [{"min": int(item["_id"]), "count": item["count"]} for item in raw["rating"]],
+        },
+    }
+
+
+@profiled
+class ProductFacetService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.products
+
+    async def browse(
+        self,
+        query: dict,
+        search_query: Optional[dict] = None,
+        sort_by: str = "created_at",
+        sort_order: int = -1,
+        skip: int = 0,
+        limit: int = 24,
+        cursor: Optional[str] = None,
+        view: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> dict:
+        """One page of products matching query and search_query, plus total and facet counts.
+
+        query holds the facet filters (category_id, brand, flags, final_price,
+        average_rating), search_query the search filter every facet shares.
+        """
+        model, projection = resolve_view(view, fields)
+        if projection is not FULL_PROJECTION and sort_by not in projection:
+            projection = {**projection, sort_by: 1}
+
+        if not query and not search_query:
+            # Same counts for everyone: serve them from the cache and fetch only the page
+            counts = await catalog_cache.get_or_load(PRODUCT_FACETS_KEY, self._unfiltered_facets, ttl=PRODUCT_FACETS_CACHE_TTL_SECONDS)
+            docs, next_cursor = await find_page(self.collection, query, sort_by, sort_order, limit, skip, cursor, projection)
+            return {"items": validate_list(model, docs), "next_cursor": next_cursor, **counts}
+
+        page_match = query
+        if cursor:
+            value, last_id = decode_cursor(cursor, sort_by, sort_order)
+            page_match = {"$and": [query, keyset_filter(sort_by, sort_order, value, last_id)]}
+            skip = 0
+        items = ([{"$match": page_match}] if page_match else []) + [
+            {"$sort": {sort_by: sort_order, "id": sort_order}},
+            {"$skip": skip},
+            {"$limit": limit},
+            {"$project": aggregation_projection(projection)},
+        ]
+        pipeline = [{"$match": search_query}] if search_query else []
+        pipeline.append({"$facet": {"items": items, **facet_branches(query)}})
+        raw = (await self.collection.aggregate(pipeline).to_list(1))[0]
+
+        docs = raw["items"]
+        next_cursor = None
+        if len(docs) == limit:
+            next_cursor = encode_cursor(sort_by, sort_order, docs[-1].get(sort_by), docs[-1]["id"])
+        return {"items": validate_list(model, docs), "next_cursor": next_cursor, **shape_facets(raw)}
+
+    async def _unfiltered_facets(self) -> dict:
+        raw = (await self.collection.aggregate([{"$facet": facet_branches({})}]).to_list(1))[0]
+        return shape_facets(raw)
@@ -1,8 +1,10 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
 from models.product_image_model import ProductImage, ProductImageCreate, ProductImageUpdate
 from typing import List, Optional
 import uuid
 
+@profiled
 class ProductImageService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db['product_images']
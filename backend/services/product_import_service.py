@@ -0,0 +1,291 @@
+"""Bulk product import and export as streaming CSV or NDJSON.
+
+Import validates each row against ProductCreate, prices it like
+ProductService.create_product and upserts by slug with one bulk_write per
+batch, so memory stays bounded by the batch size. Fields a row leaves out
+(stock, images, flags, ...) keep their stored values on existing products. Export streams the
+collection through a cursor in the same formats, and its output re-imports
+as is.
+
+    python -m services.product_import_service import products.csv --batch-size 1000
+    python -m services.product_import_service export products.ndjson
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from models.product_model import ProductCreate
+from services.product_service import compute_final_price
+from services.rating_service import counter_fields, empty_counters
+from services.search_service import product_search_index
+from services.cache_service import catalog_cache, product_key, product_slug_key, variant_group_key, PRODUCT_FACETS_KEY
+from services.variant_group_service import VariantGroupService, members_changed
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple
+import csv
+import io
+import json
+import os
+import uuid
+
+PRODUCT_IMPORT_BATCH_SIZE = int(os.environ.get("PRODUCT_IMPORT_BATCH_SIZE", "500"))
+# Per-row errors kept in the import report; the failed count keeps going past it
+PRODUCT_IMPORT_MAX_ERRORS = int(os.environ.get("PRODUCT_IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = ("csv", "ndjson")
+LIST_FIELDS = ("images", "related_products")
+LIST_SEPARATOR = "|"
+EXPORT_FIELDS = ["id", *ProductCreate.model_fields, "final_price", "average_rating", "total_reviews", "created_at", "updated_at"]
+
+Row = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    if requested:
+        fmt = requested.lower()
+    else:
+        extension = os.path.splitext(filename or "")[1].lower().lstrip(".")
+        fmt = {"jsonl": "ndjson", "json": "ndjson"}.get(extension, extension)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format '{fmt}', use csv or ndjson")
+    return fmt
+
+
+def _csv_row(record: dict) -> dict:
+    """Spreadsheet cells to ProductCreate input: blanks fall back to defaults, lists are |-separated, specifications is JSON"""
+    row = {}
+    for field, value in record.items():
+        if field is None or value is None:
+            continue
+        value = value.strip()
+        if value == "":
+            continue
+        if field in LIST_FIELDS:
+            row[field] = [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+        elif field == "specifications":
+            row[field] = json.loads(value)
+        else:
+            row[field] = value
+    return row
+
+
+def iter_rows(stream: io.TextIOBase, fmt: str) -> Iterator[Row]:
+    """Yield (row number, row, parse error) from a text stream without reading it all"""
+    if fmt == "ndjson":
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "Expected a JSON object"
+                continue
+            yield number, row, None
+        return
+
+    # Row 1 is the header, so numbers match the spreadsheet
+    for number, record in enumerate(csv.DictReader(stream), start=2):
+        try:
+            yield number, _csv_row(record), None
+        except json.JSONDecodeError as e:
+            yield number, None, f"Invalid specifications JSON: {e}"
+
+
+def _csv_cell(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+@profiled
+class ProductImportService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.collection = db.products
+        self.variant_groups = VariantGroupService(db)
+
+    async def import_rows(self, rows: Iterable[Row], batch_size: int = PRODUCT_IMPORT_BATCH_SIZE, dry_run: bool = False) -> dict:
+        report = {"processed": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": [], "errors_truncated": False}
+        batch: Dict[str, Tuple[int, ProductCreate]] = {}
+
+        for number, row, parse_error in rows:
+            report["processed"] += 1
+            if parse_error:
+                self._add_error(report, number, row, [parse_error])
+                continue
+            try:
+                product = ProductCreate(**row)
+            except ValidationError as e:
+                self._add_error(report, number, row, [f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()])
+                continue
+            except TypeError as e:
+                self._add_error(report, number, row, [str(e)])
+                continue
+
+            # A slug repeated within a batch keeps its last row, as sequential upserts would
+            batch.pop(product.slug, None)
+            batch[product.slug] = (number, product)
+            if len(batch) >= batch_size:
+                await self._write_batch(batch, report, dry_run)
+                batch = {}
+
+        if batch:
+            await self._write_batch(batch, report, dry_run)
+        return report
+
+    async def _write_batch(self, batch: Dict[str, Tuple[int, ProductCreate]], report: dict, dry_run: bool):
+        slugs = list(batch)
+        existing = {
+            doc["slug"]: doc
+            async for doc in self.collection.find({"slug": {"$in": slugs}}, {"_id": 0, "id": 1, "slug": 1, "discount": 1, "variant_group": 1, "variant_name": 1})
+        }
+        if dry_run:
+            report["updated"] += len(existing)
+            report["inserted"] += len(batch) - len(existing)
+            return
+
+        now = datetime.now(timezone.utc).isoformat()
+        operations, docs = [], []
+        for slug, (_, product) in batch.items():
+            previous = existing.get(slug)
+            product_id = previous["id"] if previous else str(uuid.uuid4())
+            # Columns a row leaves out keep their stored values; defaults only fill in new products
+            given = product.model_dump(exclude_unset=True)
+            defaults = {field: value for field, value in product.model_dump().items() if field not in given}
+            discount = product.discount if "discount" in given or not previous else previous.get("discount", 0)
+            fields = {
+                **given,
+                "final_price": compute_final_price(product.price, discount),
+                "updated_at": now
+            }
+            operations.append(UpdateOne(
+                {"slug": slug},
+                {
+                    "$set": fields,
+                    "$setOnInsert": {"id": product_id, **defaults, **counter_fields(empty_counters()), "created_at": now}
+                },
+                upsert=True
+            ))
+            docs.append({**fields, "id": product_id})
+
+        failed_indexes = set()
+        try:
+            result = await self.collection.bulk_write(operations, ordered=False)
+            details = result.bulk_api_result
+        except BulkWriteError as e:
+            details = e.details
+            for write_error in details.get("writeErrors", []):
+                index = write_error["index"]
+                failed_indexes.add(index)
+                number, product = batch[slugs[index]]
+                self._add_error(report, number, {"slug": product.slug}, [write_error.get("errmsg", "Write failed")])
+
+        report["inserted"] += details.get("nUpserted", 0)
+        report["updated"] += details.get("nMatched", 0)
+
+        written = [doc for index, doc in enumerate(docs) if index not in failed_indexes]
+        keys, groups = [], []
+        for doc in written:
+            product_search_index.upsert(doc)
+            keys += [product_key(doc["id"]), product_slug_key(doc["slug"])]
+            previous = existing.get(doc["slug"])
+            if not members_changed(previous, doc):
+                continue
+            for version in (doc, previous):
+                if version and version.get("variant_group"):
+                    keys.append(variant_group_key(version["variant_group"]))
+                    groups.append(version["variant_group"])
+        await self.variant_groups.refresh(*groups)
+        if keys:
+            await catalog_cache.invalidate(*dict.fromkeys(keys), PRODUCT_FACETS_KEY)
+
+    @staticmethod
+    def _add_error(report: dict, number: int, row: Optional[dict], errors: List[str]):
+        report["failed"] += 1
+        if len(report["errors"]) >= PRODUCT_IMPORT_MAX_ERRORS:
+            report["errors_truncated"] = True
+            return
+        slug = row.get("slug") if isinstance(row, dict) else None
+        report["errors"].append({"row": number, "slug": slug, "errors": errors})
+
+    async def export(self, fmt: str, batch_size: int = PRODUCT_IMPORT_BATCH_SIZE) -> AsyncIterator[str]:
+        """Yield the catalog as CSV or NDJSON text chunks, one cursor batch at a time"""
+        cursor = self.collection.find({}, {"_id": 0}).sort("created_at", 1).batch_size(batch_size)
+        buffer = io.StringIO()
+        writer = None
+        if fmt == "csv":
+            writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+
+        count = 0
+        async for product in cursor:
+            if writer:
+                writer.writerow({field: _csv_cell(product.get(field)) for field in EXPORT_FIELDS})
+            else:
+                buffer.write(json.dumps({field: product.get(field) for field in EXPORT_FIELDS if field in product}, ensure_ascii=False, default=str))
+                buffer.write("\n")
+            count += 1
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import sys
+    import time
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Bulk import or export products as CSV or NDJSON")
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path", help="file to read or write; - for stdin/stdout")
+    parser.add_argument("--format", choices=FORMATS, help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=PRODUCT_IMPORT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="validate and count without writing")
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        service = ProductImportService(client[os.environ["DB_NAME"]])
+        fmt = detect_format(args.path, args.format)
+        try:
+            if args.command == "export":
+                out = sys.stdout if args.path == "-" else open(args.path, "w", encoding="utf-8", newline="")
+                with out:
+                    async for chunk in service.export(fmt, args.batch_size):
+                        out.write(chunk)
+                return 0
+
+            start = time.perf_counter()
+            source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+            with source:
+                report = await service.import_rows(iter_rows(source, fmt), args.batch_size, args.dry_run)
+            for error in report["errors"]:
+                print(f"row {error['row']} ({error['slug'] or '-'}): {'; '.join(error['errors'])}", file=sys.stderr)
+            print(f"processed={report['processed']} inserted={report['inserted']} updated={report['updated']} "
+                  f"failed={report['failed']} in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+            return 1 if report["failed"] else 0
+        finally:
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,63 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from services.product_service import ProductService
+from services.product_image_service import ProductImageService
+from services.frequently_bought_service import FrequentlyBoughtService
+from services.rating_service import RatingService
+from typing import List, Optional
+import asyncio
+
+
+@profiled
+class ProductPageService:
+    """Everything a product detail page shows, fetched concurrently in one call"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.product_service = ProductService(db)
+        self.image_service = ProductImageService(db)
+        self.frequently_bought_service = FrequentlyBoughtService(db)
+        self.rating_service = RatingService(db)
+
+    async def get_page(self, slug: str) -> Optional[dict]:
+        product = await self.product_service.get_product_by_slug(slug)
+        if not product:
+            return None
+
+        variant_ids, images, frequently_bought, review_stats = await asyncio.gather(
+            self._variant_ids(product.variant_group),
+            self.image_service.get_product_images(product.id),
+            self.frequently_bought_service.get_by_product(product.id),
+            self.rating_service.get_stats(product.id),
+        )
+
+        variant_ids = [pid for pid in variant_ids if pid != product.id]
+        related_ids = [pid for pid in product.related_products if pid != product.id]
+        frequently_bought_ids = [pid for pid in (frequently_bought.related_product_ids if frequently_bought else []) if pid != product.id]
+
+        # One batched lookup for every product the page references, however many lists it appears in
+        linked = {
+            linked_product.id: linked_product
+            for linked_product in await self.product_service.get_products_by_ids(
+                list(dict.fromkeys(variant_ids + related_ids + frequently_bought_ids))
+            )
+        }
+
+        def pick(product_ids: List[str]) -> List[dict]:
+            return [linked[pid].model_dump() for pid in product_ids if pid in linked]
+
+        # Member ids come from the variant group index already in size order
+        product_dict = product.model_dump()
+        product_dict["variants"] = pick(variant_ids)
+
+        return {
+            "product": product_dict,
+            "images": [image.model_dump() for image in images],
+            "related_products": pick(related_ids),
+            "frequently_bought_together": pick(frequently_bought_ids),
+            "review_stats": review_stats,
+        }
+
+    async def _variant_ids(self, variant_group: Optional[str]) -> List[str]:
+        if not variant_group:
+            return []
+        return await self.product_service.get_variant_group_member_ids(variant_group)
@@ -1,35 +1,94 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from models.product_model import ProductCreate, ProductUpdate, Product
+from services.mongo_profiler_service import profiled
+from models.product_model import ProductCreate, ProductUpdate, Product, ProductCard
+from services.search_service import product_search_index
+from services.pagination_service import find_page, encode_cursor, decode_cursor
+from services.serialization_service import validate_list
+from services.cache_service import catalog_cache, product_key, product_slug_key, variant_group_key, PRODUCT_KEY_PREFIX, PRODUCT_FACETS_KEY
+from services.rating_service import counter_fields, empty_counters
+from services.variant_group_service import VariantGroupService, members_changed
+from pydantic import BaseModel, ConfigDict, create_model
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from functools import lru_cache
+import bisect
 import uuid
+import os
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import List, Optional, Tuple, Type
 
+# "index" uses the in-process inverted index, "regex" the old $regex scan
+DEFAULT_SEARCH_MODE = os.environ.get("PRODUCT_SEARCH_MODE", "index")
+
+FULL_PROJECTION = {"_id": 0}
+CARD_PROJECTION = {"_id": 0, **{name: 1 for name in ProductCard.model_fields}, "images": {"$slice": 1}}
+
+class SlugTakenError(Exception):
+    """Another product already uses this slug (products.slug is unique)"""
+
+    def __init__(self, slug: str):
+        self.slug = slug
+        super().__init__(f"A product with slug '{slug}' already exists")
+
+def compute_final_price(price: float, discount: float) -> float:
+    return round(price * (1 - discount / 100), 2)
+
+@lru_cache(maxsize=128)
+def product_fields_model(fields: Tuple[str, ...]) -> Type[BaseModel]:
+    """A model holding just these Product fields, built once per field set"""
+    return create_model(
+        "ProductFields",
+        __config__=ConfigDict(extra="ignore"),
+        **{name: (Product.model_fields[name].annotation, Product.model_fields[name]) for name in fields}
+    )
+
+def resolve_view(view: Optional[str] = None, fields: Optional[str] = None) -> Tuple[Type[BaseModel], dict]:
+    """Response model and Mongo projection for ?view=card|full or ?fields=a,b (fields wins; id is always included)"""
+    if fields:
+        names = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = names - Product.model_fields.keys()
+        if unknown:
+            raise ValueError(f"Unknown product fields: {', '.join(sorted(unknown))}")
+        model = product_fields_model(tuple(sorted(names | {"id"})))
+        return model, {"_id": 0, **{name: 1 for name in model.model_fields}}
+    if view == "card":
+        return ProductCard, CARD_PROJECTION
+    return Product, FULL_PROJECTION
+
+@profiled
 class ProductService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         self.collection = db.products
+        self.variant_groups = VariantGroupService(db)
     
     async def create_product(self, product_data: ProductCreate) -> Product:
         product_id = str(uuid.uuid4())
         now = datetime.now(timezone.utc)
         
-        final_price = product_data.price * (1 - product_data.discount / 100)
-        
         doc = {
             **product_data.model_dump(),
             "id": product_id,
-            "final_price": round(final_price, 2),
-            "average_rating": 0,
-            "total_reviews": 0,
+            "final_price": compute_final_price(product_data.price, product_data.discount),
+            **counter_fields(empty_counters()),
             "created_at": now.isoformat(),
             "updated_at": now.isoformat()
         }
         
-        await self.collection.insert_one(doc)
+        try:
+            await self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            raise SlugTakenError(product_data.slug)
         doc.pop("_id", None)
+        product_search_index.upsert(doc)
+        await self._invalidate_cache(product_id, None, doc)
         return Product(**doc)
     
-    async def get_products(
+    async def get_products(self, **filters) -> List[BaseModel]:
+        products, _ = await self.get_products_page(**filters)
+        return products
+    
+    async def get_products_page(
         self,
         category_id: Optional[str] = None,
         is_featured: Optional[bool] = None,
@@ -38,15 +97,60 @@ class ProductService:
         min_price: Optional[float] = None,
         max_price: Optional[float] = None,
         search: Optional[str] = None,
-        sort_by: str = "created_at",
+        sort_by: Optional[str] = None,
         sort_order: int = -1,
         skip: int = 0,
-        limit: int = 50
-    ) -> List[Product]:
+        limit: int = 50,
+        search_mode: Optional[str] = None,
+        cursor: Optional[str] = None,
+        view: Optional[str] = None,
+        fields: Optional[str] = None
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Return one page of products and the cursor for the next page (None on the last page).
+        
+        view/fields pick the response model and the projection pushed down to Mongo, see resolve_view().
+        """
+        model, projection = resolve_view(view, fields)
+        query = self.build_filter_query(category_id, is_featured, is_best_selling, is_new_arrival, min_price, max_price)
+        
+        search_mode = search_mode or DEFAULT_SEARCH_MODE
+        if search and search_mode == "index" and product_search_index.is_ready:
+            ranked = product_search_index.search(search)
+            if not ranked:
+                return [], None
+            if sort_by in (None, "relevance"):
+                return await self._get_ranked_page(ranked, query, sort_order, skip, limit, cursor, model, projection)
+            query["id"] = {"$in": [product_id for product_id, _ in ranked]}
+        elif search:
+            query.update(self.search_filter(search, "regex"))
+        
+        if sort_by in (None, "relevance"):
+            sort_by = "created_at"
+        
+        # The next-page cursor is built from the last row's sort key, so a narrow projection must keep it
+        if projection is not FULL_PROJECTION and sort_by not in projection:
+            projection = {**projection, sort_by: 1}
+        products, next_cursor = await find_page(self.collection, query, sort_by, sort_order, limit, skip, cursor, projection)
+        return validate_list(model, products), next_cursor
+    
+    def build_filter_query(
+        self,
+        category_id: Optional[str] = None,
+        is_featured: Optional[bool] = None,
+        is_best_selling: Optional[bool] = None,
+        is_new_arrival: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        brand: Optional[str] = None,
+        min_rating: Optional[float] = None
+    ) -> dict:
+        """Mongo filter for the listing filters, without search"""
         query = {}
         
         if category_id:
             query["category_id"] = category_id
+        if brand:
+            query["brand"] = brand
         if is_featured is not None:
             query["is_featured"] = is_featured
         if is_best_selling is not None:
@@ -59,86 +163,166 @@ class ProductService:
                 query["final_price"]["$gte"] = min_price
             if max_price is not None:
                 query["final_price"]["$lte"] = max_price
-        if search:
-            query["$or"] = [
-                {"name": {"$regex": search, "$options": "i"}},
-                {"brand": {"$regex": search, "$options": "i"}},
-                {"description": {"$regex": search, "$options": "i"}}
-            ]
+        if min_rating is not None:
+            query["average_rating"] = {"$gte": min_rating}
+        return query
+    
+    def search_filter(self, search: str, search_mode: Optional[str] = None) -> dict:
+        """Mongo filter matching a search term, from the in-process index once it is ready"""
+        if (search_mode or DEFAULT_SEARCH_MODE) == "index" and product_search_index.is_ready:
+            return {"id": {"$in": [product_id for product_id, _ in product_search_index.search(search)]}}
+        return {"$or": [
+            {"name": {"$regex": search, "$options": "i"}},
+            {"brand": {"$regex": search, "$options": "i"}},
+            {"description": {"$regex": search, "$options": "i"}}
+        ]}
+    
+    async def _get_ranked_page(
+        self,
+        ranked: List[Tuple[str, float]],
+        query: dict,
+        sort_order: int,
+        skip: int,
+        limit: int,
+        cursor: Optional[str],
+        model: Type[BaseModel] = Product,
+        projection: dict = FULL_PROJECTION
+    ) -> Tuple[List[BaseModel], Optional[str]]:
+        """Page through search hits in relevance order, applying the remaining filters in Mongo"""
+        # Hits are ordered by (-score, id), so the cursor's last score and id locate the next page directly
+        if cursor:
+            score, last_id = decode_cursor(cursor, "relevance", sort_order)
+            if not isinstance(score, (int, float)):
+                raise ValueError("Invalid cursor")
+            ranked = ranked[bisect.bisect_right(ranked, (-score, last_id), key=lambda hit: (-hit[1], hit[0])):]
+            skip = 0
+        scores = dict(ranked)
+        ranked_ids = [product_id for product_id, _ in ranked]
         
-        products = await self.collection.find(query, {"_id": 0}).sort(sort_by, sort_order).skip(skip).limit(limit).to_list(limit)
-        return [Product(**prod) for prod in products]
+        if not query:
+            page_ids = ranked_ids[skip:skip + limit]
+            products = await self.collection.find({"id": {"$in": page_ids}}, projection).to_list(len(page_ids))
+            by_id = {prod["id"]: prod for prod in products}
+            page = [by_id[pid] for pid in page_ids if pid in by_id]
+        else:
+            # Filters may drop hits, so fetch growing windows of ranked ids until the page is full
+            matched = []
+            start = 0
+            window = max((skip + limit) * 2, 200)
+            while start < len(ranked_ids) and len(matched) < skip + limit:
+                window_ids = ranked_ids[start:start + window]
+                products = await self.collection.find({**query, "id": {"$in": window_ids}}, projection).to_list(len(window_ids))
+                by_id = {prod["id"]: prod for prod in products}
+                matched.extend(by_id[pid] for pid in window_ids if pid in by_id)
+                start += window
+                window *= 2
+            page = matched[skip:skip + limit]
+        
+        next_cursor = None
+        if len(page) == limit:
+            next_cursor = encode_cursor("relevance", sort_order, scores[page[-1]["id"]], page[-1]["id"])
+        return validate_list(model, page), next_cursor
     
     async def get_product_by_id(self, product_id: str) -> Optional[Product]:
-        product = await self.collection.find_one({"id": product_id}, {"_id": 0})
-        if product:
-            return Product(**product)
-        return None
+        return await catalog_cache.get_or_load(product_key(product_id), lambda: self._load_product({"id": product_id}))
     
     async def get_product_by_slug(self, slug: str) -> Optional[Product]:
-        product = await self.collection.find_one({"slug": slug}, {"_id": 0})
+        # The slug entry only maps to the id, so a rating or price change evicts a single product entry
+        product_id = await catalog_cache.get_or_load(product_slug_key(slug), lambda: self._load_product_id({"slug": slug}))
+        if not product_id:
+            return None
+        return await self.get_product_by_id(product_id)
+    
+    async def get_products_by_ids(self, product_ids: List[str]) -> List[Product]:
+        """Cached batch lookup; missing products are skipped and input order is kept"""
+        async def load(keys: List[str]) -> dict:
+            ids = [key[len(PRODUCT_KEY_PREFIX):] for key in keys]
+            products = await self.collection.find({"id": {"$in": ids}}, {"_id": 0}).to_list(len(ids))
+            return {product_key(product.id): product for product in validate_list(Product, products)}
+        
+        cached = await catalog_cache.get_many_or_load([product_key(pid) for pid in product_ids], load)
+        return [cached[product_key(pid)] for pid in product_ids if cached.get(product_key(pid))]
+    
+    async def sync_search_index(self, keys: List[str], prefixes: List[str]):
+        """Cache invalidation listener: re-read products another worker changed into this worker's search index"""
+        product_ids = [key[len(PRODUCT_KEY_PREFIX):] for key in keys if key.startswith(PRODUCT_KEY_PREFIX)]
+        if not product_ids:
+            return
+        projection = {"_id": 0, "id": 1, "name": 1, "brand": 1, "description": 1}
+        products = await self.collection.find({"id": {"$in": product_ids}}, projection).to_list(len(product_ids))
+        found = set()
+        for product in products:
+            product_search_index.upsert(product)
+            found.add(product["id"])
+        for product_id in product_ids:
+            if product_id not in found:
+                product_search_index.remove(product_id)
+    
+    async def _load_product(self, query: dict) -> Optional[Product]:
+        product = await self.collection.find_one(query, {"_id": 0})
         if product:
             return Product(**product)
         return None
     
+    async def _load_product_id(self, query: dict) -> Optional[str]:
+        product = await self.collection.find_one(query, {"_id": 0, "id": 1})
+        return product["id"] if product else None
+    
+    async def _invalidate_cache(self, product_id: str, before: Optional[dict], after: Optional[dict]):
+        """Evict the product plus the slug entries of both versions of it, and their variant groups if membership changed.
+        
+        The variant groups are refreshed first, so a read racing the eviction can't cache the old members.
+        """
+        keys = [product_key(product_id)]
+        groups = []
+        regroup = members_changed(before, after)
+        for doc in (before, after):
+            if not doc:
+                continue
+            if doc.get("slug"):
+                keys.append(product_slug_key(doc["slug"]))
+            if regroup and doc.get("variant_group"):
+                keys.append(variant_group_key(doc["variant_group"]))
+                groups.append(doc["variant_group"])
+        await self.variant_groups.refresh(*groups)
+        await catalog_cache.invalidate(*keys, PRODUCT_FACETS_KEY)
+    
     async def get_variants_by_group(self, variant_group: str, exclude_product_id: str) -> List[Product]:
         """Get all products with same variant_group, excluding current product"""
         if not variant_group:
             return []
         
-        variants = await self.collection.find(
-            {
-                "variant_group": variant_group,
-                "id": {"$ne": exclude_product_id}
-            },
-            {"_id": 0}
-        ).to_list(100)
-        
-        # Sort by extracting numeric value from variant_name (e.g., "5 ML" -> 5)
-        variants_list = [Product(**variant) for variant in variants]
-        variants_list.sort(key=lambda x: float(''.join(filter(str.isdigit, x.variant_name or '0'))) if x.variant_name else 0)
+        member_ids = await self.get_variant_group_member_ids(variant_group)
+        return await self.get_products_by_ids([pid for pid in member_ids if pid != exclude_product_id])
+    
+    async def get_variant_group_member_ids(self, variant_group: str) -> List[str]:
+        """Ids of every product in the group in size order, cached"""
+        async def load_member_ids() -> List[str]:
+            return [member["id"] for member in await self.variant_groups.members(variant_group)]
         
-        return variants_list
+        return await catalog_cache.get_or_load(variant_group_key(variant_group), load_member_ids)
     
     # NEW: Get product variants
     async def get_product_variants(self, product_id: str) -> List[Product]:
-            """Get all variants of a product (products with same variant_group), excluding current"""
-            product = await self.get_product_by_id(product_id)
-            print("***********************************")
-            print(product)
-            if not product or not product.variant_group:
-                return []
-            print("-----------------product varient------------------", product.variant_group)
-            
-            # Find all products with the same variant_group, excluding the current product
-            variants = await self.collection.find(
-                {
-                    "variant_group": product.variant_group,
-                    "id": {"$ne": product_id}
-                },
-                {"_id": 0}
-            ).to_list(100)
-            print("----------------varients-------------------")
-            print(variants)
-            
-            # Sort by variant_name if available (e.g., "5 ML", "8 ML", "12 ML")
-            variants_list = [Product(**variant) for variant in variants]
-            variants_list.sort(key=lambda x: float(''.join(filter(str.isdigit, x.variant_name or '0'))) if x.variant_name else 0)
-            
-            return variants_list
+        """Get all variants of a product (products with same variant_group), excluding current"""
+        product = await self.get_product_by_id(product_id)
+        if not product or not product.variant_group:
+            return []
+        return await self.get_variants_by_group(product.variant_group, product_id)
     
     # NEW: Get related products by IDs
-    async def get_related_products_by_ids(self, product_ids: List[str]) -> List[Product]:
+    async def get_related_products_by_ids(self, product_ids: List[str], view: Optional[str] = None, fields: Optional[str] = None) -> List[BaseModel]:
         """Get products by their IDs"""
+        model, projection = resolve_view(view, fields)
         if not product_ids:
             return []
         
         products = await self.collection.find(
             {"id": {"$in": product_ids}},
-            {"_id": 0}
+            projection
         ).to_list(len(product_ids))
         
-        return [Product(**prod) for prod in products]
+        return validate_list(model, products)
     
     async def update_product(self, product_id: str, product_data: ProductUpdate) -> Optional[Product]:
         update_data = {k: v for k, v in product_data.model_dump().items() if v is not None}
@@ -147,41 +331,41 @@ class ProductService:
         
         if "price" in update_data or "discount" in update_data:
             product = await self.get_product_by_id(product_id)
+            if not product:
+                return None
             price = update_data.get("price", product.price)
             discount = update_data.get("discount", product.discount)
-            update_data["final_price"] = round(price * (1 - discount / 100), 2)
+            update_data["final_price"] = compute_final_price(price, discount)
         
         update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
         
-        await self.collection.update_one(
-            {"id": product_id},
-            {"$set": update_data}
-        )
+        try:
+            previous = await self.collection.find_one_and_update(
+                {"id": product_id},
+                {"$set": update_data},
+                projection={"_id": 0, "slug": 1, "variant_group": 1, "variant_name": 1},
+                return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            raise SlugTakenError(update_data["slug"])
+        await self._invalidate_cache(product_id, previous, update_data)
         
-        return await self.get_product_by_id(product_id)
+        product = await self.get_product_by_id(product_id)
+        if product:
+            product_search_index.upsert(product.model_dump())
+        return product
     
     async def delete_product(self, product_id: str) -> bool:
-        result = await self.collection.delete_one({"id": product_id})
-        return result.deleted_count > 0
-    
-    async def update_product_rating(self, product_id: str, average_rating: float, total_reviews: int):
-        await self.collection.update_one(
+        deleted = await self.collection.find_one_and_delete(
             {"id": product_id},
-            {"$set": {
-                "average_rating": round(average_rating, 1),
-                "total_reviews": total_reviews
-            }}
+            projection={"_id": 0, "slug": 1, "variant_group": 1}
         )
-   
-   
-   
+        if not deleted:
+            return False
+        product_search_index.remove(product_id)
+        await self._invalidate_cache(product_id, deleted, None)
+        return True
+    
     async def get_all_variant_groups(self) -> List[str]:
         """Get all unique variant_group values from products"""
-        pipeline = [
-            {"$match": {"variant_group": {"$ne": None, "$exists": True}}},
-            {"$group": {"_id": "$variant_group"}},
-            {"$sort": {"_id": 1}}
-        ]
-        
-        result = await self.collection.aggregate(pipeline).to_list(100)
-        return [doc["_id"] for doc in result if doc["_id"]]
\ No newline at end of file
+        return await self.variant_groups.group_names()
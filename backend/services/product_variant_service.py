@@ -1,8 +1,10 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
 from models.product_variant_model import ProductVariant, ProductVariantCreate
 from typing import List
 import uuid
 
+@profiled
 class ProductVariantService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db['product_variants']
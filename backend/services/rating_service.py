@@ -0,0 +1,196 @@
+"""Per-product rating counters kept in step with review writes.
+
+Each product carries rating_counts (approved reviews per star), rating_sum and
+total_reviews. Review writes apply $inc deltas computed from the review's state
+before and after the write, so nothing re-aggregates a product's reviews on the
+write path, and review stats are a single document read.
+
+Counters can drift if a process dies between the review write and the $inc.
+Run as a module to rebuild them from the reviews and report what drifted:
+
+    python -m services.rating_service --reconcile [--dry-run]
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from pymongo import ReturnDocument, UpdateOne
+from services.cache_service import catalog_cache, product_key, PRODUCT_FACETS_KEY
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+RATINGS = ("1", "2", "3", "4", "5")
+COUNTER_PROJECTION = {"_id": 0, "id": 1, "rating_counts": 1, "rating_sum": 1, "total_reviews": 1, "average_rating": 1}
+
+
+def empty_counters() -> dict:
+    return {"rating_counts": {rating: 0 for rating in RATINGS}, "rating_sum": 0, "total_reviews": 0}
+
+
+def average_rating(rating_sum: float, total_reviews: int) -> float:
+    return round(rating_sum / total_reviews, 1) if total_reviews > 0 else 0
+
+
+def counter_fields(counters: dict) -> dict:
+    """Counters plus the average derived from them, ready to $set on a product"""
+    return {
+        "rating_counts": counters["rating_counts"],
+        "rating_sum": counters["rating_sum"],
+        "total_reviews": counters["total_reviews"],
+        "average_rating": average_rating(counters["rating_sum"], counters["total_reviews"]),
+    }
+
+
+def review_delta(before: Optional[dict], after: Optional[dict]) -> Dict[str, int]:
+    """$inc document moving the counters from a review's old state to its new one (None = absent)"""
+    inc = defaultdict(int)
+    for review, sign in ((before, -1), (after, 1)):
+        # Only approved reviews count towards the rating
+        if review and review.get("is_approved"):
+            rating = int(review["rating"])
+            inc[f"rating_counts.{rating}"] += sign
+            inc["rating_sum"] += sign * rating
+            inc["total_reviews"] += sign
+    return {field: value for field, value in inc.items() if value}
+
+
+@profiled
+class RatingService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.reviews = db.reviews
+        self.products = db.products
+
+    async def apply_review_change(self, product_id: str, before: Optional[dict], after: Optional[dict]):
+        """Apply the counter change for one review write; a no-op when neither state is approved"""
+        inc = review_delta(before, after)
+        if not inc:
+            return
+
+        counters = await self.products.find_one_and_update(
+            {"id": product_id, "rating_counts": {"$exists": True}},
+            {"$inc": inc},
+            projection=COUNTER_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if counters is None:
+            # Product predates the counters (or is gone); initialise from its reviews instead
+            await self.rebuild(product_id)
+            return
+
+        # Only the writer that saw the latest sum/total sets the average, so a slow writer can't overwrite a newer one
+        await self.products.update_one(
+            {"id": product_id, "rating_sum": counters["rating_sum"], "total_reviews": counters["total_reviews"]},
+            {"$set": {
+                "average_rating": average_rating(counters["rating_sum"], counters["total_reviews"]),
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            }}
+        )
+        await catalog_cache.invalidate(product_key(product_id), PRODUCT_FACETS_KEY)
+
+    async def get_stats(self, product_id: str) -> dict:
+        product = await self.products.find_one({"id": product_id}, COUNTER_PROJECTION)
+        if product is None:
+            counters = empty_counters()
+        elif "rating_counts" not in product:
+            counters = await self.rebuild(product_id)
+        else:
+            counters = product
+
+        counts = counters["rating_counts"]
+        return {
+            "average_rating": average_rating(counters["rating_sum"], counters["total_reviews"]),
+            "total_reviews": counters["total_reviews"],
+            "rating_distribution": {int(rating): count for rating, count in sorted(counts.items(), key=lambda item: int(item[0]))},
+        }
+
+    async def count_reviews(self, product_ids: Optional[List[str]] = None) -> Dict[str, dict]:
+        """Counters computed from the approved reviews, by product id"""
+        match = {"is_approved": True}
+        if product_ids is not None:
+            match["product_id"] = {"$in": product_ids}
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"product_id": "$product_id", "rating": "$rating"}, "count": {"$sum": 1}}},
+        ]
+
+        counters: Dict[str, dict] = {}
+        async for doc in self.reviews.aggregate(pipeline):
+            product_id, rating = doc["_id"]["product_id"], doc["_id"]["rating"]
+            product_counters = counters.setdefault(product_id, empty_counters())
+            key = str(int(rating))
+            product_counters["rating_counts"][key] = product_counters["rating_counts"].get(key, 0) + doc["count"]
+            product_counters["rating_sum"] += int(rating) * doc["count"]
+            product_counters["total_reviews"] += doc["count"]
+        return counters
+
+    async def rebuild(self, product_id: str) -> dict:
+        """Recompute one product's counters from its reviews and store them"""
+        counters = (await self.count_reviews([product_id])).get(product_id, empty_counters())
+        await self.products.update_one(
+            {"id": product_id},
+            {"$set": {**counter_fields(counters), "updated_at": datetime.now(timezone.utc).isoformat()}}
+        )
+        await catalog_cache.invalidate(product_key(product_id), PRODUCT_FACETS_KEY)
+        return counters
+
+    async def reconcile(self, fix: bool = True, batch_size: int = 500) -> List[dict]:
+        """Compare every product's counters with its reviews; returns the drifted products and, with fix, repairs them.
+
+        Reviews written while this runs can be counted twice or missed; rerun it to settle.
+        """
+        expected = await self.count_reviews()
+        drift = []
+        updates = []
+
+        async for product in self.products.find({}, COUNTER_PROJECTION):
+            want = counter_fields(expected.get(product["id"], empty_counters()))
+            have = {field: product.get(field) for field in want}
+            if have == want:
+                continue
+
+            drift.append({"product_id": product["id"], "stored": have, "expected": want})
+            if fix:
+                updates.append(UpdateOne({"id": product["id"]}, {"$set": want}))
+                if len(updates) >= batch_size:
+                    await self.products.bulk_write(updates, ordered=False)
+                    updates = []
+
+        if updates:
+            await self.products.bulk_write(updates, ordered=False)
+        if fix and drift:
+            await catalog_cache.invalidate(*(product_key(item["product_id"]) for item in drift), PRODUCT_FACETS_KEY)
+        return drift
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Rebuild product rating counters from reviews and report drift")
+    parser.add_argument("--reconcile", action="store_true", help="compare counters with the reviews collection")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without repairing it")
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        try:
+            if not args.reconcile:
+                parser.print_help()
+                return 0
+
+            drift = await RatingService(db).reconcile(fix=not args.dry_run)
+            for item in drift:
+                print(f"{item['product_id']}: stored {item['stored']} expected {item['expected']}")
+            action = "found" if args.dry_run else "repaired"
+            print(f"{len(drift)} products with drifted rating counters {action}")
+            return 1 if drift and args.dry_run else 0
+        finally:
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
@@ -1,13 +1,20 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
 from models.review_model import Review, ReviewCreate, ReviewUpdate
-from typing import List, Optional
+from services.pagination_service import find_page
+from services.serialization_service import validate_list
+from services.rating_service import RatingService
+from pymongo import ReturnDocument
+from typing import List, Optional, Tuple
 from datetime import datetime, timezone
 import uuid
 
+@profiled
 class ReviewService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.collection = db['reviews']
         self.products_collection = db['products']
+        self.rating_service = RatingService(db)
     
     async def create_review(self, review_data: ReviewCreate, current_user: dict) -> Review:
         review_dict = review_data.model_dump()
@@ -15,11 +22,14 @@ class ReviewService:
         review_dict['user_id'] = current_user['id']
         review_dict['user_name'] = current_user.get('name', current_user.get('email', 'Anonymous'))
         review_dict['is_approved'] = False
+        review_dict['created_at'] = datetime.now(timezone.utc).isoformat()
+        review_dict['updated_at'] = review_dict['created_at']
         
         await self.collection.insert_one(review_dict)
+        review_dict.pop('_id', None)
         
         # Update product rating
-        await self._update_product_rating(review_data.product_id)
+        await self.rating_service.apply_review_change(review_data.product_id, None, review_dict)
         
         return Review(**review_dict)
     
@@ -30,49 +40,30 @@ class ReviewService:
         skip: int = 0,
         limit: int = 50
     ) -> List[Review]:
+        reviews, _ = await self.get_reviews_page(product_id, is_approved, skip, limit)
+        return reviews
+    
+    async def get_reviews_page(
+        self,
+        product_id: Optional[str] = None,
+        is_approved: Optional[bool] = None,
+        skip: int = 0,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Review], Optional[str]]:
+        """Return one page of reviews, newest first, and the cursor for the next page"""
         query = {}
         if product_id:
             query['product_id'] = product_id
         if is_approved is not None:
             query['is_approved'] = is_approved
         
-        cursor = self.collection.find(query).sort('created_at', -1).skip(skip).limit(limit)
-        reviews = await cursor.to_list(length=limit)
-        return [Review(**review) for review in reviews]
+        reviews, next_cursor = await find_page(self.collection, query, 'created_at', -1, limit, skip, cursor)
+        return validate_list(Review, reviews), next_cursor
     
     async def get_review_stats(self, product_id: str):
         """Get review statistics for a product"""
-        pipeline = [
-            {'$match': {'product_id': product_id, 'is_approved': True}},
-            {'$group': {
-                '_id': '$rating',
-                'count': {'$sum': 1}
-            }}
-        ]
-        
-        rating_distribution = {}
-        total_reviews = 0
-        total_rating_sum = 0
-        
-        async for doc in self.collection.aggregate(pipeline):
-            rating = doc['_id']
-            count = doc['count']
-            rating_distribution[rating] = count
-            total_reviews += count
-            total_rating_sum += rating * count
-        
-        # Fill in missing ratings with 0
-        for i in range(1, 6):
-            if i not in rating_distribution:
-                rating_distribution[i] = 0
-        
-        average_rating = total_rating_sum / total_reviews if total_reviews > 0 else 0
-        
-        return {
-            'average_rating': round(average_rating, 1),
-            'total_reviews': total_reviews,
-            'rating_distribution': rating_distribution
-        }
+        return await self.rating_service.get_stats(product_id)
     
     async def get_review_by_id(self, review_id: str) -> Optional[Review]:
         review = await self.collection.find_one({'id': review_id})
@@ -86,16 +77,17 @@ class ReviewService:
         
         update_dict['updated_at'] = datetime.now(timezone.utc)
         
-        result = await self.collection.find_one_and_update(
+        before = await self.collection.find_one_and_update(
             {'id': review_id},
             {'$set': update_dict},
-            return_document=True
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result:
+        if before:
             # Update product rating
-            await self._update_product_rating(result['product_id'])
-            return Review(**result)
+            after = {**before, **update_dict}
+            await self.rating_service.apply_review_change(before['product_id'], before, after)
+            return Review(**after)
         return None
     
     async def update_user_review(self, review_id: str, rating: int, comment: str, current_user: dict) -> Optional[Review]:
@@ -111,15 +103,16 @@ class ReviewService:
             'updated_at': datetime.now(timezone.utc)
         }
         
-        result = await self.collection.find_one_and_update(
-            {'id': review_id},
+        before = await self.collection.find_one_and_update(
+            {'id': review_id, 'user_id': current_user['id']},
             {'$set': update_dict},
-            return_document=True
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result:
-            await self._update_product_rating(result['product_id'])
-            return Review(**result)
+        if before:
+            after = {**before, **update_dict}
+            await self.rating_service.apply_review_change(before['product_id'], before, after)
+            return Review(**after)
         return None
     
     async def delete_review(self, review_id: str, current_user: dict) -> bool:
@@ -134,37 +127,9 @@ class ReviewService:
         if not (is_admin or is_owner):
             return False
         
-        product_id = review['product_id']
-        result = await self.collection.delete_one({'id': review_id})
+        deleted = await self.collection.find_one_and_delete({'id': review_id})
         
-        if result.deleted_count > 0:
-            await self._update_product_rating(product_id)
+        if deleted:
+            await self.rating_service.apply_review_change(deleted['product_id'], deleted, None)
             return True
         return False
-    
-    async def _update_product_rating(self, product_id: str):
-        """Update product's average rating and total reviews"""
-        pipeline = [
-            {'$match': {'product_id': product_id, 'is_approved': True}},
-            {'$group': {
-                '_id': None,
-                'average_rating': {'$avg': '$rating'},
-                'total_reviews': {'$sum': 1}
-            }}
-        ]
-        
-        result = await self.collection.aggregate(pipeline).to_list(length=1)
-        
-        if result:
-            await self.products_collection.update_one(
-                {'id': product_id},
-                {'$set': {
-                    'average_rating': round(result[0]['average_rating'], 1),
-                    'total_reviews': result[0]['total_reviews']
-                }}
-            )
-        else:
-            await self.products_collection.update_one(
-                {'id': product_id},
-                {'$set': {'average_rating': 0, 'total_reviews': 0}}
-            )
\ No newline at end of file
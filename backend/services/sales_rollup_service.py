@@ -0,0 +1,261 @@
+"""Daily sales rollups kept in step with order payment transitions.
+
+A paid order that hasn't been cancelled counts towards three bucket
+collections, keyed by the order's creation day:
+
+    sales_daily             one document per day
+    sales_daily_products    one per day and product
+    sales_daily_categories  one per day and category
+
+Each bucket holds units, gross (list price), discount and net (what was
+charged). OrderService calls sync_order after every status write; the order's
+sales_rollup field records whether it is counted and under which categories,
+and is flipped with a compare-and-set before any $inc, so repeated webhooks or
+verify calls never count an order twice and a reversal subtracts exactly what
+was added.
+
+A crash between the flip and the $inc leaves the buckets short; rebuild them
+from the orders in one streaming pass (writes that land while it runs can be
+lost, so run it when order traffic is quiet):
+
+    python -m services.sales_rollup_service --backfill
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from services.index_service import INDEXES
+from pymongo import ReturnDocument, UpdateOne
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+import asyncio
+
+DAILY = "sales_daily"
+PRODUCTS = "sales_daily_products"
+CATEGORIES = "sales_daily_categories"
+UNCATEGORIZED = "uncategorized"
+MEASURES = ("orders", "units", "gross", "discount", "net")
+ORDER_PROJECTION = {"_id": 0, "id": 1, "items": 1, "created_at": 1, "payment_status": 1, "order_status": 1, "sales_rollup": 1}
+
+Buckets = Dict[Tuple[str, str], Dict[str, float]]
+
+
+# The orders counts_as_sale accepts, as a Mongo filter
+SALE_FILTER = {"payment_status": "completed", "order_status": {"$ne": "cancelled"}}
+
+
+def counts_as_sale(order: dict) -> bool:
+    return order.get("payment_status") == "completed" and order.get("order_status") != "cancelled"
+
+
+def order_day(order: dict) -> str:
+    created_at = order["created_at"]
+    return (created_at.isoformat() if isinstance(created_at, datetime) else created_at)[:10]
+
+
+def order_buckets(order: dict, categories: Dict[str, Optional[str]], sign: int = 1) -> Dict[str, Buckets]:
+    """The measures one order adds (sign=1) or removes (sign=-1), keyed by collection and (day, key)"""
+    day = order_day(order)
+    buckets: Dict[str, Buckets] = {name: defaultdict(lambda: defaultdict(int)) for name in (DAILY, PRODUCTS, CATEGORIES)}
+    buckets[DAILY][(day, "")]["orders"] += sign
+
+    for item in order.get("items", []):
+        quantity = item["quantity"]
+        measures = {
+            "units": quantity,
+            "gross": item["price"] * quantity,
+            "discount": (item["price"] - item["final_price"]) * quantity,
+            "net": item["final_price"] * quantity,
+        }
+        category_id = categories.get(item["product_id"]) or UNCATEGORIZED
+        for name, key in ((DAILY, ""), (PRODUCTS, item["product_id"]), (CATEGORIES, category_id)):
+            bucket = buckets[name][(day, key)]
+            for measure, value in measures.items():
+                bucket[measure] += sign * value
+
+    # An order counts once per product and category it contains, however many lines it has there
+    for name in (PRODUCTS, CATEGORIES):
+        for bucket in buckets[name].values():
+            bucket["orders"] = sign
+    return buckets
+
+
+def _bucket_id(day: str, key: str) -> str:
+    return f"{day}|{key}" if key else day
+
+
+def _bucket_fields(name: str, day: str, key: str) -> dict:
+    if name == PRODUCTS:
+        return {"day": day, "product_id": key}
+    if name == CATEGORIES:
+        return {"day": day, "category_id": key}
+    return {"day": day}
+
+
+def _round(measures: Dict[str, float]) -> dict:
+    return {measure: round(value, 2) if isinstance(value, float) else value for measure, value in measures.items()}
+
+
+@profiled
+class SalesRollupService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.orders = db.orders
+        self.products = db.products
+
+    async def sync_order(self, order_id: str):
+        """Bring the rollups in line with the order's current status; safe to call any number of times"""
+        order = await self.orders.find_one({"id": order_id}, ORDER_PROJECTION)
+        if order is None:
+            return
+        counted = order.get("sales_rollup") is not None
+        if counts_as_sale(order) and not counted:
+            await self._add(order)
+        elif counted and not counts_as_sale(order):
+            await self._remove(order)
+
+    async def _add(self, order: dict):
+        product_ids = list({item["product_id"] for item in order.get("items", [])})
+        categories = {
+            product["id"]: product.get("category_id")
+            async for product in self.products.find({"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "category_id": 1})
+        }
+        # The categories are frozen on the order so a later reversal undoes the same buckets after a re-categorisation
+        claimed = await self.orders.update_one(
+            {"id": order["id"], "sales_rollup": None},
+            {"$set": {"sales_rollup": {"categories": categories, "applied_at": datetime.now(timezone.utc).isoformat()}}}
+        )
+        if claimed.modified_count:
+            await self._apply(order_buckets(order, categories))
+
+    async def _remove(self, order: dict):
+        released = await self.orders.find_one_and_update(
+            {"id": order["id"], "sales_rollup": {"$ne": None}},
+            {"$set": {"sales_rollup": None}},
+            projection=ORDER_PROJECTION,
+            return_document=ReturnDocument.BEFORE
+        )
+        if released is not None:
+            await self._apply(order_buckets(released, released["sales_rollup"].get("categories", {}), sign=-1))
+
+    async def _apply(self, buckets: Dict[str, Buckets]):
+        await asyncio.gather(*(
+            self.db[name].bulk_write([
+                UpdateOne(
+                    {"_id": _bucket_id(day, key)},
+                    {"$inc": _round(measures), "$setOnInsert": _bucket_fields(name, day, key)},
+                    upsert=True
+                )
+                for (day, key), measures in collection_buckets.items()
+            ], ordered=False)
+            for name, collection_buckets in buckets.items() if collection_buckets
+        ))
+
+    async def backfill(self, batch_size: int = 1000) -> dict:
+        """Rebuild every bucket from the orders, re-marking which orders are counted; returns bucket counts"""
+        categories = {
+            product["id"]: product.get("category_id")
+            async for product in self.products.find({}, {"_id": 0, "id": 1, "category_id": 1})
+        }
+        totals: Dict[str, Buckets] = {name: defaultdict(lambda: defaultdict(int)) for name in (DAILY, PRODUCTS, CATEGORIES)}
+        marks = []
+        applied_at = datetime.now(timezone.utc).isoformat()
+
+        cursor = self.orders.find({}, ORDER_PROJECTION).batch_size(batch_size)
+        async for order in cursor:
+            counted = order.get("sales_rollup") is not None
+            if counts_as_sale(order):
+                order_categories = {item["product_id"]: categories.get(item["product_id"]) for item in order.get("items", [])}
+                for name, buckets in order_buckets(order, order_categories).items():
+                    for bucket_key, measures in buckets.items():
+                        for measure, value in measures.items():
+                            totals[name][bucket_key][measure] += value
+                marks.append(UpdateOne({"id": order["id"]}, {"$set": {"sales_rollup": {"categories": order_categories, "applied_at": applied_at}}}))
+            elif counted:
+                marks.append(UpdateOne({"id": order["id"]}, {"$set": {"sales_rollup": None}}))
+            if len(marks) >= batch_size:
+                await self.orders.bulk_write(marks, ordered=False)
+                marks = []
+        if marks:
+            await self.orders.bulk_write(marks, ordered=False)
+
+        # Build each collection beside the live one and swap it in, so readers never see a half-built rollup
+        report = {}
+        for name, buckets in totals.items():
+            staging = self.db[f"{name}_backfill"]
+            await staging.drop()
+            await staging.create_indexes(INDEXES[name])
+            docs = [
+                {"_id": _bucket_id(day, key), **_bucket_fields(name, day, key), **{m: 0 for m in MEASURES}, **_round(measures)}
+                for (day, key), measures in buckets.items()
+            ]
+            for start in range(0, len(docs), batch_size):
+                await staging.insert_many(docs[start:start + batch_size], ordered=False)
+            if docs:
+                await staging.rename(name, dropTarget=True)
+            else:
+                await self.db[name].delete_many({})
+            report[name] = len(docs)
+        return report
+
+    async def daily(self, start: str, end: str) -> List[dict]:
+        return await self.db[DAILY].find({"day": {"$gte": start, "$lte": end}}, {"_id": 0}).sort("day", 1).to_list(None)
+
+    async def top(self, name: str, key: str, start: str, end: str, limit: int = 20, sort: str = "net") -> List[dict]:
+        """Per-product or per-category totals over a day range, largest first"""
+        pipeline = [
+            {"$match": {"day": {"$gte": start, "$lte": end}}},
+            {"$group": {"_id": f"${key}", **{measure: {"$sum": f"${measure}"} for measure in MEASURES}}},
+            {"$sort": {sort: -1, "_id": 1}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, key: "$_id", **{measure: {"$round": [f"${measure}", 2]} for measure in MEASURES}}},
+        ]
+        return await self.db[name].aggregate(pipeline).to_list(limit)
+
+    async def by_product(self, start: str, end: str, limit: int = 20, sort: str = "net") -> List[dict]:
+        return await self.top(PRODUCTS, "product_id", start, end, limit, sort)
+
+    async def by_category(self, start: str, end: str, limit: int = 20, sort: str = "net") -> List[dict]:
+        return await self.top(CATEGORIES, "category_id", start, end, limit, sort)
+
+
+def day_range(start: Optional[date], end: Optional[date], default_days: int = 30) -> Tuple[str, str]:
+    """Inclusive YYYY-MM-DD bounds, defaulting to the last `default_days` days"""
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    return start.isoformat(), end.isoformat()
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import time
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Rebuild the daily sales rollups from orders")
+    parser.add_argument("--backfill", action="store_true", help="recompute every bucket in one pass over orders")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        try:
+            if not args.backfill:
+                parser.print_help()
+                return 0
+
+            start = time.perf_counter()
+            report = await SalesRollupService(db).backfill(args.batch_size)
+            buckets = ", ".join(f"{name}={count}" for name, count in report.items())
+            print(f"Sales rollups rebuilt in {time.perf_counter() - start:.1f} s: {buckets}")
+            return 0
+        finally:
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,183 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from typing import Dict, Iterable, List, Optional, Tuple
+import bisect
+import heapq
+import math
+import re
+
+# Field weights used when counting term frequencies (BM25F-style)
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "brand": 2.0,
+    "description": 1.0,
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Score multiplier for terms that only match a query token by prefix
+PREFIX_PENALTY = 0.5
+# Prefix matches scored per query token: the exact term plus the ones found in
+# the most products, so a short prefix like "a" skips rare terms, not late ones
+MAX_PREFIX_EXPANSIONS = 64
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens"""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+class ProductSearchIndex:
+    """In-process inverted index over product name, brand and description.
+
+    Postings map each term to {product_id: weighted term frequency}. A sorted
+    vocabulary serves prefix lookups, so "ou" finds "oud" while the user types.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._doc_lengths: Dict[str, float] = {}
+        self._total_length = 0.0
+        self._vocabulary: List[str] = []
+        self._rebuild_target: Optional["ProductSearchIndex"] = None
+        self.is_ready = False
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def upsert(self, product: dict):
+        """Add or replace a product document in the index"""
+        self._upsert(product)
+        if self._rebuild_target is not None:
+            self._rebuild_target._upsert(product)
+
+    def remove(self, product_id: str):
+        """Drop a product from the index"""
+        self._remove(product_id)
+        if self._rebuild_target is not None:
+            self._rebuild_target._remove(product_id)
+
+    def build(self, products: Iterable[dict]):
+        """Replace the index contents with the given product documents"""
+        fresh = ProductSearchIndex()
+        for product in products:
+            fresh._upsert(product)
+        self._swap(fresh)
+
+    async def build_from_collection(self, collection: AsyncIOMotorCollection, batch_size: int = 1000):
+        """Stream the products collection into a fresh index and swap it in.
+
+        Writes that land while the build is running are applied to both the
+        live index and the one being built, so nothing is lost on the swap.
+        """
+        fresh = ProductSearchIndex()
+        self._rebuild_target = fresh
+        try:
+            projection = {"_id": 0, "id": 1, **{field: 1 for field in FIELD_WEIGHTS}}
+            async for product in collection.find({}, projection).batch_size(batch_size):
+                fresh._upsert(product)
+            self._swap(fresh)
+        finally:
+            self._rebuild_target = None
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Return (product_id, score) pairs ranked by BM25 score.
+
+        Every query token must match (exactly or by prefix) in some field.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens or not self._doc_lengths:
+            return []
+
+        doc_count = len(self._doc_lengths)
+        lengths = self._doc_lengths
+        # BM25 length normalisation k1 * (1 - b + b * length / avg_length), with the
+        # average taken from the running total so writes never rescan the corpus
+        norm_base = BM25_K1 * (1 - BM25_B)
+        norm_scale = BM25_K1 * BM25_B / ((self._total_length / doc_count) or 1.0)
+        scores: Optional[Dict[str, float]] = None
+
+        for token in tokens:
+            token_scores: Dict[str, float] = {}
+            for term in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                weight = (1.0 if term == token else PREFIX_PENALTY) * idf * (BM25_K1 + 1)
+                for product_id, tf in postings.items():
+                    score = weight * tf / (tf + norm_base + norm_scale * lengths[product_id])
+                    if score > token_scores.get(product_id, 0.0):
+                        token_scores[product_id] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {pid: s + token_scores[pid] for pid, s in scores.items() if pid in token_scores}
+            if not scores:
+                return []
+
+        if limit is not None:
+            return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _expand(self, token: str) -> List[str]:
+        """Vocabulary terms equal to or starting with token, capped at MAX_PREFIX_EXPANSIONS"""
+        start = bisect.bisect_left(self._vocabulary, token)
+        end = bisect.bisect_left(self._vocabulary, token + "\U0010ffff", start)
+        terms = self._vocabulary[start:end]
+        if len(terms) <= MAX_PREFIX_EXPANSIONS:
+            return terms
+        return heapq.nlargest(MAX_PREFIX_EXPANSIONS, terms, key=lambda term: (term == token, len(self._postings[term])))
+
+    def _upsert(self, product: dict):
+        product_id = product.get("id")
+        if not product_id:
+            return
+        self._remove(product_id)
+
+        term_freqs: Dict[str, float] = {}
+        length = 0.0
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product.get(field)):
+                term_freqs[term] = term_freqs.get(term, 0.0) + weight
+                length += weight
+
+        for term, tf in term_freqs.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                bisect.insort(self._vocabulary, term)
+            postings[product_id] = tf
+
+        self._doc_terms[product_id] = term_freqs
+        self._doc_lengths[product_id] = length
+        self._total_length += length
+
+    def _remove(self, product_id: str):
+        term_freqs = self._doc_terms.pop(product_id, None)
+        if term_freqs is None:
+            return
+        for term in term_freqs:
+            postings = self._postings[term]
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._vocabulary, term)
+                del self._vocabulary[index]
+        self._total_length -= self._doc_lengths.pop(product_id)
+
+    def _swap(self, other: "ProductSearchIndex"):
+        self._postings = other._postings
+        self._doc_terms = other._doc_terms
+        self._doc_lengths = other._doc_lengths
+        self._total_length = other._total_length
+        self._vocabulary = other._vocabulary
+        self.is_ready = True
+
+
+# Shared by every ProductService instance in this process
+product_search_index = ProductSearchIndex()
@@ -0,0 +1,70 @@
+"""Validate Mongo documents once and send them pre-encoded.
+
+A handler that returns models under response_model= has FastAPI validate and
+serialize every object a second time. Services validate a page of documents in
+one TypeAdapter call instead of one model per document, and handlers return
+model_response()/json_response(), which encode straight to JSON bytes:
+pydantic-core for models, orjson for plain dicts. A Response returned this way
+bypasses response_model, which stays on the route for the OpenAPI schema and
+describes the same JSON.
+
+FastAPI drops headers set on an injected Response when the handler returns its
+own, so pass it along and its headers (X-Next-Cursor, ETag, Cache-Control) are
+copied over.
+"""
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+from functools import lru_cache
+from typing import Any, Iterable, List, Optional, Type, TypeVar
+import orjson
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+class JSONBytesResponse(Response):
+    """A response whose content is already encoded JSON"""
+    media_type = "application/json"
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model: Type[ModelT]) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+def validate_list(model: Type[ModelT], docs: Iterable[dict]) -> List[ModelT]:
+    """Validate a batch of documents in one call"""
+    return list_adapter(model).validate_python(docs if isinstance(docs, list) else list(docs))
+
+
+def _encoded(body: bytes, response: Optional[Response], status_code: int) -> Response:
+    headers = None
+    if response is not None:
+        headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+        status_code = response.status_code or status_code
+    return JSONBytesResponse(body, status_code=status_code, headers=headers)
+
+
+def model_response(value: Any, model: Optional[Type[BaseModel]] = None, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Encode a validated model, or a list of `model`, as the response_model route would.
+    
+    For a list, model defaults to the type of its first item.
+    """
+    if isinstance(value, BaseModel):
+        body = value.__pydantic_serializer__.to_json(value)
+    elif model is None and not value:
+        body = b"[]"
+    else:
+        body = list_adapter(model or type(value[0])).dump_json(value)
+    return _encoded(body, response, status_code)
+
+
+def _default(value: Any):
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Encode plain data (dicts, lists, model_dump() output) with orjson"""
+    # Non-str keys (rating distributions are keyed by int) are written as strings, as json.dumps does
+    return _encoded(orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS), response, status_code)
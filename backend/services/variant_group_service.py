@@ -0,0 +1,152 @@
+"""Maintained index of product variant groups, one variant_groups document per group.
+
+Each document lists the group's members pre-sorted by the size in their
+variant_name, parsed as a number and normalized to a base unit (ml for
+volumes, g for weights). So "2.5 ML" sorts between "2 ML" and "3 ML", and
+"1 L" sorts after "500 ML". Product writes refresh the groups they touch, so
+reads are one indexed find_one with no sorting. The collection is rebuilt on
+startup when it is empty, or by hand with:
+
+    python -m services.variant_group_service --rebuild
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from pymongo import ReplaceOne
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import re
+
+VARIANT_GROUPS_COLLECTION = "variant_groups"
+
+# unit as written -> (base unit, factor to the base unit)
+UNITS = {
+    "ml": ("ml", 1), "cl": ("ml", 10), "l": ("ml", 1000), "ltr": ("ml", 1000),
+    "litre": ("ml", 1000), "litres": ("ml", 1000), "liter": ("ml", 1000), "liters": ("ml", 1000),
+    "oz": ("ml", 29.5735), "floz": ("ml", 29.5735),
+    "g": ("g", 1), "gm": ("g", 1), "gms": ("g", 1), "gram": ("g", 1), "grams": ("g", 1), "kg": ("g", 1000),
+}
+SIZE_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*(fl\.?\s*oz|ml|cl|ltr|litres?|liters?|l|oz|kg|gms?|grams?|g)?\b", re.IGNORECASE)
+
+# Product fields build_members reads besides the id; writes that leave them alone keep their groups
+MEMBER_FIELDS = ("variant_group", "variant_name")
+
+
+def parse_size(variant_name: Optional[str]) -> Tuple[Optional[float], Optional[str]]:
+    """(size in the base unit, base unit) for names like "2.5 ML" or "1L"; (None, None) if there is no number"""
+    match = SIZE_PATTERN.search(variant_name or "")
+    if not match:
+        return None, None
+    value = float(match.group(1))
+    unit = re.sub(r"[\s.]", "", match.group(2) or "").lower()
+    if not unit:
+        return value, None
+    base, factor = UNITS[unit]
+    return round(value * factor, 4), base
+
+
+def member_sort_key(member: dict) -> tuple:
+    # Sized variants by unit then size, names without a size last
+    return (member["size"] is None, member["unit"] or "", member["size"] or 0, member["variant_name"] or "", member["id"])
+
+
+def members_changed(before: Optional[dict], after: Optional[dict]) -> bool:
+    """Whether a write moves a product between groups or renames its variant (before/after are None for inserts/deletes)"""
+    if not before or not after:
+        return True
+    return any(field in after and after[field] != before.get(field) for field in MEMBER_FIELDS)
+
+
+def build_members(products: List[dict]) -> List[dict]:
+    members = []
+    for product in products:
+        size, unit = parse_size(product.get("variant_name"))
+        members.append({"id": product["id"], "variant_name": product.get("variant_name"), "size": size, "unit": unit})
+    return sorted(members, key=member_sort_key)
+
+
+@profiled
+class VariantGroupService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.groups = db[VARIANT_GROUPS_COLLECTION]
+        self.products = db.products
+
+    async def members(self, group: str) -> List[dict]:
+        """Members of a group in size order"""
+        doc = await self.groups.find_one({"group": group}, {"_id": 0, "members": 1})
+        return doc["members"] if doc else []
+
+    async def group_names(self) -> List[str]:
+        docs = await self.groups.find({}, {"_id": 0, "group": 1}).sort("group", 1).to_list(None)
+        return [doc["group"] for doc in docs]
+
+    async def refresh(self, *groups: Optional[str]):
+        """Re-read the members of each group from products after a write moved or renamed variants"""
+        now = datetime.now(timezone.utc).isoformat()
+        for group in dict.fromkeys(group for group in groups if group):
+            products = await self.products.find({"variant_group": group}, {"_id": 0, "id": 1, "variant_name": 1}).to_list(None)
+            if not products:
+                await self.groups.delete_one({"group": group})
+                continue
+            await self.groups.replace_one(
+                {"group": group},
+                {"group": group, "members": build_members(products), "updated_at": now},
+                upsert=True
+            )
+
+    async def rebuild(self) -> int:
+        """Recompute every group from the products collection; returns the number of groups"""
+        pipeline = [
+            {"$match": {"variant_group": {"$nin": [None, ""]}}},
+            {"$group": {"_id": "$variant_group", "products": {"$push": {"id": "$id", "variant_name": "$variant_name"}}}},
+        ]
+        now = datetime.now(timezone.utc).isoformat()
+        names, operations = [], []
+        async for doc in self.products.aggregate(pipeline):
+            names.append(doc["_id"])
+            operations.append(ReplaceOne(
+                {"group": doc["_id"]},
+                {"group": doc["_id"], "members": build_members(doc["products"]), "updated_at": now},
+                upsert=True
+            ))
+        if operations:
+            await self.groups.bulk_write(operations, ordered=False)
+        await self.groups.delete_many({"group": {"$nin": names}})
+        return len(names)
+
+    async def ensure_built(self) -> bool:
+        """Build the collection if it has never been built; returns True if it did"""
+        if await self.groups.find_one({}, {"_id": 1}):
+            return False
+        if not await self.products.find_one({"variant_group": {"$nin": [None, ""]}}, {"_id": 1}):
+            return False
+        await self.rebuild()
+        return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Rebuild the variant_groups collection from products")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every variant group")
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        try:
+            if not args.rebuild:
+                parser.print_help()
+                return 0
+            count = await VariantGroupService(client[os.environ["DB_NAME"]]).rebuild()
+            print(f"{count} variant groups rebuilt")
+            return 0
+        finally:
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,223 @@
+"""Durable inbox for PhonePe webhooks.
+
+The webhook handler only records the callback: one insert into
+phonepe_webhook_inbox, keyed by a fingerprint of the event (event, merchant
+order id, state, transaction id), so PhonePe's retries of the same callback
+collapse into one entry and the request is acknowledged straight away. A
+consumer running in the server claims pending entries and applies them through
+OrderService, whose payment updates only fire from a pending (or failed)
+payment status, so an entry applied twice, or racing the user's
+/verify-phonepe-payment call, changes the order once.
+
+An entry that fails is retried with backoff up to WEBHOOK_INBOX_MAX_ATTEMPTS
+times and then left as failed; entries expire after
+WEBHOOK_INBOX_RETENTION_DAYS (a TTL index). Re-run entries by hand with:
+
+    python -m services.webhook_inbox_service replay [--order-id ID] [--status failed] [--since 2024-01-01]
+    python -m services.webhook_inbox_service drain
+"""
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from services.mongo_profiler_service import profiled
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from services.order_service import OrderService
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_INBOX_WORKERS = int(os.environ.get("WEBHOOK_INBOX_WORKERS", "4"))
+# The consumer is woken by each new entry; the poll only picks up work from other processes and retries
+WEBHOOK_INBOX_POLL_SECONDS = float(os.environ.get("WEBHOOK_INBOX_POLL_SECONDS", "5"))
+WEBHOOK_INBOX_LEASE_SECONDS = float(os.environ.get("WEBHOOK_INBOX_LEASE_SECONDS", "60"))
+WEBHOOK_INBOX_MAX_ATTEMPTS = int(os.environ.get("WEBHOOK_INBOX_MAX_ATTEMPTS", "5"))
+
+INBOX_COLLECTION = "phonepe_webhook_inbox"
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+IGNORED = "ignored"
+FAILED = "failed"
+
+# Set by the webhook handler so an in-process consumer picks the entry up without waiting for the poll
+inbox_wakeup = asyncio.Event()
+
+
+def parse_callback(data: dict) -> dict:
+    """The fields of a PhonePe v2 callback the inbox keys on and applies"""
+    payload = data.get("payload") or {}
+    details = (payload.get("paymentDetails") or [{}])[0]
+    return {
+        "event": data.get("event", ""),
+        "merchant_order_id": payload.get("merchantOrderId"),
+        "state": (payload.get("state") or "").upper(),
+        "transaction_id": details.get("transactionId", ""),
+        "payment_mode": details.get("paymentMode") or details.get("instrumentType") or "UNKNOWN",
+    }
+
+
+def fingerprint(callback: dict) -> str:
+    key = [callback["event"], callback["merchant_order_id"], callback["state"], callback["transaction_id"]]
+    return hashlib.sha256(json.dumps(key).encode()).hexdigest()
+
+
+@profiled
+class WebhookInboxService:
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.inbox = db[INBOX_COLLECTION]
+        self.order_service = OrderService(db)
+
+    async def record(self, callback: dict, body: str) -> bool:
+        """Store a callback for the consumer; returns False if the same event is already in the inbox"""
+        now = datetime.now(timezone.utc)
+        try:
+            await self.inbox.insert_one({
+                "_id": fingerprint(callback),
+                **callback,
+                "body": body,
+                "status": PENDING,
+                "attempts": 0,
+                "received_at": now,
+                "retry_at": now,
+            })
+        except DuplicateKeyError:
+            return False
+        inbox_wakeup.set()
+        return True
+
+    async def claim(self) -> Optional[dict]:
+        """Lease the oldest pending entry that is due, or one whose previous consumer stopped mid-way"""
+        now = datetime.now(timezone.utc)
+        return await self.inbox.find_one_and_update(
+            {"$or": [
+                {"status": PENDING, "retry_at": {"$lte": now}},
+                {"status": PROCESSING, "claimed_at": {"$lt": now - timedelta(seconds=WEBHOOK_INBOX_LEASE_SECONDS)}},
+            ]},
+            {"$set": {"status": PROCESSING, "claimed_at": now}, "$inc": {"attempts": 1}},
+            sort=[("retry_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    async def apply(self, entry: dict) -> dict:
+        """Apply one entry to its order; returns the fields to record on the entry"""
+        order_id = entry["merchant_order_id"]
+        if not order_id:
+            return {"status": IGNORED, "result": "Missing merchantOrderId"}
+        order = await self.order_service.get_order_by_id(order_id)
+        if not order:
+            return {"status": IGNORED, "result": "Order not found"}
+
+        if entry["state"] == "COMPLETED" or entry["event"] == "checkout.order.completed":
+            applied = await self.order_service.update_payment_info_phonepe(
+                order_id, order_id, entry["transaction_id"], entry["state"], entry["payment_mode"]
+            )
+            return {"status": DONE, "result": "completed" if applied else "already completed"}
+        if entry["state"] == "FAILED" or entry["event"] == "checkout.order.failed":
+            applied = await self.order_service.update_payment_failed(order_id, f"PhonePe reported failure: {entry['state']}")
+            return {"status": DONE, "result": "failed" if applied else "payment no longer pending"}
+        return {"status": IGNORED, "result": f"Unhandled state {entry['state'] or entry['event']}"}
+
+    async def process_one(self) -> bool:
+        """Claim and apply one entry; returns False when there was nothing to claim"""
+        entry = await self.claim()
+        if entry is None:
+            return False
+        try:
+            outcome = await self.apply(entry)
+        except Exception as e:
+            logger.error(f"Webhook {entry['_id']} for order {entry['merchant_order_id']} failed: {e}")
+            status = FAILED if entry["attempts"] >= WEBHOOK_INBOX_MAX_ATTEMPTS else PENDING
+            # Back off 2, 4, 8... seconds so a broken order doesn't spin the consumer
+            retry_at = datetime.now(timezone.utc) + timedelta(seconds=2 ** entry["attempts"])
+            outcome = {"status": status, "result": str(e), "retry_at": retry_at}
+        # Matching our claimed_at means the lease is still ours, not re-claimed after it expired
+        result = await self.inbox.update_one(
+            {"_id": entry["_id"], "status": PROCESSING, "claimed_at": entry["claimed_at"]},
+            {"$set": {**outcome, "processed_at": datetime.now(timezone.utc)}}
+        )
+        if result.matched_count == 0:
+            logger.warning(f"Webhook {entry['_id']} lease expired before it was applied; leaving it to the consumer that re-claimed it")
+        return True
+
+    async def drain(self, workers: int = WEBHOOK_INBOX_WORKERS) -> int:
+        """Process entries with `workers` concurrent consumers until none are left; returns how many were processed"""
+        processed = 0
+
+        async def worker():
+            nonlocal processed
+            while await self.process_one():
+                processed += 1
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return processed
+
+    async def run_consumer(self, poll_interval: float = WEBHOOK_INBOX_POLL_SECONDS):
+        """Drain the inbox whenever a webhook arrives (or every poll_interval) until cancelled"""
+        while True:
+            inbox_wakeup.clear()
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error(f"Webhook inbox consumer failed: {e}")
+            try:
+                await asyncio.wait_for(inbox_wakeup.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def replay(self, order_id: Optional[str] = None, status: Optional[str] = None, since: Optional[datetime] = None) -> int:
+        """Put matching entries back in the queue; returns how many were re-queued"""
+        query = {"status": {"$ne": PROCESSING}}
+        if order_id:
+            query["merchant_order_id"] = order_id
+        if status:
+            query["status"] = status
+        if since:
+            query["received_at"] = {"$gte": since}
+        result = await self.inbox.update_many(
+            query,
+            {"$set": {"status": PENDING, "attempts": 0, "retry_at": datetime.now(timezone.utc)}, "$unset": {"result": "", "processed_at": ""}}
+        )
+        if result.modified_count:
+            inbox_wakeup.set()
+        return result.modified_count
+
+
+if __name__ == "__main__":
+    import argparse
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Replay or drain the PhonePe webhook inbox")
+    parser.add_argument("command", choices=["replay", "drain"])
+    parser.add_argument("--order-id", help="only entries for this merchant order id")
+    parser.add_argument("--status", choices=[PENDING, DONE, IGNORED, FAILED], help="only entries in this status")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="only entries received at or after this time (UTC)")
+    parser.add_argument("--queue-only", action="store_true", help="re-queue for the running server instead of applying here")
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        service = WebhookInboxService(client[os.environ["DB_NAME"]])
+        try:
+            if args.command == "replay":
+                since = args.since.replace(tzinfo=args.since.tzinfo or timezone.utc) if args.since else None
+                print(f"{await service.replay(args.order_id, args.status, since)} entries re-queued")
+                if args.queue_only:
+                    return 0
+            print(f"{await service.drain()} entries processed")
+            failed = await service.inbox.count_documents({"status": FAILED})
+            if failed:
+                print(f"{failed} entries are failed; see their result field")
+            return 1 if failed else 0
+        finally:
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
@@ -1,74 +1,161 @@
+"""Wishlists, one wishlist_items document per (user, product).
+
+Items used to live in an array on the user document, so every membership
+check loaded the whole user. The unique (user_id, product_id) index answers
+checks for a single product or a whole listing page, and makes add an upsert
+and remove a delete, one round trip each. Existing arrays are moved over
+on startup (ensure_migrated), or by hand with:
+
+    python -m services.wishlist_service --migrate
+"""
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List, Optional
+from services.mongo_profiler_service import profiled
+from pydantic import BaseModel
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from services.product_service import ProductService, resolve_view
+from services.serialization_service import validate_list
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+WISHLIST_COLLECTION = "wishlist_items"
 
+@profiled
 class WishlistService:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
+        self.items = db[WISHLIST_COLLECTION]
         self.users_collection = db.users
         self.products_collection = db.products
+        self.product_service = ProductService(db)
     
     async def add_to_wishlist(self, user_id: str, product_id: str) -> dict:
         """Add product to user's wishlist"""
-        # Check if product exists
-        product = await self.products_collection.find_one({"id": product_id})
-        if not product:
+        # Served from the catalog cache, so only the upsert goes to Mongo
+        if not await self.product_service.get_product_by_id(product_id):
             raise ValueError("Product not found")
         
-        # Check if already in wishlist
-        user = await self.users_collection.find_one({"id": user_id})
-        if not user:
-            raise ValueError("User not found")
-        
-        wishlist = user.get("wishlist", [])
-        if product_id in wishlist:
-            return {"message": "Product already in wishlist", "wishlist": wishlist}
-        
-        # Add to wishlist
-        await self.users_collection.update_one(
-            {"id": user_id},
-            {"$addToSet": {"wishlist": product_id}}
-        )
+        try:
+            result = await self.items.update_one(
+                {"user_id": user_id, "product_id": product_id},
+                {"$setOnInsert": {"created_at": datetime.now(timezone.utc).isoformat()}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # A concurrent add of the same product won the upsert
+            result = None
         
-        wishlist.append(product_id)
-        return {"message": "Product added to wishlist", "wishlist": wishlist}
+        if not result or not result.upserted_id:
+            return {"message": "Product already in wishlist", "product_id": product_id, "in_wishlist": True}
+        return {"message": "Product added to wishlist", "product_id": product_id, "in_wishlist": True}
     
     async def remove_from_wishlist(self, user_id: str, product_id: str) -> dict:
         """Remove product from user's wishlist"""
-        result = await self.users_collection.update_one(
-            {"id": user_id},
-            {"$pull": {"wishlist": product_id}}
-        )
+        result = await self.items.delete_one({"user_id": user_id, "product_id": product_id})
         
-        if result.modified_count == 0:
-            return {"message": "Product not in wishlist"}
-        
-        user = await self.users_collection.find_one({"id": user_id})
-        wishlist = user.get("wishlist", [])
-        return {"message": "Product removed from wishlist", "wishlist": wishlist}
+        if result.deleted_count == 0:
+            return {"message": "Product not in wishlist", "product_id": product_id, "in_wishlist": False}
+        return {"message": "Product removed from wishlist", "product_id": product_id, "in_wishlist": False}
     
-    async def get_wishlist(self, user_id: str) -> List[dict]:
-        """Get user's wishlist with product details"""
-        user = await self.users_collection.find_one({"id": user_id})
-        if not user:
-            return []
-        
-        wishlist_ids = user.get("wishlist", [])
-        if not wishlist_ids:
+    async def get_wishlist(self, user_id: str, view: Optional[str] = None, fields: Optional[str] = None) -> List[BaseModel]:
+        """Get user's wishlist with product details, newest first, shaped by view/fields as in product listings"""
+        model, projection = resolve_view(view, fields)
+        items = await self.items.find(
+            {"user_id": user_id}, {"_id": 0, "product_id": 1}
+        ).sort("created_at", -1).to_list(length=None)
+        if not items:
             return []
         
-        # Fetch all products in wishlist
+        wishlist_ids = [item["product_id"] for item in items]
         products = await self.products_collection.find(
             {"id": {"$in": wishlist_ids}},
-            {"_id": 0}
+            projection
         ).to_list(length=None)
         
-        return products
+        by_id = {product["id"]: product for product in products}
+        return validate_list(model, [by_id[pid] for pid in wishlist_ids if pid in by_id])
     
     async def check_in_wishlist(self, user_id: str, product_id: str) -> bool:
         """Check if product is in user's wishlist"""
-        user = await self.users_collection.find_one({"id": user_id})
-        if not user:
-            return False
+        item = await self.items.find_one({"user_id": user_id, "product_id": product_id}, {"_id": 0, "product_id": 1})
+        return item is not None
+    
+    async def check_many_in_wishlist(self, user_id: str, product_ids: List[str]) -> Dict[str, bool]:
+        """Membership of each product id, in one query"""
+        items = await self.items.find(
+            {"user_id": user_id, "product_id": {"$in": product_ids}}, {"_id": 0, "product_id": 1}
+        ).to_list(len(product_ids))
+        found = {item["product_id"] for item in items}
+        return {product_id: product_id in found for product_id in product_ids}
+    
+    async def migrate_embedded(self, batch_size: int = 500) -> Dict[str, int]:
+        """Copy users' embedded wishlist arrays into wishlist_items, then drop the arrays.
         
-        wishlist = user.get("wishlist", [])
-        return product_id in wishlist
\ No newline at end of file
+        Safe to re-run: items are upserted and a user's array is only removed after its items are written.
+        """
+        counts = {"users": 0, "items": 0}
+        now = datetime.now(timezone.utc)
+        cursor = self.users_collection.find({"wishlist": {"$exists": True}}, {"_id": 0, "id": 1, "wishlist": 1})
+        batch_users, updates = [], []
+        
+        async def flush():
+            if updates:
+                await self.items.bulk_write(updates, ordered=False)
+            if batch_users:
+                await self.users_collection.update_many({"id": {"$in": batch_users}}, {"$unset": {"wishlist": ""}})
+            counts["users"] += len(batch_users)
+            counts["items"] += len(updates)
+            batch_users.clear()
+            updates.clear()
+        
+        async for user in cursor:
+            batch_users.append(user["id"])
+            # Array entries were appended as they were added, so keep that order in created_at
+            for position, product_id in enumerate(dict.fromkeys(user["wishlist"])):
+                updates.append(UpdateOne(
+                    {"user_id": user["id"], "product_id": product_id},
+                    {"$setOnInsert": {"created_at": (now + timedelta(microseconds=position)).isoformat()}},
+                    upsert=True
+                ))
+            if len(updates) >= batch_size:
+                await flush()
+        await flush()
+        return counts
+    
+    async def ensure_migrated(self) -> Optional[Dict[str, int]]:
+        """Migrate embedded wishlists if any user still has one; returns the counts if it did"""
+        if not await self.users_collection.find_one({"wishlist": {"$exists": True}}, {"_id": 1}):
+            return None
+        return await self.migrate_embedded()
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import os
+    from pathlib import Path
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from services.index_service import ensure_indexes
+
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+
+    parser = argparse.ArgumentParser(description="Move embedded user wishlists into the wishlist_items collection")
+    parser.add_argument("--migrate", action="store_true", help="copy users' wishlist arrays and remove them")
+    args = parser.parse_args()
+
+    async def main() -> int:
+        client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+        db = client[os.environ["DB_NAME"]]
+        try:
+            if not args.migrate:
+                parser.print_help()
+                return 0
+            await ensure_indexes(db)
+            counts = await WishlistService(db).migrate_embedded()
+            print(f"{counts['items']} wishlist items migrated from {counts['users']} users")
+            return 0
+        finally:
+            client.close()
+
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,214 @@
+import asyncio
+import pickle
+
+import fakeredis
+
+from benchmarks.synthetic import make_products
+from models.product_model import Product
+from services.cache_service import CatalogCache, RedisCacheBackend, product_key
+
+
+async def start_workers(server, count: int) -> list:
+    workers = [CatalogCache(RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server))) for _ in range(count)]
+    for worker in workers:
+        await worker.start()
+    return workers
+
+
+async def close_workers(workers: list):
+    for worker in workers:
+        await worker.close()
+
+
+def counting_loader(value):
+    calls = []
+
+    async def load():
+        calls.append(1)
+        return value
+
+    return load, calls
+
+
+def test_models_round_trip_through_redis_as_json():
+    async def run():
+        server = fakeredis.FakeServer()
+        writer, reader = await start_workers(server, 2)
+        product = Product.model_validate(make_products(1)[0])
+        key = product_key(product.id)
+        try:
+            load, calls = counting_loader(product)
+            await writer.get_or_load(key, load)
+            raw = await reader.backend.client.get(reader.backend.namespace + key)
+            cached = await reader.get_or_load(key, load)
+        finally:
+            await close_workers([writer, reader])
+
+        assert raw.startswith(b"{")
+        assert len(calls) == 1
+        assert isinstance(cached, Product)
+        assert cached == product
+        assert reader.backend.remote_hits == 1
+
+    asyncio.run(run())
+
+
+def test_undecodable_entries_are_misses():
+    async def run():
+        server = fakeredis.FakeServer()
+        (worker,) = await start_workers(server, 1)
+        client = worker.backend.client
+        namespace = worker.backend.namespace
+        try:
+            await client.set(namespace + "pickled", pickle.dumps({"name": "Royal Oud"}))
+            await client.set(namespace + "unknown-model", b'{"model": "Order", "one": {}}')
+            await client.set(namespace + "invalid-product", b'{"model": "Product", "one": {"id": "p1"}}')
+            loaded = []
+            for key in ("pickled", "unknown-model", "invalid-product"):
+                load, calls = counting_loader({"name": "Mongo"})
+                loaded.append((await worker.get_or_load(key, load), len(calls)))
+            # The loader's value replaced the bad entry in Redis
+            repaired = await client.get(namespace + "pickled")
+        finally:
+            await close_workers([worker])
+
+        assert loaded == [({"name": "Mongo"}, 1)] * 3
+        assert worker.backend.errors == 3
+        assert repaired == b'{"value":{"name":"Mongo"}}'
+
+    asyncio.run(run())
+
+
+def test_invalidation_reaches_other_workers():
+    async def run():
+        server = fakeredis.FakeServer()
+        workers = await start_workers(server, 3)
+        key = product_key("p1")
+        try:
+            for worker in workers:
+                load, _ = counting_loader({"name": "Royal Oud"})
+                await worker.get_or_load(key, load)
+            await workers[0].invalidate(key)
+            for _ in range(200):
+                if not any(worker.backend.local.get(key)[0] for worker in workers):
+                    break
+                await asyncio.sleep(0.01)
+            evicted = not any(worker.backend.local.get(key)[0] for worker in workers)
+            load, calls = counting_loader({"name": "Royal Oud II"})
+            refreshed = await workers[1].get_or_load(key, load)
+        finally:
+            await close_workers(workers)
+
+        assert evicted
+        assert all(worker.backend.invalidations_received == 1 for worker in workers[1:])
+        assert refreshed == {"name": "Royal Oud II"}
+        assert len(calls) == 1
+
+    asyncio.run(run())
+
+
+def test_waiters_retry_when_the_loading_caller_is_cancelled():
+    async def run():
+        cache = CatalogCache()
+        release = asyncio.Event()
+        calls = []
+
+        async def load():
+            calls.append(1)
+            if len(calls) == 1:
+                await release.wait()
+            return {"name": "Royal Oud"}
+
+        leader = asyncio.create_task(cache.get_or_load("key", load))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.get_or_load("key", load)) for _ in range(5)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        results = await asyncio.gather(leader, *waiters, return_exceptions=True)
+
+        assert isinstance(results[0], asyncio.CancelledError)
+        assert results[1:] == [{"name": "Royal Oud"}] * 5
+        # One waiter took over the load and the rest shared it
+        assert len(calls) == 2
+        assert cache.stats()["inflight"] == 0
+
+    asyncio.run(run())
+
+
+def test_key_invalidations_only_discard_loads_of_that_key():
+    async def run():
+        cache = CatalogCache()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow(value):
+            started.set()
+            await release.wait()
+            return value
+
+        async def load_many(keys):
+            started.set()
+            await release.wait()
+            return {key: key.upper() for key in keys}
+
+        expected = {
+            "other": {"key": True, "a": True, "b": True},
+            "key": {"key": False, "a": True, "b": True},
+            "b": {"key": True, "a": True, "b": False},
+        }
+        for invalidated, stored in expected.items():
+            started.clear()
+            release.clear()
+            single = asyncio.create_task(cache.get_or_load("key", lambda: slow("loaded")))
+            await started.wait()
+            started.clear()
+            batch = asyncio.create_task(cache.get_many_or_load(["a", "b"], load_many))
+            await started.wait()
+            await cache.invalidate(invalidated)
+            release.set()
+            assert await single == "loaded"
+            assert await batch == {"a": "A", "b": "B"}
+            assert {key: (await cache.backend.get(key))[0] for key in stored} == stored
+            await cache.invalidate(*stored)
+
+        assert cache._loads == {}
+
+    asyncio.run(run())
+
+
+def test_load_that_started_before_another_workers_invalidation_is_not_shared():
+    async def run():
+        server = fakeredis.FakeServer()
+        # Worker A never hears the invalidation over pub/sub, as if the message were still in flight
+        a = CatalogCache(RedisCacheBackend(client=fakeredis.FakeAsyncRedis(server=server)))
+        (b,) = await start_workers(server, 1)
+        key = product_key("p1")
+        try:
+            for invalidate in (lambda: b.invalidate(key), lambda: b.invalidate_prefix("product:")):
+                await b.invalidate(key)
+                started = asyncio.Event()
+                release = asyncio.Event()
+
+                async def stale():
+                    started.set()
+                    await release.wait()
+                    return {"stock": 5}
+
+                load = asyncio.create_task(a.get_or_load(key, stale))
+                await started.wait()
+                # B writes Mongo, then invalidates, while A still holds what it read before the write
+                await invalidate()
+                release.set()
+                assert await load == {"stock": 5}
+
+                assert await b.backend.client.get(b.backend.namespace + key) is None
+                fresh, calls = counting_loader({"stock": 4})
+                assert await b.get_or_load(key, fresh) == {"stock": 4}
+                assert len(calls) == 1
+
+            assert a.backend.stale_writes == 2
+            assert not a.backend.local.get(key)[0]
+        finally:
+            await close_workers([a, b])
+
+    asyncio.run(run())
@@ -0,0 +1,52 @@
+import asyncio
+from collections import Counter
+
+import httpx
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+
+from benchmarks.synthetic import make_products
+from controllers.order_controller import get_order_router
+from decorators.authorization import require_auth
+from services.inventory_service import HELD, InventoryService
+
+ADDRESS = {"street": "1 MG Road", "city": "Pune", "state": "MH", "postal_code": "411001", "phone": "9999999999"}
+
+
+async def race(checkouts: int, stock: int):
+    db = AsyncMongoMockClient()["checkout_race"]
+    product = make_products(1)[0]
+    product["stock"] = stock
+    await db.products.insert_one(dict(product))
+
+    app = FastAPI()
+    app.include_router(get_order_router(db), prefix="/api")
+    app.dependency_overrides[require_auth] = lambda: {"user_id": "race-user", "email": "race@example.com", "role": "customer"}
+
+    body = {"items": [{"product_id": product["id"], "quantity": 1}], "shipping_address": ADDRESS}
+    limits = httpx.Limits(max_connections=checkouts)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", limits=limits) as http:
+        responses = await asyncio.gather(*(http.post("/api/orders/", json=body) for _ in range(checkouts)))
+    return db, product, Counter(response.status_code for response in responses)
+
+
+def test_flash_sale_sells_exactly_the_stock():
+    async def run():
+        db, product, statuses = await race(checkouts=500, stock=100)
+        stored = await db.products.find_one({"id": product["id"]})
+
+        assert statuses == {200: 100, 409: 400}
+        assert stored["stock"] == 0
+        assert len(stored["stock_holds"]) == 100
+        assert await db.orders.count_documents({}) == 100
+
+        # Expired holds go back on the shelf, each exactly once
+        await db.orders.update_many({"stock_reservation.status": HELD}, {"$set": {"stock_reservation.expires_at": "2000-01-01T00:00:00+00:00"}})
+        inventory = InventoryService(db)
+        assert await inventory.release_expired() == 100
+        assert await inventory.release_expired() == 0
+        stored = await db.products.find_one({"id": product["id"]})
+        assert stored["stock"] == 100
+        assert stored["stock_holds"] == []
+
+    asyncio.run(run())
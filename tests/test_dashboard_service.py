@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from benchmarks.synthetic import make_orders, make_products
+from services import dashboard_service
+from services.dashboard_service import DashboardService
+from services.sales_rollup_service import SalesRollupService
+
+TOTALS = ("total_orders", "pending_orders", "total_revenue")
+
+
+async def seed(db) -> list:
+    products = make_products(30)
+    orders = make_orders(200, products, ["user-1", "user-2"])
+    now = datetime.now(timezone.utc)
+    for n, order in enumerate(orders):
+        order["created_at"] = order["updated_at"] = (now - timedelta(hours=3 * n)).isoformat()
+    await db.products.insert_many([dict(product) for product in products])
+    await db.orders.insert_many([dict(order) for order in orders])
+    return orders
+
+
+def test_rollup_mode_matches_live_and_skips_cancelled_sales(monkeypatch):
+    # mongomock lacks $substrBytes; $substr is its alias and agrees on ASCII dates
+    monkeypatch.setattr(dashboard_service, "DAY_EXPRESSION", {"$substr": ["$created_at", 0, 10]})
+
+    async def run():
+        db = AsyncMongoMockClient()["dashboard"]
+        orders = await seed(db)
+        rollups = SalesRollupService(db)
+        await rollups.backfill()
+
+        # A paid order cancelled afterwards stops counting as revenue in both modes
+        cancelled = next(order for order in orders if order["payment_status"] == "completed")
+        await db.orders.update_one({"id": cancelled["id"]}, {"$set": {"order_status": "cancelled"}})
+        await rollups.sync_order(cancelled["id"])
+
+        service = DashboardService(db)
+        live = await service.get_stats("day", 30, use_rollups=False)
+        rolled = await service.get_stats("day", 30, use_rollups=True)
+
+        sales = [order for order in orders if order["payment_status"] == "completed" and order["id"] != cancelled["id"]]
+        assert live["total_revenue"] == round(sum(order["total"] for order in sales), 2)
+        assert {field: rolled[field] for field in TOTALS} == {field: live[field] for field in TOTALS}
+        assert rolled["revenue_series"] == live["revenue_series"]
+        assert sum(point["paid_orders"] for point in live["revenue_series"]["points"]) == len(sales)
+        assert rolled["source"] == "rollups"
+
+    asyncio.run(run())
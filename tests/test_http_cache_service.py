@@ -0,0 +1,35 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from benchmarks.synthetic import make_products
+from services.http_cache_service import collection_validators, parse_timestamp
+
+
+def test_list_validators_follow_writes_to_matching_products():
+    async def run():
+        db = AsyncMongoMockClient()["http_cache"]
+        products = make_products(50)
+        await db.products.insert_many([dict(product) for product in products])
+        category = products[0]["category_id"]
+        in_category = [product for product in products if product["category_id"] == category]
+        elsewhere = next(product for product in products if product["category_id"] != category)
+
+        etag, last_modified = await collection_validators(db.products, {"category_id": category}, "products")
+        assert last_modified == max(parse_timestamp(product["updated_at"]) for product in in_category)
+        assert (etag, last_modified) == await collection_validators(db.products, {"category_id": category}, "products")
+
+        # Other categories don't affect this list
+        await db.products.update_one({"id": elsewhere["id"]}, {"$set": {"updated_at": "2030-01-01T00:00:00+00:00"}})
+        assert (await collection_validators(db.products, {"category_id": category}, "products"))[0] == etag
+
+        await db.products.update_one({"id": in_category[-1]["id"]}, {"$set": {"updated_at": "2030-01-02T00:00:00+00:00"}})
+        updated_etag, updated_at = await collection_validators(db.products, {"category_id": category}, "products")
+        assert updated_etag != etag
+        assert updated_at.isoformat() == "2030-01-02T00:00:00+00:00"
+
+        # A delete leaves the newest timestamp alone, so the count has to change the tag
+        await db.products.delete_one({"id": in_category[0]["id"]})
+        assert (await collection_validators(db.products, {"category_id": category}, "products"))[0] != updated_etag
+
+    asyncio.run(run())
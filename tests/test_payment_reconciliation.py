@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from benchmarks.mock_phonepe import create_mock_phonepe_app, free_port, start_mock_phonepe
+from benchmarks.synthetic import make_orders, make_products
+from services.payment_reconciliation_service import PaymentReconciler, ReconciliationMetrics, backoff_seconds
+from services.phonepe_service import PhonePeClient
+
+STATES = ["COMPLETED", "COMPLETED", "FAILED", "PENDING"]
+
+
+async def seed_pending(db, count: int) -> list:
+    orders = make_orders(count, make_products(20), ["reconcile-user"])
+    stale = datetime.now(timezone.utc) - timedelta(hours=1)
+    for n, order in enumerate(orders):
+        order.update({
+            "payment_status": "pending", "order_status": "pending",
+            "phonepe_merchant_transaction_id": order["id"], "created_at": (stale - timedelta(seconds=n)).isoformat(),
+        })
+    await db.orders.insert_many([dict(o) for o in orders])
+    return orders
+
+
+def client_for(port: int) -> PhonePeClient:
+    return PhonePeClient(
+        base_url=f"http://127.0.0.1:{port}", auth_url=f"http://127.0.0.1:{port}/v1/oauth/token",
+        client_id="test-client", client_secret="test-secret"
+    )
+
+
+def reconciler_for(db, client: PhonePeClient, metrics: ReconciliationMetrics) -> PaymentReconciler:
+    return PaymentReconciler(db, client=client, metrics=metrics, batch_size=3, concurrency=4, rate_per_second=1000)
+
+
+def test_reconcile_applies_what_phonepe_reports():
+    async def run():
+        db = AsyncMongoMockClient()["reconciliation"]
+        orders = await seed_pending(db, 8)
+        states = {order["id"]: STATES[n % len(STATES)] for n, order in enumerate(orders)}
+
+        mock = create_mock_phonepe_app(states=states)
+        port = free_port()
+        server = await start_mock_phonepe(mock, port)
+        client = client_for(port)
+        metrics = ReconciliationMetrics()
+        reconciler = reconciler_for(db, client, metrics)
+        try:
+            checked = await reconciler.run_once()
+            # Still-pending orders are backed off, so an immediate second pass has nothing to do
+            rechecked = await reconciler.run_once()
+
+            pending_id = next(order_id for order_id, state in states.items() if state == "PENDING")
+            await db.orders.update_one({"id": pending_id}, {"$set": {"payment_reconciliation.next_check_at": "2000-01-01T00:00:00+00:00"}})
+            before = datetime.now(timezone.utc)
+            assert await reconciler.run_once() == 1
+        finally:
+            server.should_exit = True
+            await mock.state.serve_task
+            await client.close()
+
+        assert checked == 8
+        assert rechecked == 0
+        by_id = {order["id"]: order async for order in db.orders.find({}, {"_id": 0})}
+        for order_id, state in states.items():
+            order = by_id[order_id]
+            if state == "COMPLETED":
+                assert order["payment_status"] == "completed"
+                assert order["phonepe_transaction_id"]
+            elif state == "FAILED":
+                assert order["payment_status"] == "failed"
+            else:
+                assert order["payment_status"] == "pending"
+                assert order["payment_reconciliation"]["last_state"] == "PENDING"
+        assert metrics.outcomes == {"completed": 4, "failed": 2, "pending": 3}
+
+        # The re-polled order's next check doubled
+        retried = by_id[pending_id]["payment_reconciliation"]
+        assert retried["attempts"] == 2
+        next_check = datetime.fromisoformat(retried["next_check_at"])
+        assert next_check >= before + timedelta(seconds=backoff_seconds(2) - 1)
+
+    asyncio.run(run())
+
+
+def test_unreachable_phonepe_is_retried_with_backoff():
+    async def run():
+        db = AsyncMongoMockClient()["reconciliation"]
+        orders = await seed_pending(db, 3)
+        # Nothing listens on this port, so every check fails with a retryable network error
+        client = client_for(free_port())
+        metrics = ReconciliationMetrics()
+        reconciler = reconciler_for(db, client, metrics)
+        before = datetime.now(timezone.utc)
+        try:
+            checked = await reconciler.run_once()
+            rechecked = await reconciler.run_once()
+        finally:
+            await client.close()
+
+        assert checked == 3
+        assert rechecked == 0
+        assert metrics.outcomes == {"error": 3}
+        async for order in db.orders.find({"id": {"$in": [o["id"] for o in orders]}}, {"_id": 0}):
+            assert order["payment_status"] == "pending"
+            state = order["payment_reconciliation"]
+            assert state["attempts"] == 1
+            assert state["last_error"]
+            assert datetime.fromisoformat(state["next_check_at"]) >= before + timedelta(seconds=backoff_seconds(1) - 1)
+
+    asyncio.run(run())
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+
+from benchmarks.mock_phonepe import create_mock_phonepe_app, free_port, start_mock_phonepe
+from benchmarks.synthetic import make_orders, make_products
+from controllers.order_controller import get_order_router
+from decorators.authorization import require_auth
+from services.phonepe_service import phonepe_client
+
+USER_ID = "verify-user"
+CALLS = 200
+LATENCY = 0.2
+
+
+def test_simultaneous_verifications_overlap(monkeypatch):
+    port = free_port()
+    monkeypatch.setattr(phonepe_client, "base_url", f"http://127.0.0.1:{port}")
+    monkeypatch.setattr(phonepe_client, "auth_url", f"http://127.0.0.1:{port}/v1/oauth/token")
+    monkeypatch.setattr(phonepe_client, "client_id", "test-client")
+    monkeypatch.setattr(phonepe_client, "client_secret", "test-secret")
+    monkeypatch.setattr(phonepe_client, "_token_cache", {"access_token": None, "expires_at": 0})
+
+    async def run():
+        db = AsyncMongoMockClient()["phonepe_concurrency"]
+        orders = make_orders(CALLS, make_products(20), [USER_ID])
+        for order in orders:
+            order.update({"payment_status": "pending", "order_status": "pending", "phonepe_merchant_transaction_id": order["id"]})
+        await db.orders.insert_many([dict(o) for o in orders])
+
+        mock = create_mock_phonepe_app(latency=LATENCY)
+        server = await start_mock_phonepe(mock, port)
+        app = FastAPI()
+        app.include_router(get_order_router(db), prefix="/api")
+        app.dependency_overrides[require_auth] = lambda: {"user_id": USER_ID, "email": "verify@example.com", "role": "customer"}
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=None) as http:
+                start = time.perf_counter()
+                responses = await asyncio.gather(*(
+                    http.post("/api/orders/verify-phonepe-payment", json={"order_id": order["id"]}) for order in orders
+                ))
+                elapsed = time.perf_counter() - start
+        finally:
+            server.should_exit = True
+            await mock.state.serve_task
+            await phonepe_client.close()
+
+        assert all(r.status_code == 200 and r.json()["success"] for r in responses)
+        assert await db.orders.count_documents({"payment_status": "completed"}) == CALLS
+        # One after another they would take CALLS x LATENCY = 40 s; the bound leaves room for a slow machine
+        assert elapsed < CALLS * LATENCY / 4
+        assert mock.state.stats.max_in_flight >= 50
+        assert mock.state.stats.token_requests == 1
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+import asyncio
+import io
+
+from mongomock_motor import AsyncMongoMockClient
+
+from services.product_import_service import ProductImportService, iter_rows
+
+FULL = (
+    "name,slug,brand,category_id,price,discount,stock,images,is_featured,related_products,specifications,description\n"
+    'Royal Oud,royal-oud,Mfrida,attars,500,10,40,/a.webp|/b.webp,true,p2|p3,"{""Volume"": ""12 ML""}",Oud attar\n'
+)
+PRICE_ONLY = "name,slug,brand,category_id,price,description\nRoyal Oud,royal-oud,Mfrida,attars,600,Oud attar\n"
+
+
+def csv_rows(text: str):
+    return iter_rows(io.StringIO(text), "csv")
+
+
+def test_reimport_keeps_fields_the_file_leaves_out():
+    async def run():
+        db = AsyncMongoMockClient()["product_import"]
+        service = ProductImportService(db)
+        first = await service.import_rows(csv_rows(FULL))
+        await db.products.update_one({"slug": "royal-oud"}, {"$set": {"stock_holds": [{"order_id": "o1", "quantity": 2}]}})
+        second = await service.import_rows(csv_rows(PRICE_ONLY))
+        stored = await db.products.find_one({"slug": "royal-oud"}, {"_id": 0})
+
+        assert (first["inserted"], second["updated"], second["failed"]) == (1, 1, 0)
+        assert stored["price"] == 600
+        # The stored 10% discount still applies to the new price
+        assert stored["discount"] == 10
+        assert stored["final_price"] == 540
+        assert stored["stock"] == 40
+        assert stored["images"] == ["/a.webp", "/b.webp"]
+        assert stored["is_featured"] is True
+        assert stored["related_products"] == ["p2", "p3"]
+        assert stored["specifications"] == {"Volume": "12 ML"}
+        assert stored["stock_holds"] == [{"order_id": "o1", "quantity": 2}]
+
+    asyncio.run(run())
+
+
+def test_new_products_get_the_defaults():
+    async def run():
+        db = AsyncMongoMockClient()["product_import"]
+        report = await ProductImportService(db).import_rows(csv_rows(PRICE_ONLY))
+        stored = await db.products.find_one({"slug": "royal-oud"}, {"_id": 0})
+
+        assert report["inserted"] == 1
+        assert (stored["stock"], stored["discount"], stored["images"], stored["is_featured"]) == (0, 0, [], False)
+        assert stored["final_price"] == 600
+        assert stored["id"] and stored["created_at"]
+
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from benchmarks.synthetic import make_products
+from models.product_model import ProductCreate, ProductUpdate
+from services import product_service
+from services.product_service import ProductService
+from services.search_service import ProductSearchIndex
+
+
+async def page_through(service: ProductService, limit: int, **filters) -> list:
+    ids = []
+    cursor = None
+    while True:
+        page, cursor = await service.get_products_page(search="oud", limit=limit, cursor=cursor, view="card", **filters)
+        ids.extend(product.id for product in page)
+        if cursor is None:
+            return ids
+
+
+def test_relevance_cursor_seeks_past_the_last_hit(monkeypatch):
+    async def run():
+        products = make_products(400)
+        index = ProductSearchIndex()
+        index.build(products)
+        monkeypatch.setattr(product_service, "product_search_index", index)
+        db = AsyncMongoMockClient()["catalog"]
+        await db.products.insert_many([dict(product) for product in products])
+        service = ProductService(db)
+
+        ranked = [product_id for product_id, _ in index.search("oud")]
+        featured = {product["id"] for product in products if product["is_featured"]}
+
+        assert await page_through(service, limit=7) == ranked
+        assert await page_through(service, limit=5, is_featured=True) == [pid for pid in ranked if pid in featured]
+
+    asyncio.run(run())
+
+
+def test_variant_groups_are_refreshed_only_when_membership_changes():
+    async def run():
+        db = AsyncMongoMockClient()["catalog"]
+        service = ProductService(db)
+        created = [
+            await service.create_product(ProductCreate(
+                name=f"Royal Oud {size}", slug=f"royal-oud-{size}", brand="Mfrida", category_id="attars",
+                price=499, description="Oud attar", variant_group="royal-oud", variant_name=f"{size} ML"
+            ))
+            for size in (12, 6)
+        ]
+        refreshed = []
+        refresh = service.variant_groups.refresh
+
+        async def record_refresh(*groups):
+            refreshed.append(groups)
+            await refresh(*groups)
+
+        service.variant_groups.refresh = record_refresh
+        await service.update_product(created[0].id, ProductUpdate(price=599, stock=3, variant_name="12 ML"))
+        assert refreshed == [()]
+
+        await service.update_product(created[0].id, ProductUpdate(variant_name="3 ML"))
+        assert refreshed[-1] == ("royal-oud",)
+        assert [member["variant_name"] for member in await service.variant_groups.members("royal-oud")] == ["3 ML", "6 ML"]
+
+    asyncio.run(run())
+
+
+def test_price_update_of_a_missing_product_returns_none():
+    async def run():
+        db = AsyncMongoMockClient()["catalog"]
+        service = ProductService(db)
+
+        assert await service.update_product("missing", ProductUpdate(price=599)) is None
+        assert await service.update_product("missing", ProductUpdate(discount=10)) is None
+        assert await db.products.count_documents({}) == 0
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+from services import search_service
+from services.search_service import ProductSearchIndex
+
+
+def test_prefix_expansion_keeps_the_most_common_terms(monkeypatch):
+    monkeypatch.setattr(search_service, "MAX_PREFIX_EXPANSIONS", 2)
+    index = ProductSearchIndex()
+    # "oa" and "oak" sort first but appear once; "oud" is the term shoppers mean
+    index.build([
+        {"id": "rare-1", "name": "Oa"},
+        {"id": "rare-2", "name": "Oak"},
+        *({"id": f"oud-{n}", "name": "Oud"} for n in range(3)),
+        *({"id": f"oudh-{n}", "name": "Oudh"} for n in range(2)),
+    ])
+
+    assert sorted(index._expand("o")) == ["oud", "oudh"]
+    assert {pid for pid, _ in index.search("o")} == {"oud-0", "oud-1", "oud-2", "oudh-0", "oudh-1"}
+    # An exact match is always scored, however rare
+    assert "oa" in index._expand("oa")
+
+
+def test_scores_follow_writes_without_a_rebuild():
+    products = [
+        {"id": "short", "name": "Royal Oud"},
+        {"id": "long", "name": "Royal Oud", "description": "amber musk saffron rose vanilla sandalwood"},
+        {"id": "other", "name": "White Musk"},
+    ]
+    live = ProductSearchIndex()
+    live.build(products[:1])
+    live.upsert(products[1])
+    live.upsert(products[2])
+    live.upsert({"id": "gone", "name": "Royal Oud Intense"})
+    live.remove("gone")
+
+    rebuilt = ProductSearchIndex()
+    rebuilt.build(products)
+
+    assert live.search("royal oud") == rebuilt.search("royal oud")
+    assert [pid for pid, _ in live.search("royal oud")] == ["short", "long"]
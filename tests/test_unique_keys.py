@@ -0,0 +1,102 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from mongomock_motor import AsyncMongoMockClient
+from pymongo.errors import DuplicateKeyError
+
+from controllers.frequently_bought_controller import get_frequently_bought_router
+from controllers.product_controller import get_product_router
+from decorators.authorization import require_admin
+from models.frequently_bought_model import FrequentlyBoughtCreate
+from services.frequently_bought_service import FrequentlyBoughtService
+from services.index_service import ensure_indexes
+
+ADMIN = {"user_id": "admin", "email": "admin@example.com", "role": "admin"}
+
+
+async def admin_client(*routers) -> httpx.AsyncClient:
+    app = FastAPI()
+    for router in routers:
+        app.include_router(router, prefix="/api")
+    app.dependency_overrides[require_admin] = lambda: ADMIN
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def product_body(slug: str) -> dict:
+    return {"name": "Royal Oud", "slug": slug, "brand": "Mfrida", "category_id": "attars", "price": 499, "description": "Oud attar"}
+
+
+def test_taken_slugs_are_conflicts():
+    async def run():
+        db = AsyncMongoMockClient()["unique_keys"]
+        await ensure_indexes(db)
+        async with await admin_client(get_product_router(db)) as http:
+            first = await http.post("/api/products/", json=product_body("royal-oud"))
+            second = await http.post("/api/products/", json=product_body("white-musk"))
+            duplicate = await http.post("/api/products/", json=product_body("royal-oud"))
+            renamed = await http.put(f"/api/products/{second.json()['id']}", json={"slug": "royal-oud"})
+            unchanged = await http.get(f"/api/products/{second.json()['id']}")
+
+        assert first.status_code == 200
+        assert duplicate.status_code == 409
+        assert "royal-oud" in duplicate.json()["detail"]
+        assert renamed.status_code == 409
+        assert unchanged.json()["slug"] == "white-musk"
+        assert await db.products.count_documents({}) == 2
+
+    asyncio.run(run())
+
+
+class LosesUpsertRace:
+    """Collection proxy whose first upsert finds a concurrent insert already holding the unique key"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.raced = False
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        if kwargs.get("upsert") and not self.raced:
+            self.raced = True
+            await self.collection.insert_one({**query, "id": "first", "related_product_ids": ["r0"]})
+            raise DuplicateKeyError("E11000 duplicate key error index: product_id_unique")
+        return await self.collection.find_one_and_update(query, update, **kwargs)
+
+
+def test_frequently_bought_create_that_loses_the_insert_race_updates_the_winner():
+    async def run():
+        db = AsyncMongoMockClient()["unique_keys"]
+        await ensure_indexes(db)
+        service = FrequentlyBoughtService(db)
+        service.collection = LosesUpsertRace(service.collection)
+
+        saved = await service.create_or_update(FrequentlyBoughtCreate(product_id="p1", related_product_ids=["r1"]))
+
+        assert service.collection.raced
+        assert saved.id == "first"
+        assert saved.related_product_ids == ["r1"]
+        assert await db.frequently_bought_together.count_documents({}) == 1
+
+    asyncio.run(run())
+
+
+def test_concurrent_frequently_bought_creates_share_one_entry():
+    async def run():
+        db = AsyncMongoMockClient()["unique_keys"]
+        await ensure_indexes(db)
+        async with await admin_client(get_frequently_bought_router(db)) as http:
+            responses = await asyncio.gather(*(
+                http.post("/api/frequently-bought/", json={"product_id": "p1", "related_product_ids": [f"r{n}"]})
+                for n in range(20)
+            ))
+            stored = await http.get("/api/frequently-bought/product/p1")
+
+        assert {response.status_code for response in responses} == {200}
+        assert len({response.json()["id"] for response in responses}) == 1
+        assert await db.frequently_bought_together.count_documents({}) == 1
+        assert stored.json()["id"] == responses[0].json()["id"]
+
+    asyncio.run(run())
@@ -0,0 +1,42 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from mongomock_motor import AsyncMongoMockClient
+
+from services.webhook_inbox_service import PROCESSING, WebhookInboxService, fingerprint
+
+CALLBACK = {
+    "event": "checkout.order.completed",
+    "merchant_order_id": "order-1",
+    "state": "COMPLETED",
+    "transaction_id": "T1",
+    "payment_mode": "UPI",
+}
+
+
+def test_consumer_whose_lease_expired_leaves_the_entry_to_the_one_that_reclaimed_it():
+    async def run():
+        db = AsyncMongoMockClient()["inbox"]
+        slow, other = WebhookInboxService(db), WebhookInboxService(db)
+        assert await slow.record(CALLBACK, "{}")
+        reclaimed = {}
+
+        async def apply_after_lease_expired(entry):
+            # The lease runs out mid-apply and another consumer re-claims the entry
+            await db.phonepe_webhook_inbox.update_one(
+                {"_id": entry["_id"]}, {"$set": {"claimed_at": datetime.now(timezone.utc) - timedelta(hours=1)}}
+            )
+            # claimed_at is stored to the millisecond, so let the clock move past the first claim
+            await asyncio.sleep(0.01)
+            reclaimed.update(await other.claim())
+            raise RuntimeError("order service timed out")
+
+        slow.apply = apply_after_lease_expired
+        assert await slow.process_one()
+
+        stored = await db.phonepe_webhook_inbox.find_one({"_id": fingerprint(CALLBACK)})
+        assert stored["status"] == PROCESSING
+        assert stored["claimed_at"] == reclaimed["claimed_at"]
+        assert "result" not in stored
+
+    asyncio.run(run())
@@ -0,0 +1,28 @@
+import asyncio
+
+from mongomock_motor import AsyncMongoMockClient
+
+from benchmarks.synthetic import make_products
+from services.wishlist_service import WishlistService
+
+
+def test_embedded_wishlists_are_readable_after_startup_migration():
+    async def run():
+        db = AsyncMongoMockClient()["wishlists"]
+        products = make_products(3)
+        await db.products.insert_many([dict(product) for product in products])
+        ids = [product["id"] for product in products]
+        await db.users.insert_many([
+            {"id": "u1", "email": "u1@example.com", "wishlist": [ids[0], ids[2]]},
+            {"id": "u2", "email": "u2@example.com"},
+        ])
+        service = WishlistService(db)
+
+        assert await service.ensure_migrated() == {"users": 1, "items": 2}
+        assert await service.ensure_migrated() is None
+        assert [product.id for product in await service.get_wishlist("u1")] == [ids[2], ids[0]]
+        assert await service.check_in_wishlist("u1", ids[0])
+        assert not await service.check_in_wishlist("u1", ids[1])
+        assert await db.users.count_documents({"wishlist": {"$exists": True}}) == 0
+
+    asyncio.run(run())